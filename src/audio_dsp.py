@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AUDIO DSP - Catena di elaborazione in streaming per i valori audio che guidano gli effetti.
+Ogni frame del motore produce un vettore di canali (livello, bassi, bande); la catena lo elabora in place con
+stadi vettoriali NumPy dallo stato preallocato: noise gate con isteresi, controllo automatico del guadagno
+(AGC) e smoothing attack/release. Gli stadi si aggiungono o tolgono a runtime sostituendo la lista (come i
+listener del motore), senza riallocare i buffer. Eseguito come script misura il costo di ogni stadio.
+"""
+
+import time
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DEFAULT_GATE_HYSTERESIS = 0.7 # Il gate si chiude sotto threshold * hysteresis (niente sfarfallio sulla soglia)
+DEFAULT_GATE_HOLD_SECONDS = 0.1 # Tempo minimo di apertura dopo l'ultimo superamento della soglia
+DEFAULT_AGC_TARGET = 0.8 # Livello di uscita a cui viene portato l'inviluppo di picco
+DEFAULT_AGC_ATTACK_SECONDS = 0.05 # Riduzione del guadagno (suono più forte): rapida
+DEFAULT_AGC_RELEASE_SECONDS = 8.0 # Recupero del guadagno (suono più debole): lento
+DEFAULT_AGC_MAX_GAIN = 20.0
+DEFAULT_AGC_MIN_GAIN = 0.05
+DEFAULT_AGC_FLOOR = 1e-3 # Inviluppo minimo: il silenzio non porta il guadagno all'infinito
+DEFAULT_SMOOTH_ATTACK_SECONDS = 0.01
+DEFAULT_SMOOTH_RELEASE_SECONDS = 0.15
+
+
+def time_coefficient(seconds, frame_rate):
+    """Coefficiente di un filtro a un polo con costante di tempo 'seconds' (0 = istantaneo)."""
+    if seconds <= 0:
+        return 1.0
+    return float(1.0 - np.exp(-1.0 / (seconds * frame_rate)))
+
+
+class DSPStage:
+    """Stadio della catena: process(values) modifica in place un array float64 di 'channels' valori."""
+
+    name = "stadio"
+
+    def __init__(self, channels, frame_rate):
+        self.channels = int(channels)
+        self.frame_rate = float(frame_rate)
+
+    def process(self, values):
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+
+class NoiseGate(DSPStage):
+    """
+    Noise gate con isteresi e hold. Con 'key' tutti i canali seguono il gate del canale indicato (es. l'RMS);
+    altrimenti ogni canale ha il suo gate. 'threshold' può essere uno scalare o un valore per canale.
+    """
+
+    name = "gate"
+
+    def __init__(self, channels, frame_rate, threshold, hysteresis=DEFAULT_GATE_HYSTERESIS, hold_seconds=DEFAULT_GATE_HOLD_SECONDS, key=None):
+        super().__init__(channels, frame_rate)
+        self.open_threshold = np.zeros(self.channels)
+        self.close_threshold = np.zeros(self.channels)
+        self.hysteresis = hysteresis
+        self.set_threshold(threshold)
+        self.hold_frames = max(1, int(round(hold_seconds * frame_rate))) # Almeno il frame che supera la soglia
+        self.key = key
+        self.hold = np.zeros(self.channels) # Frame di apertura residui
+        self.above = np.zeros(self.channels, dtype=bool)
+        self.is_open = np.zeros(self.channels, dtype=bool)
+
+    def set_threshold(self, threshold):
+        """Nuova soglia (scalare o per canale) senza riallocare."""
+        self.open_threshold[:] = threshold
+        np.multiply(self.open_threshold, self.hysteresis, out=self.close_threshold)
+
+    def process(self, values):
+        hold, above = self.hold, self.above
+        np.greater_equal(values, self.open_threshold, out=above)
+        np.copyto(hold, self.hold_frames, where=above) # Sopra la soglia: hold ricaricato
+        hold -= 1.0
+        np.greater_equal(values, self.close_threshold, out=above) # Tra le due soglie resta aperto se lo era
+        np.logical_and(self.is_open, above, out=self.is_open)
+        np.greater_equal(hold, 0.0, out=above)
+        np.logical_or(self.is_open, above, out=self.is_open)
+        np.maximum(hold, -1.0, out=hold)
+        if self.key is not None:
+            self.is_open.fill(self.is_open[self.key])
+        np.multiply(values, self.is_open, out=values)
+
+    def reset(self):
+        self.hold.fill(0.0); self.is_open.fill(False)
+
+
+class AutoGain(DSPStage):
+    """
+    AGC: un inviluppo di picco (attacco rapido, rilascio lento) porta il livello verso 'target'. Con 'key' il
+    guadagno segue il canale indicato (es. l'RMS) e si applica a tutti i canali, così i rapporti tra le bande
+    restano invariati; altrimenti ogni canale ha il suo guadagno. Guadagno limitato tra min_gain e max_gain,
+    uscita tra 0 e 'limit'.
+    """
+
+    name = "agc"
+
+    def __init__(self, channels, frame_rate, target=DEFAULT_AGC_TARGET, attack_seconds=DEFAULT_AGC_ATTACK_SECONDS,
+                 release_seconds=DEFAULT_AGC_RELEASE_SECONDS, max_gain=DEFAULT_AGC_MAX_GAIN, min_gain=DEFAULT_AGC_MIN_GAIN,
+                 floor=DEFAULT_AGC_FLOOR, limit=1.0, key=None):
+        super().__init__(channels, frame_rate)
+        self.key = key
+        size = 1 if key is not None else self.channels # Un solo inviluppo e guadagno se guidato da un canale
+        self.target = target
+        self.attack = time_coefficient(attack_seconds, frame_rate)
+        self.release = time_coefficient(release_seconds, frame_rate)
+        self.max_gain = max_gain
+        self.min_gain = min_gain
+        self.floor = floor
+        self.limit = limit
+        self.envelope = np.full(size, target / max_gain) # Parte dal guadagno massimo, scende al primo suono
+        self.gain = np.ones(size)
+        self.rising = np.zeros(size, dtype=bool)
+        self.coefficients = np.zeros(size)
+        self.delta = np.zeros(size)
+
+    def process(self, values):
+        envelope = self.envelope
+        level = values if self.key is None else values[self.key:self.key + 1] # Vista, nessuna copia
+        np.greater(level, envelope, out=self.rising)
+        self.coefficients.fill(self.release)
+        np.copyto(self.coefficients, self.attack, where=self.rising)
+        np.subtract(level, envelope, out=self.delta)
+        self.delta *= self.coefficients
+        envelope += self.delta
+        np.maximum(envelope, self.floor, out=self.gain)
+        np.divide(self.target, self.gain, out=self.gain)
+        np.minimum(self.gain, self.max_gain, out=self.gain) # minimum/maximum: np.clip costa molto di più su array piccoli
+        np.maximum(self.gain, self.min_gain, out=self.gain)
+        values *= self.gain
+        np.minimum(values, self.limit, out=values)
+        np.maximum(values, 0.0, out=values)
+
+    def reset(self):
+        self.envelope.fill(self.target / self.max_gain); self.gain.fill(1.0)
+
+
+class Smoother(DSPStage):
+    """Smoothing attack/release per canale (salite rapide per i transienti, discese morbide)."""
+
+    name = "smoothing"
+
+    def __init__(self, channels, frame_rate, attack_seconds=DEFAULT_SMOOTH_ATTACK_SECONDS, release_seconds=DEFAULT_SMOOTH_RELEASE_SECONDS):
+        super().__init__(channels, frame_rate)
+        self.attack = time_coefficient(attack_seconds, frame_rate)
+        self.release = time_coefficient(release_seconds, frame_rate)
+        self.state = np.zeros(self.channels)
+        self.rising = np.zeros(self.channels, dtype=bool)
+        self.coefficients = np.zeros(self.channels)
+
+    def process(self, values):
+        state = self.state
+        np.greater(values, state, out=self.rising)
+        self.coefficients.fill(self.release)
+        np.copyto(self.coefficients, self.attack, where=self.rising)
+        values -= state
+        values *= self.coefficients
+        state += values
+        np.copyto(values, state)
+
+    def reset(self):
+        self.state.fill(0.0)
+
+
+class DSPChain:
+    """
+    Catena di stadi applicata a ogni frame. process() copia l'ingresso nel buffer di lavoro, applica gli stadi
+    attivi in ordine e pubblica il risultato in un doppio buffer ('values', scambio atomico del riferimento).
+    Gli stadi disattivati con enable_stage() restano allocati e riprendono dal loro stato.
+    """
+
+    def __init__(self, channels, frame_rate, stages=()):
+        self.channels = int(channels)
+        self.frame_rate = float(frame_rate)
+        self.available = [] # Tutti gli stadi, nell'ordine della catena
+        self.disabled = set()
+        self.stages = [] # Stadi attivi (lista sostituita, mai modificata)
+        self.buffer = np.zeros(self.channels)
+        self.published = [np.zeros(self.channels) for _ in range(2)]
+        self.back_index = 0
+        self.values = self.published[1]
+        self.stage_seconds = {}
+        self.frames = 0
+        for stage in stages: self.add_stage(stage)
+
+    def add_stage(self, stage, index=None):
+        """Inserisce uno stadio (in coda o alla posizione 'index'); sostituisce uno stadio con lo stesso nome."""
+        if stage.channels != self.channels:
+            raise ValueError(f"Lo stadio '{stage.name}' ha {stage.channels} canali, la catena {self.channels}")
+        available = [item for item in self.available if item.name != stage.name]
+        available.insert(len(available) if index is None else index, stage)
+        self.available = available
+        self.stage_seconds.setdefault(stage.name, 0.0)
+        self._update_stages()
+
+    def remove_stage(self, name):
+        self.available = [item for item in self.available if item.name != name]
+        self._update_stages()
+
+    def enable_stage(self, name, enabled=True):
+        """Attiva/disattiva uno stadio senza toglierlo dalla catena (riattivato riparte da zero)."""
+        stage = self.get_stage(name)
+        if stage is None: return
+        if enabled and name in self.disabled: stage.reset()
+        if enabled: self.disabled.discard(name)
+        else: self.disabled.add(name)
+        self._update_stages()
+
+    def get_stage(self, name):
+        for stage in self.available:
+            if stage.name == name: return stage
+        return None
+
+    def _update_stages(self):
+        self.stages = [item for item in self.available if item.name not in self.disabled] # Nuova lista: il thread di analisi non vede modifiche a metà
+
+    def process(self, values):
+        """Elabora un frame (sequenza di 'channels' valori) e restituisce l'array pubblicato."""
+        buffer = self.buffer
+        buffer[:] = values
+        stage_seconds = self.stage_seconds
+        for stage in self.stages:
+            start = time.perf_counter()
+            stage.process(buffer)
+            stage_seconds[stage.name] += time.perf_counter() - start
+        output = self.published[self.back_index]
+        np.copyto(output, buffer)
+        self.values = output
+        self.back_index ^= 1
+        self.frames += 1
+        return output
+
+    def reset(self):
+        for stage in self.stages: stage.reset()
+
+    def format_stats(self):
+        frames = max(1, self.frames)
+        costs = ", ".join(f"{name} {seconds / frames * 1e6:.1f} us" for name, seconds in self.stage_seconds.items())
+        return f"catena DSP ({' -> '.join(stage.name for stage in self.stages) or 'vuota'}): {costs or 'nessuno stadio'}"
+
+
+class EngineFeatureChain(DSPChain):
+    """
+    Catena registrata come listener di AudioAnalysisEngine sui valori del frame: canale 0 audio_level (RMS),
+    1 bass_level, poi le bande di frequency_data. Il gate è sul canale 0 (LEVEL_CHANNEL).
+    """
+
+    LEVEL_CHANNEL = 0
+    BASS_CHANNEL = 1
+    BANDS_OFFSET = 2
+
+    def __init__(self, engine, stages=()):
+        super().__init__(self.BANDS_OFFSET + len(engine.frequency_data), engine.sample_rate / engine.hop_size, stages)
+        self.features = np.zeros(self.channels)
+
+    def __call__(self, engine, end):
+        features = self.features
+        features[self.LEVEL_CHANNEL] = engine.audio_level
+        features[self.BASS_CHANNEL] = engine.bass_level
+        features[self.BANDS_OFFSET:] = engine.frequency_data
+        self.process(features)
+
+    def snapshot(self):
+        """Come AudioAnalysisEngine.snapshot(): (livello, bassi, bande come lista) dopo la catena."""
+        values = self.values
+        return float(values[self.LEVEL_CHANNEL]), float(values[self.BASS_CHANNEL]), values[self.BANDS_OFFSET:].tolist()
+
+
+def create_feature_chain(engine, noise_threshold=0.0, auto_gain=True, smoothing=True, **kwargs):
+    """
+    Catena gate -> AGC -> smoothing registrata come listener per frame del motore. Tutti gli stadi vengono
+    creati; quelli non richiesti (soglia 0, auto_gain/smoothing False) restano disattivati.
+    """
+    chain = EngineFeatureChain(engine)
+    channels, frame_rate = chain.channels, chain.frame_rate
+    threshold = np.zeros(channels); threshold[chain.LEVEL_CHANNEL] = noise_threshold
+    chain.add_stage(NoiseGate(channels, frame_rate, threshold, key=chain.LEVEL_CHANNEL))
+    chain.add_stage(AutoGain(channels, frame_rate, key=chain.LEVEL_CHANNEL, **kwargs)) # Un guadagno per tutti: la forma dello spettro resta
+    chain.add_stage(Smoother(channels, frame_rate))
+    chain.enable_stage(NoiseGate.name, noise_threshold > 0)
+    chain.enable_stage(AutoGain.name, auto_gain)
+    chain.enable_stage(Smoother.name, smoothing)
+    engine.add_frame_listener(chain)
+    return chain
+
+
+# --- BENCHMARK ---
+def run_benchmark(frames=20000, frame_rate=86.0):
+    """Costo per frame di ogni stadio con 6 canali (come nell'app) e 64 canali; verifica che non ci siano allocazioni."""
+    import tracemalloc
+    rng = np.random.default_rng(0)
+    for channels in (6, 64):
+        inputs = rng.random((256, channels)) * np.linspace(0.01, 0.5, 256)[:, None] # Livello che cresce (sala che si riempie)
+        chain = DSPChain(channels, frame_rate, [NoiseGate(channels, frame_rate, 0.02, key=0), AutoGain(channels, frame_rate, key=0),
+                                                Smoother(channels, frame_rate)])
+        for i in range(100): chain.process(inputs[i % 256])
+        for name in chain.stage_seconds: chain.stage_seconds[name] = 0.0
+        chain.frames = 0
+        start = time.perf_counter()
+        for i in range(frames): chain.process(inputs[i % 256])
+        elapsed = time.perf_counter() - start
+        tracemalloc.start(); before = tracemalloc.get_traced_memory()[0] # A parte: tracemalloc rallenta le misure
+        for i in range(1000): chain.process(inputs[i % 256])
+        grown = tracemalloc.get_traced_memory()[0] - before; tracemalloc.stop()
+        print(f"{channels} canali, {frames} frame: {elapsed / frames * 1e6:.1f} us/frame totali, memoria cresciuta {grown} byte")
+        print(f"  {chain.format_stats()}")
+
+    # Stesso segnale a due volumi (sala silenziosa e club): l'AGC porta le uscite allo stesso livello
+    outputs = []
+    for volume in (0.05, 0.8):
+        chain = DSPChain(1, frame_rate, [NoiseGate(1, frame_rate, 0.01), AutoGain(1, frame_rate), Smoother(1, frame_rate)])
+        pulses = (np.arange(int(frame_rate * 20)) % 43 < 6) * volume # Cassa a 120 BPM
+        peaks = [chain.process((value,))[0] for value in pulses][-int(frame_rate * 5):]
+        outputs.append(max(peaks))
+    print(f"AGC: picco in uscita dopo 15 s con ingresso 0.05 -> {outputs[0]:.2f}, con ingresso 0.8 -> {outputs[1]:.2f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AUDIO ENGINE - Analisi audio in tempo reale per la modulazione degli effetti.
+Il callback di cattura copia i campioni in un ring buffer preallocato; un thread di analisi elabora ogni hop
+(finestra di Hann, FFT reale, energie in bande logaritmiche con un'unica riduzione vettoriale) riusando sempre
+gli stessi array, quindi il percorso per frame non alloca buffer. I risultati vengono pubblicati senza lock
+scambiando il riferimento a un doppio buffer. In modalità inline l'analisi gira direttamente nel callback di
+cattura (nessun passaggio di thread né attese); per ogni frame si misura la latenza dall'arrivo dei campioni alla
+fine dei listener. Eseguito come script misura i tempi per chunk su file WAV/FLAC e le latenze per modalità.
+"""
+
+import os
+import sys
+import math
+import time
+import tempfile
+import threading
+import traceback
+import tracemalloc
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from audio_sources import SyntheticAudioSource, read_audio_file, write_wav # Usati dal benchmark
+
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_HOP_SIZE = 1024
+DEFAULT_WINDOW_SIZE = 2048 # Due hop: risoluzione di ~21 Hz sui bassi a 44.1 kHz
+DEFAULT_BAND_COUNT = 4
+DEFAULT_BAND_RANGE = (30.0, 16000.0)
+DEFAULT_BASS_RANGE = (20.0, 250.0)
+DEFAULT_RING_SECONDS = 2.0
+DEFAULT_LEVEL_FLOOR_DB = -60.0 # Livello mappato a 0 (0 dBFS è mappato a 1)
+DEFAULT_LATENCY_HISTORY = 4096 # Ultime misure di latenza conservate per i percentili
+FEED_HISTORY = 256 # Chunk ricordati (fine nel ring, istante di arrivo) per datare i frame
+POWER_EPSILON = 1e-12
+
+
+class LatencyStats:
+    """Storico circolare preallocato di latenze in secondi: record() non alloca, i percentili si calcolano a richiesta."""
+
+    def __init__(self, capacity=DEFAULT_LATENCY_HISTORY):
+        self.values = np.zeros(int(capacity))
+        self.count = 0
+
+    def record(self, seconds):
+        self.values[self.count % len(self.values)] = seconds
+        self.count += 1
+
+    def reset(self):
+        self.count = 0
+
+    def percentiles(self, points=(50, 95, 99)):
+        """Percentili (in secondi) delle misure conservate; None se non ci sono misure."""
+        if self.count == 0:
+            return None
+        return np.percentile(self.values[:min(self.count, len(self.values))], points).tolist()
+
+    def format(self, label="latenza"):
+        result = self.percentiles((50, 95, 99, 100))
+        if result is None:
+            return f"{label}: nessuna misura"
+        p50, p95, p99, worst = (value * 1000 for value in result)
+        return f"{label} p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms, max {worst:.2f} ms ({self.count} frame)"
+
+
+class AudioRingBuffer:
+    """Ring buffer a singolo produttore/singolo consumatore: il produttore scrive i dati e solo dopo avanza 'written'."""
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.data = np.zeros(self.capacity, dtype=np.float32)
+        self.written = 0 # Campioni scritti dall'avvio (cresce sempre; la posizione nel buffer è written % capacity)
+
+    def write(self, samples):
+        """Copia i campioni nel buffer (chiamato dal callback audio). Tiene solo gli ultimi 'capacity' campioni."""
+        count = len(samples)
+        if count > self.capacity:
+            samples = samples[-self.capacity:]; skipped = count - self.capacity; count = self.capacity
+        else:
+            skipped = 0
+        start = (self.written + skipped) % self.capacity
+        first = min(count, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        if first < count: self.data[:count - first] = samples[first:]
+        self.written += skipped + count # Pubblicazione: il consumatore vede i nuovi campioni solo da qui
+
+    def read_into(self, out, end):
+        """Copia in 'out' i len(out) campioni che terminano alla posizione assoluta 'end'."""
+        size = len(out)
+        start = (end - size) % self.capacity
+        first = min(size, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        if first < size: out[first:] = self.data[:size - first]
+
+    def reset(self):
+        self.data.fill(0.0); self.written = 0
+
+
+class AudioAnalysisEngine:
+    """
+    Motore di analisi: feed() dal callback di cattura, analisi per hop in un thread dedicato (start/stop), nel
+    callback stesso (inline=True, dopo start) oppure sincrona con process_available(). Con window_size > hop_size
+    le finestre si sovrappongono. Valori pubblicati: audio_level (RMS), bass_level, frequency_data (bande 0..1).
+    """
+
+    WAIT_TIMEOUT_SECONDS = 0.1 # Risveglio massimo del thread di analisi senza nuovi campioni
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, hop_size=DEFAULT_HOP_SIZE, window_size=DEFAULT_WINDOW_SIZE,
+                 band_count=DEFAULT_BAND_COUNT, band_range=DEFAULT_BAND_RANGE, bass_range=DEFAULT_BASS_RANGE,
+                 noise_threshold=0.0, level_floor_db=DEFAULT_LEVEL_FLOOR_DB, ring_seconds=DEFAULT_RING_SECONDS,
+                 inline=False, latency_history=DEFAULT_LATENCY_HISTORY):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy non disponibile: analisi audio disabilitata")
+        self.sample_rate = int(sample_rate)
+        self.hop_size = int(hop_size)
+        self.window_size = max(int(window_size), self.hop_size)
+        self.noise_threshold = float(noise_threshold)
+        self.level_floor_db = float(level_floor_db)
+        self.ring = AudioRingBuffer(max(int(sample_rate * ring_seconds), self.window_size * 4))
+        self.read_position = 0 # Fine (assoluta) dell'ultimo hop analizzato
+
+        # Buffer di lavoro riusati a ogni frame. In float64: la FFT float32 di numpy alloca buffer temporanei interni
+        self.window = np.hanning(self.window_size)
+        self.frame = np.zeros(self.window_size)
+        self.windowed = np.zeros(self.window_size)
+        bins = self.window_size // 2 + 1
+        self.spectrum = np.zeros(bins, dtype=np.complex128)
+        self.magnitude = np.zeros(bins)
+        self.power = np.zeros(bins)
+        self.fft_out = self.spectrum if self._rfft_supports_out() else None
+        # Normalizzazione: una sinusoide a fondo scala concentra in banda potenza ~1
+        self.power_scale = 4.0 / float(self.window.sum()) ** 2
+
+        self.frequencies = np.fft.rfftfreq(self.window_size, 1.0 / self.sample_rate)
+        self.band_edges = self._band_edges(band_count, band_range)
+        first, last = int(self.band_edges[0]), int(self.band_edges[-1])
+        self.band_power = self.power[first:last] # Vista fissa: la riduzione per bande non crea viste per frame
+        self.band_starts = (self.band_edges[:-1] - first).astype(np.intp)
+        self.band_energy = np.zeros(len(self.band_starts))
+        bass_first, bass_last = self._bin_range(bass_range)
+        self.bass_power = self.power[bass_first:bass_last]
+
+        # Doppio buffer di pubblicazione: i lettori vedono sempre un array completo
+        self.published_bands = [np.zeros(len(self.band_starts)) for _ in range(2)]
+        self.back_index = 0
+        self.frequency_data = self.published_bands[1]
+        self.bass_level = 0.0
+        self.audio_level = 0.0
+        self.frame_count = 0
+        self.frame_listeners = [] # Analizzatori chiamati a ogni frame con (engine, end): vedi add_frame_listener
+
+        # Latenza: ogni chunk registra la sua fine nel ring e l'istante di arrivo (array preallocati, SPSC come il ring)
+        self.feed_ends = np.zeros(FEED_HISTORY, dtype=np.int64)
+        self.feed_times = np.zeros(FEED_HISTORY)
+        self.feed_count = 0
+        self.feed_cursor = 0
+        self.frame_arrival = 0.0 # Arrivo (perf_counter) del chunk che ha completato l'ultimo frame
+        self.latency = LatencyStats(latency_history) # Arrivo dei campioni -> fine analisi e listener
+
+        self.stats = {'frames': 0, 'overruns': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+        self.inline = inline
+        self.running = False
+        self.data_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _rfft_supports_out(self):
+        """numpy >= 2.0 accetta 'out' in rfft (nessuna allocazione); prima si copia il risultato."""
+        try:
+            np.fft.rfft(self.windowed, out=self.spectrum); return True
+        except TypeError:
+            return False
+
+    def _bin_range(self, freq_range):
+        low = int(np.searchsorted(self.frequencies, freq_range[0]))
+        high = int(np.searchsorted(self.frequencies, freq_range[1], side='right'))
+        low = min(max(1, low), len(self.frequencies) - 1)
+        return low, max(low + 1, min(high, len(self.frequencies)))
+
+    def _band_edges(self, band_count, band_range):
+        """Bordi (in bin) di bande logaritmiche, resi strettamente crescenti (almeno un bin per banda)."""
+        low, high = self._bin_range(band_range)
+        edges = np.round(np.geomspace(max(low, 1), high, int(band_count) + 1)).astype(np.intp)
+        for i in range(1, len(edges)):
+            edges[i] = max(edges[i], edges[i - 1] + 1)
+        edges[-1] = min(edges[-1], len(self.frequencies))
+        return edges
+
+    def _to_level(self, power):
+        """Potenza normalizzata -> livello 0..1 su scala dB (floor..0 dBFS)."""
+        if power <= POWER_EPSILON:
+            return 0.0
+        level = (10.0 * math.log10(power) - self.level_floor_db) / -self.level_floor_db
+        return float(min(1.0, max(0.0, level)))
+
+    # --- Lato cattura ---
+    def feed(self, samples):
+        """Accoda campioni mono float32 (dal callback audio o da un file); in modalità inline li analizza subito."""
+        self.ring.write(samples)
+        slot = self.feed_count % FEED_HISTORY
+        self.feed_ends[slot] = self.ring.written; self.feed_times[slot] = time.perf_counter()
+        self.feed_count += 1 # Pubblicazione della voce, dopo averla scritta
+        if self.inline and self.running: self.process_available()
+        else: self.data_event.set()
+
+    # --- Lato analisi ---
+    def process_available(self):
+        """Analizza tutti gli hop completi disponibili; restituisce il numero di frame elaborati."""
+        written = self.ring.written
+        if written - self.read_position > self.ring.capacity - self.window_size:
+            self.stats['overruns'] += 1 # Analisi in ritardo: salta all'ultimo hop ancora integro nel ring
+            self.read_position = written - (written - self.read_position) % self.hop_size - self.hop_size
+        processed = 0
+        while written - self.read_position >= self.hop_size:
+            self.read_position += self.hop_size
+            self.analyze_frame(self.read_position)
+            processed += 1
+        return processed
+
+    def analyze_frame(self, end):
+        """Analisi di una finestra che termina alla posizione assoluta 'end' (nessuna allocazione di array)."""
+        start_time = time.perf_counter()
+        frame = self.frame
+        self.ring.read_into(frame, end)
+        hop = frame[-self.hop_size:]
+        rms = float(np.sqrt(np.dot(hop, hop) / self.hop_size))
+        np.multiply(frame, self.window, out=self.windowed)
+        if self.fft_out is not None: np.fft.rfft(self.windowed, out=self.fft_out)
+        else: self.spectrum[:] = np.fft.rfft(self.windowed)
+        np.abs(self.spectrum, out=self.magnitude)
+        np.multiply(self.magnitude, self.magnitude, out=self.power)
+        self.power *= self.power_scale
+
+        bands = self.published_bands[self.back_index]
+        np.add.reduceat(self.band_power, self.band_starts, out=self.band_energy)
+        np.maximum(self.band_energy, POWER_EPSILON, out=bands)
+        np.log10(bands, out=bands)
+        bands *= 10.0 / -self.level_floor_db
+        bands += 1.0
+        np.clip(bands, 0.0, 1.0, out=bands)
+
+        gated = rms < self.noise_threshold
+        if gated: bands.fill(0.0)
+        self.bass_level = 0.0 if gated else self._to_level(float(self.bass_power.sum()))
+        self.audio_level = 0.0 if gated else rms
+        self.frequency_data = bands # Scambio atomico del riferimento
+        self.back_index ^= 1
+        self.frame_count += 1
+        self.frame_arrival = self._arrival_time(end)
+        for listener in self.frame_listeners: listener(self, end)
+
+        now = time.perf_counter()
+        if self.feed_count: self.latency.record(now - self.frame_arrival)
+        elapsed = now - start_time
+        self.stats['frames'] += 1; self.stats['total_seconds'] += elapsed
+        if elapsed > self.stats['max_seconds']: self.stats['max_seconds'] = elapsed
+
+    def _arrival_time(self, end):
+        """Istante di arrivo del chunk che contiene il campione end-1 (i frame sono analizzati in ordine)."""
+        count = self.feed_count
+        cursor = max(self.feed_cursor, count - FEED_HISTORY)
+        while cursor < count - 1 and self.feed_ends[cursor % FEED_HISTORY] < end: cursor += 1
+        self.feed_cursor = cursor
+        return float(self.feed_times[cursor % FEED_HISTORY])
+
+    def add_frame_listener(self, listener):
+        """Registra un analizzatore per frame (es. TempoTracker): legge magnitude/power senza copiarli."""
+        if listener not in self.frame_listeners:
+            self.frame_listeners = self.frame_listeners + [listener] # Nuova lista: il thread di analisi non vede modifiche a metà
+
+    def remove_frame_listener(self, listener):
+        self.frame_listeners = [item for item in self.frame_listeners if item is not listener]
+
+    def snapshot(self):
+        """Valori correnti (livello, bassi, bande come lista) per chi li pubblica fuori dal thread di analisi."""
+        return self.audio_level, self.bass_level, self.frequency_data.tolist()
+
+    def format_stats(self):
+        frames = max(1, self.stats['frames'])
+        return (f"frame analizzati {self.stats['frames']}, medio {self.stats['total_seconds'] / frames * 1000:.3f} ms, "
+                f"max {self.stats['max_seconds'] * 1000:.3f} ms, ritardi recuperati {self.stats['overruns']}; "
+                + self.latency.format("latenza ingresso-analisi"))
+
+    def start(self):
+        """Avvia l'analisi: thread dedicato risvegliato da feed(), oppure (inline) direttamente nel callback."""
+        if self.running:
+            return
+        self.stop_event.clear()
+        self.read_position = self.ring.written
+        self.feed_cursor = self.feed_count
+        self.running = True
+        if self.inline:
+            return
+        self.thread = threading.Thread(target=self._run, name="audio-analysis", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.stop_event.set(); self.data_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=self.WAIT_TIMEOUT_SECONDS * 10)
+        self.thread = None
+
+    def _run(self):
+        try:
+            while not self.stop_event.is_set():
+                self.data_event.wait(self.WAIT_TIMEOUT_SECONDS)
+                self.data_event.clear()
+                self.process_available()
+        except Exception as e:
+            print(f"Errore nel thread di analisi audio: {e}")
+            traceback.print_exc()
+
+
+# --- BENCHMARK ---
+def write_test_wav(filepath, seconds=10.0, sample_rate=DEFAULT_SAMPLE_RATE, bpm=120.0):
+    """WAV di prova: click a BPM noto, sweep 40 Hz - 8 kHz e rumore (vedi audio_sources.SyntheticAudioSource)."""
+    source = SyntheticAudioSource(sample_rate=sample_rate, realtime=False, bpm=bpm, duration=seconds,
+                                  sweep_range=(40.0, 8000.0), noise_level=0.05)
+    write_wav(filepath, np.concatenate(list(source.iter_chunks())), sample_rate)
+
+
+def run_benchmark(wav_paths=None, hop_size=DEFAULT_HOP_SIZE, window_size=DEFAULT_WINDOW_SIZE):
+    """Alimenta il motore con i file audio indicati (o uno generato) a chunk di 'hop_size' e misura tempi e allocazioni."""
+    temp_path = None
+    if not wav_paths:
+        temp_path = os.path.join(tempfile.mkdtemp(prefix="audio_engine_bench_"), "test.wav")
+        write_test_wav(temp_path); wav_paths = [temp_path]
+    for path in wav_paths:
+        samples, rate = read_audio_file(path)
+        engine = AudioAnalysisEngine(sample_rate=rate, hop_size=hop_size, window_size=window_size)
+        chunks = len(samples) // hop_size
+        timings = np.zeros(chunks)
+        warmup = min(chunks, 16)
+        for i in range(warmup):
+            engine.feed(samples[i * hop_size:(i + 1) * hop_size]); engine.process_available()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(warmup, chunks):
+            chunk = samples[i * hop_size:(i + 1) * hop_size]
+            t0 = time.perf_counter()
+            engine.feed(chunk); engine.process_available()
+            timings[i] = time.perf_counter() - t0
+        grown, peak = tracemalloc.get_traced_memory()[0] - before, tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+        measured = np.sort(timings[warmup:]) * 1000
+        if not len(measured):
+            print(f"{path}: troppo corto per il benchmark"); continue
+        print(f"{os.path.basename(path)}: {rate} Hz, {chunks} chunk da {hop_size} campioni (finestra {window_size})")
+        print(f"  per chunk: medio {measured.mean():.3f} ms, p99 {measured[int(len(measured) * 0.99) - 1]:.3f} ms, "
+              f"max {measured[-1]:.3f} ms (budget reale {hop_size / rate * 1000:.1f} ms)")
+        print(f"  memoria tracciata durante l'analisi: crescita {grown} byte, picco {peak} byte")
+        print(f"  ultimo frame: livello {engine.audio_level:.3f}, bassi {engine.bass_level:.3f}, "
+              f"bande {[round(v, 3) for v in engine.frequency_data.tolist()]}")
+    if temp_path:
+        os.remove(temp_path); os.rmdir(os.path.dirname(temp_path))
+
+
+def run_latency_benchmark(seconds=3.0, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Latenza arrivo dei campioni -> parametri pronti con una sorgente sintetica in tempo reale, per tre modalità:
+    ciclo di polling ogni 100 ms (com'era l'app), thread di analisi con pubblicazione per frame, analisi inline.
+    """
+    configs = [("polling 100 ms", 1024, 1024, False, 0.1), ("thread di analisi", 256, 512, False, None),
+               ("inline nel callback", 256, 512, True, None), ("inline, hop 256", 256, 256, True, None)]
+    print(f"Latenza ingresso-pubblicazione ({seconds:.0f} s per modalità, finestra {DEFAULT_WINDOW_SIZE})")
+    for label, chunk_size, hop_size, inline, poll_seconds in configs:
+        engine = AudioAnalysisEngine(sample_rate=sample_rate, hop_size=hop_size, inline=inline)
+        source = SyntheticAudioSource(sample_rate=sample_rate, chunk_size=chunk_size, realtime=True, duration=seconds, noise_level=0.02)
+        latency = engine.latency
+        engine.start(); source.start(engine.feed)
+        if poll_seconds: # Ogni frame diventa visibile solo al giro successivo del ciclo
+            latency = LatencyStats(); arrivals = []
+            engine.add_frame_listener(lambda engine, end: arrivals.append(engine.frame_arrival))
+            while not source.finished.wait(poll_seconds):
+                now = time.perf_counter(); pending, arrivals[:] = arrivals[:], []
+                for arrival in pending: latency.record(now - arrival)
+        source.finished.wait(); engine.stop()
+        print(f"  {label:<20} chunk {chunk_size:>4}, hop {hop_size:>4}: {latency.format('')} "
+              f"+ buffer di cattura {chunk_size / sample_rate * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    run_benchmark(sys.argv[1:])
+    run_latency_benchmark()
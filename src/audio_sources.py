@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AUDIO SOURCES - Sorgenti audio intercambiabili per il motore di analisi.
+Tutte consegnano chunk mono float32 a un callback on_samples(chunk) (tipicamente AudioAnalysisEngine.feed):
+dispositivo PyAudio, file WAV/FLAC (in tempo reale oppure alla massima velocità) e un generatore sintetico con
+click a BPM noto e sweep di frequenza. Le sorgenti non in tempo reale si leggono anche in modo sincrono con
+iter_chunks(), per analisi deterministiche e benchmark senza scheda audio.
+Eseguito come script misura il throughput del motore su una sorgente sintetica e sui file indicati.
+"""
+
+import os
+import sys
+import time
+import wave
+import threading
+import traceback
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import pyaudio
+    PYAUDIO_AVAILABLE = True
+except ImportError:
+    PYAUDIO_AVAILABLE = False
+
+try:
+    import soundfile # Per FLAC/OGG; i WAV PCM usano il modulo standard 'wave'
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_CHUNK_SIZE = 1024
+WAV_EXTENSIONS = ('.wav', '.wave')
+
+
+def pcm_to_float(raw, sample_width, channels):
+    """Converte frame PCM interi (8/16/24/32 bit) in campioni mono float32 (media dei canali)."""
+    if sample_width == 3:
+        bytes_view = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        samples = (bytes_view[:, 0].astype(np.int32) | (bytes_view[:, 1].astype(np.int32) << 8)
+                   | (bytes_view[:, 2].astype(np.int8).astype(np.int32) << 16)).astype(np.float32) / 8388608.0
+    elif sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    else:
+        dtype = {2: np.int16, 4: np.int32}[sample_width]
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / float(np.iinfo(dtype).max)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return samples
+
+
+def read_audio_file(filepath):
+    """Legge un intero file audio e restituisce (campioni mono float32, sample rate)."""
+    source = FileAudioSource(filepath, chunk_size=1 << 16, realtime=False)
+    chunks = list(source.iter_chunks())
+    return (np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)), source.sample_rate
+
+
+def write_wav(filepath, samples, sample_rate=DEFAULT_SAMPLE_RATE):
+    """Scrive campioni float (-1..1) in un WAV mono a 16 bit."""
+    with wave.open(filepath, 'wb') as wav:
+        wav.setnchannels(1); wav.setsampwidth(2); wav.setframerate(sample_rate)
+        wav.writeframes((np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
+
+
+class AudioSource:
+    """
+    Sorgente a chunk: le sottoclassi implementano iter_chunks(). start(on_samples) la legge in un thread,
+    rispettando il tempo reale se 'realtime' è True; 'finished' viene segnalato a fine sorgente.
+    """
+
+    name = "Sorgente"
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, chunk_size=DEFAULT_CHUNK_SIZE, realtime=True):
+        self.sample_rate = int(sample_rate)
+        self.chunk_size = int(chunk_size)
+        self.realtime = realtime
+        self.samples_delivered = 0
+        self.finished = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def iter_chunks(self):
+        raise NotImplementedError
+
+    def start(self, on_samples, on_finished=None):
+        """Avvia la consegna dei chunk a on_samples in un thread dedicato."""
+        if self.thread is not None:
+            return
+        self.stop_event.clear(); self.finished.clear()
+        self.thread = threading.Thread(target=self._run, args=(on_samples, on_finished), name="audio-source", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.thread = None
+
+    def _run(self, on_samples, on_finished):
+        started = time.perf_counter(); delivered = 0
+        try:
+            for chunk in self.iter_chunks():
+                if self.stop_event.is_set(): break
+                if self.realtime:
+                    wait = started + delivered / self.sample_rate - time.perf_counter()
+                    if wait > 0 and self.stop_event.wait(wait): break
+                on_samples(chunk)
+                delivered += len(chunk); self.samples_delivered = delivered
+        except Exception as e:
+            print(f"Errore nella sorgente audio '{self.name}': {e}")
+            traceback.print_exc()
+        self.finished.set()
+        if on_finished is not None and not self.stop_event.is_set(): on_finished()
+
+
+class FileAudioSource(AudioSource):
+    """File WAV PCM (modulo 'wave') o FLAC/OGG (libreria opzionale 'soundfile'), letto a chunk senza caricarlo tutto."""
+
+    def __init__(self, filepath, chunk_size=DEFAULT_CHUNK_SIZE, realtime=True, loop=False):
+        self.filepath = filepath
+        self.loop = loop
+        self.name = os.path.basename(filepath)
+        self.use_wave = filepath.lower().endswith(WAV_EXTENSIONS)
+        if self.use_wave:
+            with wave.open(filepath, 'rb') as wav: sample_rate = wav.getframerate()
+        elif SOUNDFILE_AVAILABLE:
+            sample_rate = soundfile.info(filepath).samplerate
+        else:
+            raise RuntimeError(f"Formato non supportato senza la libreria 'soundfile': {filepath}")
+        super().__init__(sample_rate, chunk_size, realtime)
+
+    def iter_chunks(self):
+        while True:
+            yield from (self._iter_wave() if self.use_wave else self._iter_soundfile())
+            if not self.loop or self.stop_event.is_set(): break
+
+    def _iter_wave(self):
+        with wave.open(self.filepath, 'rb') as wav:
+            channels, width = wav.getnchannels(), wav.getsampwidth()
+            while True:
+                raw = wav.readframes(self.chunk_size)
+                if not raw: break
+                yield pcm_to_float(raw, width, channels)
+
+    def _iter_soundfile(self):
+        for block in soundfile.blocks(self.filepath, blocksize=self.chunk_size, dtype='float32', always_2d=True):
+            yield block.mean(axis=1, dtype=np.float32) if block.shape[1] > 1 else block[:, 0].copy()
+
+
+class SyntheticAudioSource(AudioSource):
+    """
+    Segnale di prova: click a 'bpm' (accento sul primo beat della battuta), sweep logaritmico opzionale
+    e rumore. beat_times() restituisce gli istanti esatti dei click per valutare la rilevazione dei beat.
+    """
+
+    name = "Segnale di prova"
+    CLICK_SECONDS = 0.02 # Durata del click (decadimento esponenziale)
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, chunk_size=DEFAULT_CHUNK_SIZE, realtime=True, bpm=120.0,
+                 duration=None, beats_per_bar=4, click_freq=1000.0, click_level=0.8, sweep_range=None,
+                 sweep_seconds=4.0, sweep_level=0.2, noise_level=0.0, offset=0.0, seed=0):
+        super().__init__(sample_rate, chunk_size, realtime)
+        self.bpm = float(bpm)
+        self.duration = duration # None = infinito
+        self.beats_per_bar = beats_per_bar
+        self.click_freq = click_freq
+        self.click_level = click_level
+        self.sweep_range = sweep_range # (f0, f1) in Hz, oppure None
+        self.sweep_seconds = sweep_seconds
+        self.sweep_level = sweep_level
+        self.noise_level = noise_level
+        self.offset = offset # Istante del primo click (secondi)
+        self.rng = np.random.default_rng(seed)
+
+    def beat_times(self, duration=None):
+        """Istanti (secondi) dei click generati entro 'duration'."""
+        duration = self.duration if duration is None else duration
+        return np.arange(self.offset, duration, 60.0 / self.bpm)
+
+    def iter_chunks(self):
+        total = None if self.duration is None else int(self.duration * self.sample_rate)
+        position = 0; sweep_phase = 0.0
+        beat_samples = 60.0 / self.bpm * self.sample_rate
+        click_decay = 1.0 / (self.CLICK_SECONDS * self.sample_rate / 5.0)
+        while total is None or position < total:
+            count = self.chunk_size if total is None else min(self.chunk_size, total - position)
+            n = np.arange(position, position + count, dtype=np.float64)
+            chunk = np.zeros(count)
+            # Click: campioni trascorsi dall'ultimo beat (negativi prima del primo)
+            since = n - self.offset * self.sample_rate
+            beat_index = np.floor(since / beat_samples)
+            elapsed = since - beat_index * beat_samples
+            active = (since >= 0) & (elapsed < self.CLICK_SECONDS * self.sample_rate)
+            if active.any():
+                accent = np.where(beat_index % self.beats_per_bar == 0, 1.0, 0.6)
+                click = accent * np.exp(-elapsed * click_decay) * np.sin(2 * np.pi * self.click_freq * elapsed / self.sample_rate)
+                chunk += np.where(active, click * self.click_level, 0.0)
+            if self.sweep_range:
+                f0, f1 = self.sweep_range
+                t = (n / self.sample_rate) % self.sweep_seconds
+                freq = f0 * (f1 / f0) ** (t / self.sweep_seconds)
+                phase = sweep_phase + np.cumsum(2 * np.pi * freq / self.sample_rate)
+                sweep_phase = float(phase[-1]) % (2 * np.pi)
+                chunk += self.sweep_level * np.sin(phase)
+            if self.noise_level:
+                chunk += self.noise_level * self.rng.standard_normal(count)
+            position += count
+            yield chunk.astype(np.float32)
+
+
+class PyAudioSource(AudioSource):
+    """Dispositivo di ingresso PyAudio in modalità callback: i chunk arrivano dal thread audio di PortAudio."""
+
+    name = "Dispositivo audio"
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, chunk_size=DEFAULT_CHUNK_SIZE, channels=1, device_index=None):
+        if not PYAUDIO_AVAILABLE:
+            raise RuntimeError("pyaudio non disponibile: ingresso da dispositivo disabilitato")
+        super().__init__(sample_rate, chunk_size, realtime=True)
+        self.channels = channels
+        self.device_index = device_index
+        self.pyaudio_instance = None
+        self.stream = None
+
+    @staticmethod
+    def list_input_devices():
+        """Elenco (indice, nome) dei dispositivi con almeno un canale di ingresso."""
+        if not PYAUDIO_AVAILABLE:
+            return []
+        instance = pyaudio.PyAudio()
+        try:
+            devices = [instance.get_device_info_by_index(i) for i in range(instance.get_device_count())]
+            return [(int(info['index']), info['name']) for info in devices if info.get('maxInputChannels', 0) > 0]
+        finally:
+            instance.terminate()
+
+    @classmethod
+    def find_input_device(cls, keywords):
+        """Indice del primo dispositivo di ingresso il cui nome contiene una delle parole chiave (None = predefinito)."""
+        for index, name in cls.list_input_devices():
+            if any(keyword in name.lower() for keyword in keywords): return index
+        return None
+
+    def iter_chunks(self):
+        raise NotImplementedError("PyAudioSource consegna i chunk solo in tempo reale tramite start()")
+
+    def start(self, on_samples, on_finished=None):
+        if self.stream is not None:
+            return
+        channels = self.channels
+
+        def callback(in_data, frame_count, time_info, status):
+            on_samples(np.frombuffer(in_data, dtype=np.float32)[::channels]) # Primo canale, nessuna copia intermedia
+            return (None, pyaudio.paContinue)
+
+        self.finished.clear()
+        self.pyaudio_instance = pyaudio.PyAudio()
+        try:
+            self.stream = self.pyaudio_instance.open(
+                format=pyaudio.paFloat32, channels=channels, rate=self.sample_rate, input=True,
+                frames_per_buffer=self.chunk_size, input_device_index=self.device_index, stream_callback=callback)
+            self.stream.start_stream()
+        except Exception:
+            self.stop(); raise
+
+    def stop(self):
+        try:
+            if self.stream is not None:
+                self.stream.stop_stream(); self.stream.close()
+            if self.pyaudio_instance is not None: self.pyaudio_instance.terminate()
+        finally:
+            self.stream = None; self.pyaudio_instance = None
+            self.finished.set()
+
+
+def run_offline(source, engine):
+    """Analisi deterministica: alimenta il motore in modo sincrono con tutti i chunk della sorgente."""
+    frames = 0
+    for chunk in source.iter_chunks():
+        engine.feed(chunk); frames += engine.process_available()
+    return frames
+
+
+# --- BENCHMARK ---
+def run_benchmark(paths=None, seconds=30.0):
+    """Throughput del motore di analisi su sorgenti non in tempo reale (multipli del tempo reale)."""
+    from audio_engine import AudioAnalysisEngine
+    sources = [SyntheticAudioSource(realtime=False, bpm=128.0, duration=seconds, sweep_range=(40.0, 8000.0), noise_level=0.02)]
+    sources.extend(FileAudioSource(path, realtime=False) for path in paths or [])
+    for source in sources:
+        engine = AudioAnalysisEngine(sample_rate=source.sample_rate, hop_size=source.chunk_size)
+        start = time.perf_counter()
+        frames = run_offline(source, engine)
+        elapsed = time.perf_counter() - start
+        audio_seconds = frames * source.chunk_size / source.sample_rate
+        print(f"{source.name}: {audio_seconds:.1f} s di audio, {frames} frame in {elapsed * 1000:.0f} ms "
+              f"({audio_seconds / max(elapsed, 1e-9):.0f}x tempo reale) - {engine.format_stats()}")
+
+
+if __name__ == "__main__":
+    run_benchmark(sys.argv[1:])
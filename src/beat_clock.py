@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BEAT CLOCK - Orologio dei beat agganciato in fase (PLL) per Beat Sync.
+Mantiene un periodo e un riferimento temporale da cui si ricavano in ogni istante fase del beat (0..1),
+posizione nella battuta e istante previsto del prossimo beat, indipendentemente dalla frequenza con cui
+viene interrogato. Viene corretto dai beat dello stimatore del tempo (pesati con la confidenza) e dal tap tempo,
+che ha la precedenza per qualche secondo. Eseguito come script simula convergenza e errore di fase.
+"""
+
+import sys
+import math
+import time
+import random
+import threading
+import statistics
+
+DEFAULT_BPM = 120.0
+DEFAULT_BEATS_PER_BAR = 4
+DEFAULT_BPM_RANGE = (60.0, 200.0)
+PHASE_GAIN = 0.25 # Frazione dell'errore di fase corretta a ogni beat osservato
+TEMPO_GAIN = 0.05 # Frazione dell'errore di fase trasferita al periodo (secondo ordine del PLL)
+TAP_PRIORITY_SECONDS = 8.0 # Dopo un tap, le osservazioni automatiche pesano meno
+TAP_PRIORITY_WEIGHT = 0.2
+
+
+class BeatClock:
+    """Orologio dei beat thread-safe. I tempi sono quelli di 'clock' (time.monotonic di default)."""
+
+    def __init__(self, bpm=DEFAULT_BPM, beats_per_bar=DEFAULT_BEATS_PER_BAR, bpm_range=DEFAULT_BPM_RANGE,
+                 phase_gain=PHASE_GAIN, tempo_gain=TEMPO_GAIN, tap_reset_seconds=2.0, min_taps=2, max_taps=8, clock=time.monotonic):
+        self.beats_per_bar = beats_per_bar
+        self.min_period = 60.0 / max(bpm_range)
+        self.max_period = 60.0 / min(bpm_range)
+        self.phase_gain = phase_gain
+        self.tempo_gain = tempo_gain
+        self.tap_reset_seconds = tap_reset_seconds
+        self.min_taps = min_taps
+        self.max_taps = max_taps
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.period = self._clamp_period(60.0 / bpm)
+        self.reference = clock() # Istante del beat 0
+        self.tap_times = []
+        self.last_tap = None
+        self.last_tap_beat = 0 # Indice del beat assegnato all'ultimo tap
+
+    def _clamp_period(self, period):
+        return min(self.max_period, max(self.min_period, period))
+
+    def _beats_at(self, t):
+        return (t - self.reference) / self.period
+
+    @property
+    def bpm(self):
+        return 60.0 / self.period
+
+    def state(self, t=None):
+        """Stato all'istante t: bpm, indice del beat, fase (0..1), posizione nella battuta e prossimo beat."""
+        with self.lock:
+            t = self.clock() if t is None else t
+            beats = self._beats_at(t)
+            index = math.floor(beats)
+            return {
+                "bpm": 60.0 / self.period, "beat_index": index, "beat_phase": beats - index,
+                "bar_position": beats % self.beats_per_bar, "next_beat_time": self.reference + (index + 1) * self.period,
+                "next_beat_in": self.reference + (index + 1) * self.period - t,
+            }
+
+    def set_tempo(self, bpm, weight=1.0):
+        """Avvicina il tempo a 'bpm' (weight 1 = subito) mantenendo continua la fase corrente."""
+        with self.lock:
+            now = self.clock()
+            beats = self._beats_at(now)
+            target = self._clamp_period(60.0 / bpm)
+            self.period += max(0.0, min(1.0, weight)) * (target - self.period)
+            self.reference = now - beats * self.period
+
+    def observe_beat(self, t, weight=1.0):
+        """Corregge fase e periodo con un beat osservato all'istante t (peso 0..1, es. la confidenza)."""
+        with self.lock:
+            if self.last_tap is not None and t - self.last_tap < TAP_PRIORITY_SECONDS:
+                weight *= TAP_PRIORITY_WEIGHT
+            beats = self._beats_at(t)
+            error = beats - round(beats) # In beat, tra -0.5 e 0.5: positivo = beat osservato in ritardo
+            beats -= self.phase_gain * weight * error # Posizione corretta all'istante t
+            self.period = self._clamp_period(self.period * (1.0 + self.tempo_gain * weight * error))
+            self.reference = t - beats * self.period # Riferimento ricalcolato su t: il nuovo periodo non sposta la fase
+            return error
+
+    def tap(self, t=None):
+        """
+        Tap tempo: ogni tap è un beat (il primo di una serie è l'inizio della battuta). Con almeno min_taps
+        il periodo diventa la mediana degli intervalli. Restituisce il BPM calcolato oppure None.
+        """
+        with self.lock:
+            t = self.clock() if t is None else t
+            if self.last_tap is None or t - self.last_tap > self.tap_reset_seconds:
+                self.tap_times = []
+            self.tap_times.append(t); self.tap_times = self.tap_times[-self.max_taps:]
+            bpm = None
+            if len(self.tap_times) >= self.min_taps:
+                intervals = [b - a for a, b in zip(self.tap_times, self.tap_times[1:])]
+                self.period = self._clamp_period(statistics.median(intervals))
+                bpm = 60.0 / self.period
+            if len(self.tap_times) == 1:
+                beat = round(self._beats_at(t) / self.beats_per_bar) * self.beats_per_bar # Primo tap = battere
+            else:
+                beat = self.last_tap_beat + max(1, round((t - self.last_tap) / self.period))
+            self.reference = t - beat * self.period
+            self.last_tap = t; self.last_tap_beat = beat
+            return bpm
+
+
+class TrackerClockFeed:
+    """
+    Listener del motore audio da registrare dopo il TempoTracker: a ogni beat previsto dallo stimatore
+    corregge l'orologio (convertendo il frame del beat nel tempo dell'orologio) e ne segue il tempo.
+    """
+
+    def __init__(self, tracker, beat_clock, min_confidence=0.2, tempo_weight=0.5):
+        self.tracker = tracker
+        self.beat_clock = beat_clock
+        self.min_confidence = min_confidence
+        self.tempo_weight = tempo_weight
+        self.beat_count = tracker.beat_count
+
+    def __call__(self, engine, end):
+        tracker = self.tracker
+        if tracker.beat_count == self.beat_count:
+            return
+        self.beat_count = tracker.beat_count
+        if tracker.bpm <= 0 or tracker.confidence < self.min_confidence or tracker.last_beat_frame is None:
+            return
+        now = self.beat_clock.clock()
+        frames_ago = tracker.frames - tracker.last_beat_frame # Il frame più recente corrisponde a 'adesso'
+        beat_time = now - frames_ago * tracker.hop_size / tracker.sample_rate - tracker.latency_seconds
+        self.beat_clock.set_tempo(tracker.bpm, self.tempo_weight * tracker.confidence)
+        self.beat_clock.observe_beat(beat_time, tracker.confidence)
+
+
+# --- SIMULAZIONE ---
+class _ManualClock:
+    def __init__(self): self.now = 0.0
+    def __call__(self): return self.now
+
+
+def run_simulation(true_bpm=128.0, start_bpm=120.0, seconds=30.0, jitter=0.01, miss_rate=0.2, seed=1):
+    """Beat osservati con jitter e perdite: convergenza del PLL ed errore di fase; poi una serie di tap."""
+    rng = random.Random(seed)
+    clock = _ManualClock()
+    beat_clock = BeatClock(bpm=start_bpm, clock=clock)
+    true_period = 60.0 / true_bpm; true_offset = 0.137
+    errors = []; converged_at = None
+    for n in range(int(seconds / true_period)):
+        beat = true_offset + n * true_period
+        clock.now = beat + 0.05 # Osservazione consegnata con un po' di ritardo
+        if rng.random() >= miss_rate:
+            beat_clock.observe_beat(beat + rng.gauss(0.0, jitter), 0.8)
+            beat_clock.set_tempo(true_bpm * (1 + rng.gauss(0.0, 0.005)), 0.3) # Stima del tempo rumorosa
+        predicted = beat_clock.state(clock.now)["next_beat_time"] # Previsione del beat successivo
+        error = (predicted - beat + true_period / 2) % true_period - true_period / 2 # Errore rispetto al beat vero più vicino
+        errors.append(abs(error))
+        if converged_at is None and len(errors) >= 4 and max(errors[-4:]) < 0.02:
+            converged_at = beat
+    steady = sorted(errors[len(errors) // 2:])
+    print(f"PLL: {start_bpm:.0f} -> {true_bpm:.0f} BPM, jitter {jitter * 1000:.0f} ms, beat persi {miss_rate:.0%}")
+    print(f"  convergenza (errore < 20 ms): {'%.1f s' % converged_at if converged_at is not None else 'non raggiunta'}, "
+          f"BPM finale {beat_clock.bpm:.2f}")
+    print(f"  errore di previsione a regime: mediano {steady[len(steady) // 2] * 1000:.1f} ms, max {steady[-1] * 1000:.1f} ms")
+
+    clock.now += 5.0; tap_bpm = 96.0; taps = []
+    for n in range(6):
+        clock.now += 60.0 / tap_bpm + rng.gauss(0.0, 0.015)
+        taps.append(beat_clock.tap())
+    state = beat_clock.state()
+    print(f"  tap tempo a {tap_bpm:.0f} BPM (jitter 15 ms): BPM {taps[-1]:.2f}, posizione nella battuta {state['bar_position']:.2f}")
+
+
+if __name__ == "__main__":
+    run_simulation(*(float(arg) for arg in sys.argv[1:3]))
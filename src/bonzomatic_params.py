@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BONZOMATIC PARAMS - Pubblicazione asincrona dei parametri effetti/audio per Bonzomatic.
+Un thread dedicato scrive il file dei parametri al massimo 'rate_hz' volte al secondo: gli aggiornamenti
+arrivati nel frattempo vengono fusi (vale l'ultimo), le scritture identiche alla precedente vengono saltate
+e ogni scrittura è atomica (file temporaneo nella stessa cartella + os.replace), così il lettore non vede
+mai un file scritto a metà. In alternativa SharedParamChannel pubblica gli stessi parametri in un blocco binario a
+layout fisso mappato in memoria (mmap), protetto da un seqlock: nessuna serializzazione né I/O sul percorso caldo.
+Eseguito come script simula il trascinamento di uno slider (file JSON) e un lettore a frame rate (memoria condivisa).
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import tempfile
+import threading
+import traceback
+import multiprocessing
+
+DEFAULT_RATE_HZ = 60.0
+
+# --- Layout del blocco condiviso (little endian, nessun padding) ---
+# offset  tipo     campo
+#      0  char[4]  magic "BZPM"
+#      4  uint32   versione del layout (SHARED_PARAMS_VERSION)
+#      8  uint32   sequenza del seqlock: dispari = scrittura in corso, pari = dati coerenti
+#     12  uint32   numero di valori float che seguono
+#     16  float64  istante della scrittura (time.time(), secondi epoch)
+#     24  float32  valori nell'ordine di SHARED_PARAMS_FIELDS (fFreq1-4 compresi)
+#     88  uint32   numero N di bande dello spettro che seguono (0 = spettro non pubblicato)
+#     92  float32  spettro a N bande 0..1 (audio.spectrum), leggibile come texture 1D
+# Lettura lato consumatore: leggi la sequenza (se dispari riprova), copia i valori, rileggi la sequenza;
+# se è cambiata la copia è incoerente e va ripetuta. Un lettore C deve usare load con semantica acquire.
+SHARED_PARAMS_MAGIC = b"BZPM"
+SHARED_PARAMS_VERSION = 3 # 2: aggiunti beat_phase, bar_position, next_beat_in; 3: spettro a N bande in coda
+SHARED_PARAMS_FIELDS = (
+    ("audio", "bpm"), ("audio", "beat_detected"), ("audio", "audio_level"), ("audio", "bass_level"),
+    ("audio", "fFreq1"), ("audio", "fFreq2"), ("audio", "fFreq3"), ("audio", "fFreq4"),
+    ("audio", "beat_phase"), ("audio", "bar_position"), ("audio", "next_beat_in"),
+    ("effects", "zoom"), ("effects", "pan_x"), ("effects", "pan_y"), ("effects", "rotation"), ("effects", "distortion"),
+)
+SHARED_PARAMS_HEADER = struct.Struct("<4sIIId")
+SHARED_PARAMS_SEQUENCE = struct.Struct("<I")
+SHARED_PARAMS_SEQUENCE_OFFSET = 8
+SHARED_PARAMS_TIME = struct.Struct("<d")
+SHARED_PARAMS_TIME_OFFSET = 16
+SHARED_PARAMS_VALUES = struct.Struct(f"<{len(SHARED_PARAMS_FIELDS)}f")
+SHARED_PARAMS_SPECTRUM_COUNT = struct.Struct("<I")
+SHARED_PARAMS_SPECTRUM_COUNT_OFFSET = SHARED_PARAMS_HEADER.size + SHARED_PARAMS_VALUES.size
+SHARED_PARAMS_SPECTRUM_OFFSET = SHARED_PARAMS_SPECTRUM_COUNT_OFFSET + SHARED_PARAMS_SPECTRUM_COUNT.size
+SHARED_PARAMS_SIZE = SHARED_PARAMS_SPECTRUM_OFFSET # Dimensione senza spettro
+SHARED_PARAMS_READ_RETRIES = 100 # Tentativi del lettore prima di rinunciare (scrittore bloccato a metà)
+
+
+class ParamPublisher:
+    """Thread di pubblicazione dei parametri: publish() non blocca mai il chiamante (es. callback degli slider Tk)."""
+
+    STATS_FIELDS = ('published', 'written', 'coalesced', 'unchanged', 'dropped')
+
+    def __init__(self, filepath, rate_hz=DEFAULT_RATE_HZ, indent=None):
+        self.filepath = filepath
+        self.min_interval = 1.0 / rate_hz if rate_hz and rate_hz > 0 else 0.0
+        self.indent = indent
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.pending = None # Ultimo snapshot non ancora scritto
+        self.last_payload = None # Ultimo contenuto scritto su disco
+        self.last_write_time = 0.0
+        self.stats = {field: 0 for field in self.STATS_FIELDS}
+        self.thread = threading.Thread(target=self._run, name="bonzomatic-params", daemon=True)
+        self.thread.start()
+
+    def publish(self, params):
+        """Consegna un nuovo snapshot dei parametri; se il precedente non è ancora stato scritto viene sostituito."""
+        with self.lock:
+            if self.pending is not None: self.stats['coalesced'] += 1
+            self.pending = params
+            self.stats['published'] += 1
+        self.wakeup.set()
+
+    def get_stats(self):
+        """Copia dei contatori: pubblicati, scritti, fusi in una scrittura successiva, invariati (saltati), persi."""
+        with self.lock:
+            return dict(self.stats)
+
+    def format_stats(self):
+        stats = self.get_stats()
+        return (f"parametri pubblicati {stats['published']}, scritti {stats['written']}, fusi {stats['coalesced']}, "
+                f"invariati {stats['unchanged']}, persi {stats['dropped']}")
+
+    def stop(self, flush=True):
+        """Ferma il thread; con flush=True scrive prima l'ultimo snapshot in attesa."""
+        self.stop_event.set(); self.wakeup.set()
+        self.thread.join(timeout=2.0)
+        if flush: self._write_pending()
+        with self.lock:
+            if self.pending is not None:
+                self.stats['dropped'] += 1; self.pending = None
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.wakeup.wait()
+            if self.stop_event.is_set(): break
+            wait = self.last_write_time + self.min_interval - time.monotonic()
+            if wait > 0 and self.stop_event.wait(wait): break # Limite di frequenza: intanto gli aggiornamenti si accumulano
+            self.wakeup.clear()
+            self._write_pending()
+
+    def _write_pending(self):
+        with self.lock:
+            params, self.pending = self.pending, None
+        if params is None:
+            return
+        try:
+            payload = json.dumps(params, indent=self.indent)
+            if payload == self.last_payload:
+                with self.lock: self.stats['unchanged'] += 1
+                return
+            self._atomic_write(payload)
+            self.last_payload = payload
+            self.last_write_time = time.monotonic()
+            with self.lock: self.stats['written'] += 1
+        except Exception as e:
+            with self.lock: self.stats['dropped'] += 1
+            print(f"Errore durante la scrittura dei parametri di Bonzomatic ({self.filepath}): {e}")
+            traceback.print_exc()
+
+    def _atomic_write(self, payload):
+        """Scrive in un file temporaneo nella stessa cartella e lo sostituisce al file finale in un'unica operazione."""
+        directory = os.path.dirname(os.path.abspath(self.filepath))
+        fd, temp_path = tempfile.mkstemp(prefix=".params_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(temp_path, self.filepath)
+        except Exception:
+            try: os.remove(temp_path)
+            except OSError: pass
+            raise
+
+
+class SharedParamChannel:
+    """
+    Trasporto alternativo a ParamPublisher con la stessa interfaccia (publish/stop/format_stats): i parametri
+    vengono scritti direttamente nel blocco mappato, senza thread né serializzazione (pochi microsecondi).
+    """
+
+    STATS_FIELDS = ('published', 'written', 'unchanged', 'dropped')
+
+    def __init__(self, filepath, spectrum_size=0):
+        self.filepath = filepath
+        self.stats = {field: 0 for field in self.STATS_FIELDS}
+        self.sequence = 0
+        self.last_values = None
+        self.spectrum_size = int(spectrum_size)
+        self.spectrum_struct = struct.Struct(f"<{self.spectrum_size}f")
+        self.spectrum_padding = (0.0,) * self.spectrum_size
+        size = SHARED_PARAMS_SIZE + self.spectrum_struct.size
+        self.lock = threading.Lock() # Più scrittori (slider Tk, sincronizzazione audio) non devono intrecciare il seqlock
+        self.file = open(filepath, 'a+b') # Non tronca: un lettore può avere già mappato il file
+        self.file.truncate(size)
+        self.buffer = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_WRITE)
+        SHARED_PARAMS_HEADER.pack_into(self.buffer, 0, SHARED_PARAMS_MAGIC, SHARED_PARAMS_VERSION, self.sequence,
+                                       len(SHARED_PARAMS_FIELDS), 0.0)
+        SHARED_PARAMS_VALUES.pack_into(self.buffer, SHARED_PARAMS_HEADER.size, *([0.0] * len(SHARED_PARAMS_FIELDS)))
+        SHARED_PARAMS_SPECTRUM_COUNT.pack_into(self.buffer, SHARED_PARAMS_SPECTRUM_COUNT_OFFSET, self.spectrum_size)
+        self.spectrum_struct.pack_into(self.buffer, SHARED_PARAMS_SPECTRUM_OFFSET, *self.spectrum_padding)
+
+    def publish(self, params):
+        """Scrive i parametri (dizionario {"audio": {...}, "effects": {...}}) nel blocco condiviso."""
+        self.stats['published'] += 1
+        try:
+            values = tuple(float(params.get(group, {}).get(name, 0.0)) for group, name in SHARED_PARAMS_FIELDS)
+            if self.spectrum_size: # Spettro troncato o completato con zeri alla dimensione del blocco
+                values += (tuple(params.get("audio", {}).get("spectrum", ())) + self.spectrum_padding)[:self.spectrum_size]
+            with self.lock:
+                if values == self.last_values:
+                    self.stats['unchanged'] += 1
+                    return
+                self.write_values(values[:len(SHARED_PARAMS_FIELDS)], spectrum=values[len(SHARED_PARAMS_FIELDS):])
+                self.last_values = values
+        except Exception as e:
+            self.stats['dropped'] += 1
+            print(f"Errore durante la scrittura dei parametri condivisi di Bonzomatic ({self.filepath}): {e}")
+            traceback.print_exc()
+
+    def write_values(self, values, timestamp=None, spectrum=None):
+        """Scrittura protetta dal seqlock: sequenza dispari, dati, sequenza pari. 'spectrum' deve avere spectrum_size valori."""
+        buffer = self.buffer
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        SHARED_PARAMS_SEQUENCE.pack_into(buffer, SHARED_PARAMS_SEQUENCE_OFFSET, self.sequence)
+        SHARED_PARAMS_TIME.pack_into(buffer, SHARED_PARAMS_TIME_OFFSET, time.time() if timestamp is None else timestamp)
+        SHARED_PARAMS_VALUES.pack_into(buffer, SHARED_PARAMS_HEADER.size, *values)
+        if spectrum is not None:
+            self.spectrum_struct.pack_into(buffer, SHARED_PARAMS_SPECTRUM_OFFSET, *spectrum)
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        SHARED_PARAMS_SEQUENCE.pack_into(buffer, SHARED_PARAMS_SEQUENCE_OFFSET, self.sequence)
+        self.stats['written'] += 1
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def format_stats(self):
+        return (f"parametri condivisi pubblicati {self.stats['published']}, scritti {self.stats['written']}, "
+                f"invariati {self.stats['unchanged']}, persi {self.stats['dropped']}")
+
+    def stop(self, flush=True):
+        """Chiude la mappatura; il file resta con gli ultimi valori per i lettori ancora attivi."""
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        if self.buffer is not None:
+            self.buffer.close(); self.buffer = None
+        if self.file is not None:
+            self.file.close(); self.file = None
+
+
+class SharedParamReader:
+    """Lettore del blocco condiviso (lo stesso protocollo che deve seguire Bonzomatic o un altro consumatore)."""
+
+    def __init__(self, filepath):
+        self.file = open(filepath, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) # Tutto il file, spettro compreso
+        magic, version, _, count, _ = SHARED_PARAMS_HEADER.unpack_from(self.buffer, 0)
+        if magic != SHARED_PARAMS_MAGIC or version != SHARED_PARAMS_VERSION or count != len(SHARED_PARAMS_FIELDS):
+            self.close()
+            raise ValueError(f"Blocco parametri non compatibile: {filepath} ({magic!r}, versione {version}, {count} valori)")
+        spectrum_size = SHARED_PARAMS_SPECTRUM_COUNT.unpack_from(self.buffer, SHARED_PARAMS_SPECTRUM_COUNT_OFFSET)[0]
+        self.spectrum_struct = struct.Struct(f"<{spectrum_size}f")
+        self.retries = 0 # Letture ripetute perché concorrenti con una scrittura
+
+    def read(self):
+        """Restituisce (sequenza, istante di scrittura, valori, spettro) coerenti, oppure None se lo scrittore resta a metà."""
+        buffer = self.buffer
+        for _ in range(SHARED_PARAMS_READ_RETRIES):
+            sequence = SHARED_PARAMS_SEQUENCE.unpack_from(buffer, SHARED_PARAMS_SEQUENCE_OFFSET)[0]
+            if sequence & 1:
+                self.retries += 1; continue
+            timestamp = SHARED_PARAMS_TIME.unpack_from(buffer, SHARED_PARAMS_TIME_OFFSET)[0]
+            values = SHARED_PARAMS_VALUES.unpack_from(buffer, SHARED_PARAMS_HEADER.size)
+            spectrum = self.spectrum_struct.unpack_from(buffer, SHARED_PARAMS_SPECTRUM_OFFSET)
+            if SHARED_PARAMS_SEQUENCE.unpack_from(buffer, SHARED_PARAMS_SEQUENCE_OFFSET)[0] == sequence:
+                return sequence, timestamp, values, spectrum
+            self.retries += 1
+        return None
+
+    def read_params(self):
+        """Come read(), ma con i valori nel formato a dizionario del file JSON."""
+        result = self.read()
+        if result is None:
+            return None
+        params = {}
+        for (group, name), value in zip(SHARED_PARAMS_FIELDS, result[2]):
+            params.setdefault(group, {})[name] = value
+        if result[3]:
+            params["audio"]["spectrum"] = list(result[3])
+        return params
+
+    def close(self):
+        self.buffer.close(); self.file.close()
+
+
+# --- BENCHMARK ---
+def run_benchmark(seconds=2.0, callback_hz=500.0, rate_hz=DEFAULT_RATE_HZ):
+    """Simula uno slider trascinato a 'callback_hz' eventi al secondo e verifica che il file sia sempre JSON completo."""
+    folder = tempfile.mkdtemp(prefix="bonzomatic_params_bench_")
+    filepath = os.path.join(folder, "bonzomatic_params.txt")
+    publisher = ParamPublisher(filepath, rate_hz=rate_hz)
+    torn_reads = 0; reads = 0
+    start = time.perf_counter(); publish_time = 0.0; count = 0
+    while time.perf_counter() - start < seconds:
+        value = round((count % 200) / 100.0, 2)
+        t0 = time.perf_counter()
+        publisher.publish({"effects": {"zoom": value, "pan_x": 0.0, "pan_y": 0.0}, "audio": {"bpm": 120}})
+        publish_time += time.perf_counter() - t0; count += 1
+        if os.path.exists(filepath):
+            reads += 1
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f: json.load(f)
+            except ValueError: torn_reads += 1
+        time.sleep(1.0 / callback_hz)
+    publisher.stop()
+    print(f"Pubblicazione parametri: {count} aggiornamenti in {seconds:.1f} s, limite {rate_hz:.0f} Hz")
+    print(f"  {publisher.format_stats()}")
+    print(f"  Costo medio di publish() sul thread chiamante: {publish_time / max(1, count) * 1e6:.1f} us")
+    print(f"  Letture del file: {reads}, letture incomplete: {torn_reads}")
+    for name in os.listdir(folder): os.remove(os.path.join(folder, name))
+    os.rmdir(folder)
+
+
+def _shared_writer_process(filepath, seconds, rate_hz, ready):
+    """Scrittore di prova in un processo separato: tutti i valori uguali al contatore, per rilevare letture miste."""
+    channel = SharedParamChannel(filepath)
+    ready.set()
+    interval = 1.0 / rate_hz; count = 0
+    end = time.perf_counter() + seconds; next_write = time.perf_counter()
+    while time.perf_counter() < end:
+        count += 1
+        channel.write_values([float(count)] * len(SHARED_PARAMS_FIELDS))
+        next_write += interval
+        wait = next_write - time.perf_counter()
+        if wait > 0: time.sleep(wait)
+    channel.stop()
+
+
+def run_reader_harness(seconds=2.0, writer_hz=200.0, reader_hz=60.0):
+    """Lettore a frame rate contro uno scrittore in un altro processo: misura età dei dati, ripetizioni e letture miste."""
+    folder = tempfile.mkdtemp(prefix="bonzomatic_shm_bench_")
+    filepath = os.path.join(folder, "bonzomatic_params.bin")
+    ready = multiprocessing.Event()
+    writer = multiprocessing.Process(target=_shared_writer_process, args=(filepath, seconds, writer_hz, ready), daemon=True)
+    writer.start()
+    ready.wait(5.0)
+    reader = SharedParamReader(filepath)
+    staleness = []; read_times = []; torn = 0; failed = 0; frames = 0
+    interval = 1.0 / reader_hz; next_frame = time.perf_counter()
+    while writer.is_alive():
+        t0 = time.perf_counter()
+        result = reader.read()
+        read_times.append(time.perf_counter() - t0)
+        frames += 1
+        if result is None: failed += 1
+        elif result[0]:
+            staleness.append(time.time() - result[1])
+            if len(set(result[2])) != 1: torn += 1
+        next_frame += interval
+        wait = next_frame - time.perf_counter()
+        if wait > 0: time.sleep(wait)
+    writer.join()
+    reader.close()
+    staleness.sort(); read_times.sort()
+    percentile = lambda data, p: data[min(len(data) - 1, int(len(data) * p))] * 1000 if data else 0.0
+    print(f"Canale condiviso: scrittore {writer_hz:.0f} Hz (processo separato), lettore {reader_hz:.0f} fps, {frames} frame")
+    print(f"  Età dei dati letti: p50 {percentile(staleness, 0.5):.2f} ms, p95 {percentile(staleness, 0.95):.2f} ms, "
+          f"max {percentile(staleness, 1.0):.2f} ms (limite teorico {1000 / writer_hz:.2f} ms)")
+    print(f"  Lettura: p50 {percentile(read_times, 0.5) * 1000:.1f} us, ripetizioni seqlock {reader.retries}, "
+          f"letture miste {torn}, fallite {failed}")
+    os.remove(filepath); os.rmdir(folder)
+
+
+if __name__ == "__main__":
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    run_benchmark(duration)
+    run_reader_harness(duration)
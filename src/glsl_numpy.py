@@ -0,0 +1,1146 @@
+# -*- coding: utf-8 -*-
+"""
+GLSL NUMPY - Valutatore su CPU di un sottoinsieme di GLSL per fragment shader, senza GPU né contesto GL.
+Il sorgente viene preprocessato (#define, anche con parametri, e #if/#ifdef), analizzato in un albero e
+interpretato su tutti i pixel insieme: ogni valore scalare è un array NumPy (o un numero se uniforme) e i
+vettori sono tuple di componenti. If, cicli, break/continue e return dipendenti dal pixel usano maschere per
+corsia (come una GPU SIMT): entrambi i rami vengono eseguiti sulle corsie attive e le assegnazioni selezionate.
+Non supportati: struct, texture (restituiscono 0), ricorsione, indici non costanti in scrittura su vettori.
+"""
+
+import re
+import math
+import operator
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+MAX_LOOP_ITERATIONS = 4096 # Limite di sicurezza per cicli che non terminano
+MAX_CALL_DEPTH = 64
+MAX_CONDITION_LENGTH = 4096 # Condizioni di #if più lunghe (dopo l'espansione delle macro) sono rifiutate
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1 # Le condizioni di #if sono valutate su interi a 64 bit con segno
+
+SCALAR_TYPES = frozenset(('float', 'int', 'uint', 'bool'))
+VECTOR_SIZES = {f"{prefix}vec{n}": n for prefix in ('', 'i', 'u', 'b') for n in (2, 3, 4)}
+MATRIX_SIZES = {'mat2': 2, 'mat3': 3, 'mat4': 4, 'mat2x2': 2, 'mat3x3': 3, 'mat4x4': 4}
+SAMPLER_TYPES = frozenset(('sampler2D', 'sampler3D', 'samplerCube'))
+TYPE_NAMES = SCALAR_TYPES | set(VECTOR_SIZES) | set(MATRIX_SIZES) | SAMPLER_TYPES | {'void'}
+QUALIFIERS = frozenset(('const', 'in', 'out', 'inout', 'uniform', 'highp', 'mediump', 'lowp', 'varying',
+                        'attribute', 'flat', 'smooth', 'invariant', 'precise'))
+ASSIGN_OPS = frozenset(('=', '+=', '-=', '*=', '/=', '%='))
+BINARY_PRECEDENCE = {'||': 1, '^^': 2, '&&': 3, '|': 4, '^': 5, '&': 6, '==': 7, '!=': 7, '<': 8, '>': 8,
+                     '<=': 8, '>=': 8, '<<': 9, '>>': 9, '+': 10, '-': 10, '*': 11, '/': 11, '%': 11}
+SWIZZLE_INDEX = {ch: i for group in ('xyzw', 'rgba', 'stpq') for i, ch in enumerate(group)}
+TEXTURE_FUNCTIONS = frozenset(('texture', 'texture2D', 'textureLod', 'texture2DLod', 'texelFetch', 'textureGrad', 'textureCube'))
+
+COMMENT_RE = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+DIRECTIVE_RE = re.compile(r'#\s*(\w+)\s*(.*)')
+DEFINE_RE = re.compile(r'(\w+)(\(([^)]*)\))?\s*(.*)')
+TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<number>0[xX][0-9a-fA-F]+[uU]?|(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?[fFuU]?)
+  | (?P<ident>[A-Za-z_]\w*)
+  | (?P<op>\+\+|--|&&|\|\||\^\^|<<=|>>=|<<|>>|[-+*/%<>=!&|^]=|[-+*/%<>=!&|^~?:;,.(){}\[\]])
+""", re.VERBOSE)
+
+
+# --- PREPROCESSORE E TOKENIZER ---
+def _glsl_error(message, line=None):
+    return ValueError(f"GLSL riga {line}: {message}" if line else f"GLSL: {message}")
+
+
+def tokenize(text):
+    """Token (tipo, valore, riga): 'num' (int o float), 'id', 'op'."""
+    tokens = []; line = 1; position = 0
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if match is None:
+            raise _glsl_error(f"carattere non valido {text[position]!r}", line)
+        kind = match.lastgroup; value = match.group()
+        if kind == 'number':
+            tokens.append(('num', _parse_number(value), line))
+        elif kind != 'space':
+            tokens.append(('id' if kind == 'ident' else 'op', value, line))
+        line += value.count('\n'); position = match.end()
+    return tokens
+
+
+def _parse_number(text):
+    lower = text.lower()
+    if lower.startswith('0x'):
+        return int(lower.rstrip('u'), 16)
+    if lower.endswith('u'):
+        return int(lower[:-1])
+    if lower.endswith('f') or '.' in lower or 'e' in lower:
+        return float(lower.rstrip('f'))
+    return int(lower)
+
+
+def preprocess(source):
+    """Toglie commenti e direttive; restituisce (testo con le righe originali, macro {nome: (parametri, corpo)})."""
+    source = COMMENT_RE.sub(lambda m: '\n' * m.group().count('\n') or ' ', source).replace('\\\n', '')
+    macros = {}; lines = []; active = [True]; taken = [True] # Pila dei blocchi #if: attivo, ramo già preso
+    for line in source.split('\n'):
+        match = DIRECTIVE_RE.match(line.strip())
+        if not match:
+            lines.append(line if all(active) else ''); continue
+        directive, rest = match.group(1), match.group(2).strip()
+        lines.append('')
+        if directive in ('ifdef', 'ifndef', 'if'):
+            value = (rest in macros) if directive == 'ifdef' else (rest not in macros) if directive == 'ifndef' else _eval_condition(rest, macros)
+            active.append(bool(value) and all(active)); taken.append(bool(value))
+        elif directive == 'elif':
+            value = not taken[-1] and _eval_condition(rest, macros)
+            active[-1] = bool(value) and all(active[:-1]); taken[-1] = taken[-1] or bool(value)
+        elif directive == 'else':
+            active[-1] = not taken[-1] and all(active[:-1]); taken[-1] = True
+        elif directive == 'endif':
+            if len(active) > 1: active.pop(); taken.pop()
+        elif not all(active):
+            continue
+        elif directive == 'define':
+            definition = DEFINE_RE.match(rest)
+            if definition:
+                params = [p.strip() for p in definition.group(3).split(',') if p.strip()] if definition.group(2) else None
+                macros[definition.group(1)] = (params, definition.group(4))
+        elif directive == 'undef':
+            macros.pop(rest, None)
+        elif directive == 'error':
+            raise _glsl_error(f"#error {rest}")
+        # version, extension, pragma, line: ignorate
+    return '\n'.join(lines), macros
+
+
+def _eval_condition(expression, macros):
+    """Condizione di #if/#elif su interi: defined(), macro numeriche e operatori C."""
+    expression = re.sub(r'defined\s*\(\s*(\w+)\s*\)|defined\s+(\w+)',
+                        lambda m: '1' if (m.group(1) or m.group(2)) in macros else '0', expression)
+    for _ in range(8): # Macro che rimandano ad altre macro
+        expression = re.sub(r'\b[A-Za-z_]\w*\b', lambda m: macros[m.group()][1] if m.group() in macros and macros[m.group()][0] is None else m.group(), expression)
+        if len(expression) > MAX_CONDITION_LENGTH: raise _glsl_error("condizione #if troppo lunga")
+    expression = re.sub(r'\b[A-Za-z_]\w*\b', '0', expression)
+    try:
+        return _ConditionParser(tokenize(expression)).parse() != 0 # Niente eval(): solo interi e operatori C
+    except (ValueError, RecursionError):
+        raise _glsl_error(f"condizione #if non supportata: {expression}")
+
+
+def _wrap_int64(value):
+    return (value - INT64_MIN) % 2 ** 64 + INT64_MIN
+
+
+class _ConditionParser:
+    """Valutatore di #if/#elif: interi a 64 bit con segno, operatori C con la loro precedenza e ?:.
+    Con live falso (rami di &&, || e ?: non valutati) si controlla solo la sintassi, come in C."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens; self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][1] if self.position < len(self.tokens) else None
+
+    def next(self):
+        if self.position >= len(self.tokens): raise ValueError("condizione incompleta")
+        token = self.tokens[self.position]; self.position += 1
+        return token
+
+    def expect(self, value):
+        if self.next()[1] != value: raise ValueError(f"atteso '{value}'")
+
+    def parse(self):
+        value = self.ternary(True)
+        if self.position != len(self.tokens): raise ValueError("token in eccesso")
+        return value
+
+    def ternary(self, live):
+        condition = self.binary(1, live)
+        if self.peek() != '?': return condition
+        self.position += 1
+        if_true = self.ternary(live and condition != 0); self.expect(':'); if_false = self.ternary(live and condition == 0)
+        return if_true if condition else if_false
+
+    def binary(self, min_precedence, live):
+        left = self.unary(live)
+        while self.peek() in BINARY_PRECEDENCE and BINARY_PRECEDENCE[self.peek()] >= min_precedence:
+            op = self.next()[1]; precedence = BINARY_PRECEDENCE[op]
+            right_live = live and not (op == '&&' and not left or op == '||' and left) # Cortocircuito
+            left = self.apply(op, left, self.binary(precedence + 1, right_live), live)
+        return left
+
+    def apply(self, op, left, right, live):
+        if op == '&&': return int(bool(left) and bool(right))
+        if op == '||': return int(bool(left) or bool(right))
+        if op == '^^': return int(bool(left) != bool(right))
+        if op in ('/', '%'):
+            if right == 0:
+                if live: raise ValueError("divisione per zero")
+                return 0
+            quotient = abs(left) // abs(right) * (1 if (left < 0) == (right < 0) else -1) # Troncamento verso zero, come in C
+            return _wrap_int64(quotient if op == '/' else left - right * quotient)
+        if op in ('<<', '>>'):
+            if not 0 <= right < 64:
+                if live: raise ValueError("scorrimento fuori intervallo")
+                return 0
+            return _wrap_int64(left << right) if op == '<<' else left >> right
+        return _wrap_int64(int(_CONDITION_OPS[op](left, right))) # Aritmetica, bit e confronti (bool come 0/1)
+
+    def unary(self, live):
+        kind, value, _ = self.next()
+        if kind == 'num':
+            if not isinstance(value, int) or value > 2 ** 64 - 1: raise ValueError("costante non intera o fuori intervallo")
+            return _wrap_int64(value)
+        if value == '(':
+            result = self.ternary(live); self.expect(')')
+            return result
+        if value in ('+', '-', '!', '~'):
+            operand = self.unary(live)
+            return {'+': operand, '-': _wrap_int64(-operand), '!': int(operand == 0), '~': ~operand}[value]
+        raise ValueError(f"token inatteso '{value}'")
+
+
+def expand_macros(tokens, macros, expanding=frozenset()):
+    """Espansione delle macro (anche con parametri) sulla lista dei token."""
+    result = []; index = 0
+    while index < len(tokens):
+        kind, value, line = tokens[index]
+        if kind != 'id' or value not in macros or value in expanding:
+            result.append(tokens[index]); index += 1; continue
+        params, body = macros[value]
+        body_tokens = [(k, v, line) for k, v, _ in tokenize(body)]
+        if params is None:
+            result.extend(expand_macros(body_tokens, macros, expanding | {value})); index += 1; continue
+        if index + 1 >= len(tokens) or tokens[index + 1][1] != '(':
+            result.append(tokens[index]); index += 1; continue
+        args = [[]]; depth = 0; index += 2
+        while index < len(tokens):
+            token = tokens[index]
+            if token[1] in ('(', '[') and token[0] == 'op': depth += 1
+            elif token[1] in (')', ']') and token[0] == 'op':
+                if depth == 0: break
+                depth -= 1
+            elif token[1] == ',' and depth == 0 and token[0] == 'op':
+                args.append([]); index += 1; continue
+            args[-1].append(token); index += 1
+        index += 1 # ')'
+        if params == [] and args == [[]]: args = []
+        if len(args) != len(params):
+            raise _glsl_error(f"la macro {value} richiede {len(params)} argomenti", line)
+        expanded_args = {name: expand_macros(arg, macros, expanding) for name, arg in zip(params, args)}
+        substituted = []
+        for token in body_tokens:
+            substituted.extend(expanded_args[token[1]] if token[0] == 'id' and token[1] in expanded_args else [token])
+        result.extend(expand_macros(substituted, macros, expanding | {value}))
+    return result
+
+
+# --- PARSER ---
+class _Parser:
+    """Parser a discesa ricorsiva: nodi come tuple ('tipo', ...)."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens + [('eof', None, tokens[-1][2] if tokens else 0)]
+        self.position = 0
+
+    def peek(self, offset=0):
+        return self.tokens[min(self.position + offset, len(self.tokens) - 1)]
+
+    def next(self):
+        token = self.tokens[self.position]; self.position += 1
+        return token
+
+    def accept(self, value):
+        if self.peek()[1] == value and self.peek()[0] in ('op', 'id'):
+            self.position += 1; return True
+        return False
+
+    def expect(self, value):
+        token = self.next()
+        if token[1] != value:
+            raise _glsl_error(f"atteso '{value}', trovato '{token[1]}'", token[2])
+        return token
+
+    def identifier(self):
+        token = self.next()
+        if token[0] != 'id':
+            raise _glsl_error(f"atteso un identificatore, trovato '{token[1]}'", token[2])
+        return token[1]
+
+    def is_type(self, token):
+        return token[0] == 'id' and token[1] in TYPE_NAMES
+
+    # Livello globale
+    def parse_program(self):
+        functions = {}; global_statements = []; uniforms = {}
+        while self.peek()[0] != 'eof':
+            token = self.peek()
+            if self.accept(';'): continue
+            if token[1] == 'precision':
+                while not self.accept(';'): self.next()
+                continue
+            if token[1] == 'struct':
+                raise _glsl_error("struct non supportate", token[2])
+            qualifiers = self.qualifiers()
+            type_name = self.type_name()
+            if self.peek()[1] == '(' or self.peek(1)[1] != '(':
+                declaration = self.declaration_rest(type_name, qualifiers)
+                if 'uniform' in qualifiers:
+                    for name, size, _ in declaration[2]: uniforms[name] = type_name
+                else:
+                    global_statements.append(declaration)
+                continue
+            name = self.identifier()
+            params = self.parameters()
+            if self.accept(';'): continue # Prototipo
+            functions.setdefault(name, []).append((type_name, params, self.block()))
+        return functions, global_statements, uniforms
+
+    def qualifiers(self):
+        found = []
+        while self.peek()[0] == 'id' and self.peek()[1] in QUALIFIERS:
+            found.append(self.next()[1])
+        if self.peek()[1] == 'layout':
+            raise _glsl_error("layout non supportato", self.peek()[2])
+        return found
+
+    def type_name(self):
+        token = self.next()
+        if not self.is_type(token):
+            raise _glsl_error(f"tipo non supportato '{token[1]}'", token[2])
+        if self.peek()[1] == '[': # Tipo array: float[3] nome
+            self.next(); size = self.expression() if self.peek()[1] != ']' else None; self.expect(']')
+            return (token[1], size)
+        return token[1]
+
+    def parameters(self):
+        self.expect('('); params = []
+        if self.accept(')'): return params
+        if self.peek()[1] == 'void' and self.peek(1)[1] == ')':
+            self.next(); self.expect(')'); return params
+        while True:
+            qualifiers = self.qualifiers()
+            type_name = self.type_name()
+            name = self.identifier() if self.peek()[0] == 'id' else f"_unnamed{len(params)}"
+            if self.accept('['):
+                while not self.accept(']'): self.next()
+                type_name = (type_name, None)
+            params.append(('out' if 'out' in qualifiers else 'inout' if 'inout' in qualifiers else 'in', type_name, name))
+            if self.accept(')'): return params
+            self.expect(',')
+
+    def declaration_rest(self, type_name, qualifiers):
+        declarators = []
+        while True:
+            name = self.identifier(); size = None
+            if self.accept('['):
+                size = self.expression() if self.peek()[1] != ']' else ('num', -1); self.expect(']')
+            elif isinstance(type_name, tuple):
+                size = type_name[1] or ('num', -1)
+            initializer = self.assignment() if self.accept('=') else None
+            declarators.append((name, size, initializer))
+            if self.accept(';'): break
+            self.expect(',')
+        base_type = type_name[0] if isinstance(type_name, tuple) else type_name
+        return ('decl', base_type, declarators)
+
+    # Istruzioni
+    def block(self):
+        self.expect('{'); statements = []
+        while not self.accept('}'):
+            if self.peek()[0] == 'eof': raise _glsl_error("'}' mancante alla fine del file")
+            statements.append(self.statement())
+        return ('block', statements)
+
+    def is_declaration(self):
+        token = self.peek()
+        if token[0] != 'id': return False
+        if token[1] in QUALIFIERS: return True
+        return token[1] in TYPE_NAMES and (self.peek(1)[0] == 'id' or self.peek(1)[1] == '[')
+
+    def statement(self):
+        token = self.peek(); keyword = token[1] if token[0] == 'id' else None
+        if token[1] == '{' and token[0] == 'op': return self.block()
+        if keyword == 'if':
+            self.next(); self.expect('('); condition = self.expression(); self.expect(')')
+            then_branch = self.statement()
+            else_branch = self.statement() if self.accept('else') else None
+            return ('if', condition, then_branch, else_branch)
+        if keyword == 'for':
+            self.next(); self.expect('(')
+            if self.accept(';'): init = None
+            elif self.is_declaration(): init = self.declaration_rest(self.type_name_after_qualifiers(), [])
+            else: init = ('expr', self.expression()); self.expect(';')
+            condition = None if self.peek()[1] == ';' else self.expression(); self.expect(';')
+            step = None if self.peek()[1] == ')' else self.expression(); self.expect(')')
+            return ('for', init, condition, step, self.statement())
+        if keyword == 'while':
+            self.next(); self.expect('('); condition = self.expression(); self.expect(')')
+            return ('for', None, condition, None, self.statement())
+        if keyword == 'do':
+            self.next(); body = self.statement(); self.expect('while'); self.expect('(')
+            condition = self.expression(); self.expect(')'); self.expect(';')
+            return ('do', body, condition)
+        if keyword == 'return':
+            self.next(); value = None if self.peek()[1] == ';' else self.expression(); self.expect(';')
+            return ('return', value)
+        if keyword in ('break', 'continue', 'discard'):
+            self.next(); self.expect(';'); return (keyword,)
+        if self.accept(';'): return ('block', [])
+        if self.is_declaration():
+            return self.declaration_rest(self.type_name_after_qualifiers(), [])
+        expression = self.expression(); self.expect(';')
+        return ('expr', expression)
+
+    def type_name_after_qualifiers(self):
+        self.qualifiers()
+        return self.type_name()
+
+    # Espressioni
+    def expression(self):
+        expression = self.assignment()
+        if self.peek()[1] != ',': return expression
+        items = [expression]
+        while self.accept(','): items.append(self.assignment())
+        return ('seq', items)
+
+    def assignment(self):
+        left = self.ternary()
+        token = self.peek()
+        if token[0] == 'op' and token[1] in ASSIGN_OPS:
+            self.next()
+            return ('assign', token[1], left, self.assignment())
+        return left
+
+    def ternary(self):
+        condition = self.binary(1)
+        if not self.accept('?'): return condition
+        when_true = self.assignment(); self.expect(':'); when_false = self.assignment()
+        return ('ternary', condition, when_true, when_false)
+
+    def binary(self, min_precedence):
+        left = self.unary()
+        while True:
+            token = self.peek()
+            precedence = BINARY_PRECEDENCE.get(token[1]) if token[0] == 'op' else None
+            if precedence is None or precedence < min_precedence: return left
+            self.next()
+            left = ('binary', token[1], left, self.binary(precedence + 1))
+
+    def unary(self):
+        token = self.peek()
+        if token[0] == 'op' and token[1] in ('-', '+', '!', '~'):
+            self.next(); operand = self.unary()
+            return operand if token[1] == '+' else ('unary', token[1], operand)
+        if token[0] == 'op' and token[1] in ('++', '--'):
+            self.next(); return ('incdec', token[1], self.unary(), True)
+        return self.postfix()
+
+    def postfix(self):
+        expression = self.primary()
+        while True:
+            token = self.peek()
+            if token[1] == '.' and token[0] == 'op':
+                self.next(); name = self.identifier()
+                if self.accept('('): self.expect(')'); expression = ('length', expression)
+                else: expression = ('member', expression, name)
+            elif token[1] == '[' and token[0] == 'op':
+                self.next(); index = self.expression(); self.expect(']')
+                expression = ('index', expression, index)
+            elif token[1] in ('++', '--') and token[0] == 'op':
+                self.next(); expression = ('incdec', token[1], expression, False)
+            else:
+                return expression
+
+    def primary(self):
+        token = self.next()
+        if token[0] == 'num': return ('num', token[1])
+        if token[0] == 'id':
+            if token[1] in ('true', 'false'): return ('num', token[1] == 'true')
+            if self.peek()[1] == '[' and token[1] in TYPE_NAMES: # Costruttore di array: float[3](...)
+                self.next()
+                if not self.accept(']'): self.expression(); self.expect(']')
+                return ('array', token[1], self.arguments())
+            if self.peek()[1] == '(':
+                return ('call', token[1], self.arguments(), token[2])
+            return ('var', token[1], token[2])
+        if token[1] == '(':
+            expression = self.expression(); self.expect(')')
+            return expression
+        raise _glsl_error(f"espressione non valida vicino a '{token[1]}'", token[2])
+
+    def arguments(self):
+        self.expect('('); args = []
+        if self.accept(')'): return args
+        if self.peek()[1] == 'void' and self.peek(1)[1] == ')':
+            self.next(); self.expect(')'); return args
+        while True:
+            args.append(self.assignment())
+            if self.accept(')'): return args
+            self.expect(',')
+
+
+# --- VALORI ---
+class Vec:
+    """Vettore GLSL: tupla di componenti (numeri o array NumPy dei pixel)."""
+
+    __slots__ = ('c',)
+
+    def __init__(self, components):
+        self.c = tuple(components)
+
+    def __len__(self):
+        return len(self.c)
+
+
+class Mat:
+    """Matrice GLSL quadrata: tupla di colonne Vec (column-major come in GLSL)."""
+
+    __slots__ = ('cols',)
+
+    def __init__(self, columns):
+        self.cols = tuple(columns)
+
+    def __len__(self):
+        return len(self.cols)
+
+
+_ARITHMETIC = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': None, '%': None}
+_COMPARISON = {'<': operator.lt, '>': operator.gt, '<=': operator.le, '>=': operator.ge}
+_BITWISE = {'&': operator.and_, '|': operator.or_, '^': operator.xor, '<<': operator.lshift, '>>': operator.rshift}
+_CONDITION_OPS = {**_ARITHMETIC, **_COMPARISON, **_BITWISE, '==': operator.eq, '!=': operator.ne} # #if: '/', '%', '<<', '>>' a parte
+
+
+def _is_int(value):
+    return type(value) is int
+
+
+def _divide(a, b):
+    if _is_int(a) and _is_int(b):
+        return int(a / b) if b else 0 # Divisione intera GLSL: troncamento verso zero
+    return np.divide(a, b)
+
+
+def _modulo(a, b):
+    if _is_int(a) and _is_int(b):
+        return int(math.fmod(a, b)) if b else 0
+    return np.fmod(a, b)
+
+
+def _scalar_op(op, a, b):
+    if op == '/': return _divide(a, b)
+    if op == '%': return _modulo(a, b)
+    return _ARITHMETIC[op](a, b)
+
+
+def _dot(a, b):
+    total = a.c[0] * b.c[0]
+    for x, y in zip(a.c[1:], b.c[1:]): total = total + x * y
+    return total
+
+
+def _arith(op, a, b):
+    """Operatori aritmetici con le regole GLSL (componente per componente, prodotti matrice-vettore)."""
+    if isinstance(a, Mat) or isinstance(b, Mat):
+        if op == '*':
+            if isinstance(a, Mat) and isinstance(b, Vec): # M * v = somma delle colonne pesate
+                return _linear_combination(a.cols, b.c)
+            if isinstance(a, Vec) and isinstance(b, Mat): # v * M = prodotti scalari con le colonne
+                return Vec([_dot(a, column) for column in b.cols])
+            if isinstance(a, Mat) and isinstance(b, Mat):
+                return Mat([_linear_combination(a.cols, column.c) for column in b.cols])
+        if isinstance(a, Mat) and isinstance(b, Mat):
+            return Mat([_arith(op, x, y) for x, y in zip(a.cols, b.cols)])
+        if isinstance(a, Mat):
+            return Mat([_arith(op, column, b) for column in a.cols])
+        return Mat([_arith(op, a, column) for column in b.cols])
+    if isinstance(a, Vec):
+        if isinstance(b, Vec): return Vec([_scalar_op(op, x, y) for x, y in zip(a.c, b.c)])
+        return Vec([_scalar_op(op, x, b) for x in a.c])
+    if isinstance(b, Vec):
+        return Vec([_scalar_op(op, a, y) for y in b.c])
+    return _scalar_op(op, a, b)
+
+
+def _linear_combination(columns, weights):
+    result = _arith('*', columns[0], weights[0])
+    for column, weight in zip(columns[1:], weights[1:]):
+        result = _arith('+', result, _arith('*', column, weight))
+    return result
+
+
+def _negate(value):
+    if isinstance(value, Vec): return Vec([-x for x in value.c])
+    if isinstance(value, Mat): return Mat([_negate(column) for column in value.cols])
+    return -value
+
+
+def _components(value):
+    if isinstance(value, Vec): return list(value.c)
+    if isinstance(value, Mat): return [x for column in value.cols for x in column.c]
+    if isinstance(value, list): return [x for item in value for x in _components(item)]
+    return [value]
+
+
+def _as_mask(value):
+    """Condizione -> True/False (uniforme) oppure array booleano per pixel."""
+    if isinstance(value, Vec): value = value.c[0]
+    if isinstance(value, np.ndarray) and value.ndim > 0:
+        return value if value.dtype == bool else value != 0
+    return bool(value)
+
+
+def _and(a, b):
+    if a is False or b is False: return False
+    if a is True: return b
+    if b is True: return a
+    return np.logical_and(a, b)
+
+
+def _or(a, b):
+    if a is True or b is True: return True
+    if a is False: return b
+    if b is False: return a
+    return np.logical_or(a, b)
+
+
+def _not(a):
+    if a is True: return False
+    if a is False: return True
+    return np.logical_not(a)
+
+
+def _any(mask):
+    return mask if isinstance(mask, bool) else bool(mask.any())
+
+
+def _simplify(mask):
+    """Maschera array tutta vera o tutta falsa -> bool (percorso veloce per il resto del blocco)."""
+    if isinstance(mask, bool): return mask
+    if not mask.any(): return False
+    if mask.all(): return True
+    return mask
+
+
+def _select(mask, new, old):
+    """Valore 'new' sulle corsie di 'mask', 'old' sulle altre."""
+    if mask is True or old is None: return new
+    if mask is False: return old
+    if isinstance(old, Vec):
+        new_components = new.c if isinstance(new, Vec) else [new] * len(old.c)
+        return Vec([np.where(mask, n, o) for n, o in zip(new_components, old.c)])
+    if isinstance(old, Mat):
+        return Mat([_select(mask, n, o) for n, o in zip(new.cols, old.cols)])
+    if isinstance(old, list):
+        return [_select(mask, n, o) for n, o in zip(new, old)]
+    return np.where(mask, new, old)
+
+
+def _zero(type_name):
+    if type_name in VECTOR_SIZES:
+        return Vec([False if type_name.startswith('b') else 0 if type_name[0] in 'iu' else 0.0] * VECTOR_SIZES[type_name])
+    if type_name in MATRIX_SIZES:
+        size = MATRIX_SIZES[type_name]
+        return Mat([Vec([0.0] * size) for _ in range(size)])
+    if type_name == 'bool': return False
+    if type_name in ('int', 'uint'): return 0
+    if type_name in SAMPLER_TYPES: return None
+    return 0.0
+
+
+def _to_int(value):
+    if isinstance(value, np.ndarray): return np.trunc(value)
+    return int(value)
+
+
+def _to_float(value):
+    if isinstance(value, np.ndarray): return value.astype(np.float64) if value.dtype != np.float64 else value
+    return float(value)
+
+
+def _convert(type_name, value):
+    if type_name in ('int', 'uint') or type_name[:1] in ('i', 'u') and type_name in VECTOR_SIZES: return _to_int(value)
+    if type_name == 'bool' or type_name.startswith('bvec'): return _as_mask(value)
+    return _to_float(value)
+
+
+def _construct(type_name, args):
+    """Costruttori: float(x), vec3(v2, z), vec4(x), mat2(a, b, c, d), mat3(m4)..."""
+    if type_name in SCALAR_TYPES:
+        value = _components(args[0])[0]
+        return _convert(type_name, value)
+    if type_name in VECTOR_SIZES:
+        size = VECTOR_SIZES[type_name]
+        components = [c for arg in args for c in _components(arg)]
+        if len(components) == 1: components = components * size
+        return Vec([_convert(type_name, c) for c in components[:size]])
+    size = MATRIX_SIZES[type_name]
+    if len(args) == 1 and not isinstance(args[0], (Vec, Mat)): # Diagonale
+        return Mat([Vec([args[0] if row == column else 0.0 for row in range(size)]) for column in range(size)])
+    if len(args) == 1 and isinstance(args[0], Mat): # Ridimensionamento: completa con l'identità
+        source = args[0]
+        return Mat([Vec([source.cols[column].c[row] if column < len(source) and row < len(source) else float(row == column)
+                         for row in range(size)]) for column in range(size)])
+    components = [c for arg in args for c in _components(arg)]
+    if len(components) < size * size:
+        raise _glsl_error(f"{type_name}: {len(components)} componenti invece di {size * size}")
+    return Mat([Vec(components[column * size:(column + 1) * size]) for column in range(size)])
+
+
+def _swizzle(value, name):
+    try:
+        indices = [SWIZZLE_INDEX[ch] for ch in name]
+    except KeyError:
+        raise _glsl_error(f"campo '.{name}' non supportato")
+    components = value.c if isinstance(value, Vec) else (value,)
+    if len(indices) == 1: return components[indices[0]]
+    return Vec([components[i] for i in indices])
+
+
+def _with_swizzle(value, name, new_value):
+    components = list(value.c)
+    new_components = new_value.c if isinstance(new_value, Vec) else [new_value] * len(name)
+    for ch, component in zip(name, new_components):
+        components[SWIZZLE_INDEX[ch]] = component
+    return Vec(components)
+
+
+def _items(container):
+    if isinstance(container, Vec): return list(container.c)
+    if isinstance(container, Mat): return list(container.cols)
+    return list(container)
+
+
+def _rebuild(container, items):
+    if isinstance(container, Vec): return Vec(items)
+    if isinstance(container, Mat): return Mat(items)
+    return items
+
+
+def _index(container, index):
+    items = _items(container)
+    if isinstance(index, np.ndarray) and index.ndim > 0: # Indice diverso per pixel: selezione a cascata
+        result = items[-1]
+        for position in range(len(items) - 2, -1, -1):
+            result = _select(index == position, items[position], result)
+        return result
+    return items[int(index)]
+
+
+# --- FUNZIONI PREDEFINITE ---
+def _map(function, *args):
+    """Applica una funzione scalare componente per componente (genType GLSL)."""
+    size = 0
+    for arg in args:
+        if isinstance(arg, Vec): size = len(arg.c); break
+    if not size: return function(*args)
+    return Vec([function(*[arg.c[i] if isinstance(arg, Vec) else arg for arg in args]) for i in range(size)])
+
+
+def _length(value):
+    if isinstance(value, Vec): return np.sqrt(_dot(value, value))
+    return np.abs(value)
+
+
+def _normalize(value):
+    return _arith('/', value, _length(value))
+
+
+def _clamp(x, low, high):
+    return np.minimum(np.maximum(x, low), high)
+
+
+def _smoothstep(edge0, edge1, x):
+    t = _clamp(np.divide(np.subtract(x, edge0), np.subtract(edge1, edge0)), 0.0, 1.0)
+    return t * t * (3.0 - 2.0 * t)
+
+
+def _mix(a, b, t):
+    if isinstance(t, np.ndarray) and t.dtype == bool or isinstance(t, bool): return np.where(t, b, a)
+    return a + (b - a) * t
+
+
+def _cross(a, b):
+    ax, ay, az = a.c; bx, by, bz = b.c
+    return Vec([ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx])
+
+
+def _reflect(incident, normal):
+    return _arith('-', incident, _arith('*', normal, 2.0 * _dot_any(normal, incident)))
+
+
+def _refract(incident, normal, eta):
+    d = _dot_any(normal, incident)
+    k = 1.0 - eta * eta * (1.0 - d * d)
+    result = _arith('-', _arith('*', incident, eta), _arith('*', normal, eta * d + np.sqrt(np.maximum(k, 0.0))))
+    return _select(k < 0.0, _zero('vec%d' % len(incident)) if isinstance(incident, Vec) else 0.0, result)
+
+
+def _dot_any(a, b):
+    if isinstance(a, Vec): return _dot(a, b)
+    return a * b
+
+
+def _derivative(value, axis):
+    if isinstance(value, np.ndarray) and value.ndim == 2 and value.shape[axis] > 1:
+        gradient = np.gradient(value, axis=axis)
+        return gradient if axis == 1 else -gradient # Le righe crescono verso il basso, y verso l'alto
+    return 0.0
+
+
+def _transpose(matrix):
+    size = len(matrix)
+    return Mat([Vec([matrix.cols[row].c[column] for row in range(size)]) for column in range(size)])
+
+
+def _determinant(matrix):
+    c = matrix.cols
+    if len(c) == 2: return c[0].c[0] * c[1].c[1] - c[1].c[0] * c[0].c[1]
+    if len(c) == 3: return _dot(c[0], _cross(c[1], c[2]))
+    raise _glsl_error("determinant supportato solo per mat2 e mat3")
+
+
+def _inverse(matrix):
+    if len(matrix) != 2: raise _glsl_error("inverse supportato solo per mat2")
+    (a, b), (c, d) = matrix.cols[0].c, matrix.cols[1].c
+    det = a * d - b * c
+    return Mat([Vec([d / det, -b / det]), Vec([-c / det, a / det])])
+
+
+def _reduce_bool(function, value):
+    components = [_as_mask(c) for c in value.c]
+    result = components[0]
+    for component in components[1:]: result = function(result, component)
+    return result
+
+
+BUILTINS = {
+    'sin': lambda x: _map(np.sin, x), 'cos': lambda x: _map(np.cos, x), 'tan': lambda x: _map(np.tan, x),
+    'asin': lambda x: _map(np.arcsin, x), 'acos': lambda x: _map(np.arccos, x),
+    'atan': lambda y, x=None: _map(np.arctan, y) if x is None else _map(np.arctan2, y, x),
+    'sinh': lambda x: _map(np.sinh, x), 'cosh': lambda x: _map(np.cosh, x), 'tanh': lambda x: _map(np.tanh, x),
+    'radians': lambda x: _map(np.radians, x), 'degrees': lambda x: _map(np.degrees, x),
+    'pow': lambda x, y: _map(lambda a, b: np.power(np.float64(a), b), x, y),
+    'exp': lambda x: _map(np.exp, x), 'log': lambda x: _map(np.log, x),
+    'exp2': lambda x: _map(np.exp2, x), 'log2': lambda x: _map(np.log2, x),
+    'sqrt': lambda x: _map(np.sqrt, x), 'inversesqrt': lambda x: _map(lambda a: 1.0 / np.sqrt(a), x),
+    'abs': lambda x: _map(np.abs, x), 'sign': lambda x: _map(np.sign, x),
+    'floor': lambda x: _map(np.floor, x), 'ceil': lambda x: _map(np.ceil, x), 'trunc': lambda x: _map(np.trunc, x),
+    'round': lambda x: _map(lambda a: np.floor(np.add(a, 0.5)), x), 'roundEven': lambda x: _map(np.rint, x),
+    'fract': lambda x: _map(lambda a: a - np.floor(a), x),
+    'mod': lambda x, y: _map(lambda a, b: a - b * np.floor(np.divide(a, b)), x, y),
+    'min': lambda x, y: _map(np.minimum, x, y), 'max': lambda x, y: _map(np.maximum, x, y),
+    'clamp': lambda x, a, b: _map(_clamp, x, a, b), 'mix': lambda a, b, t: _map(_mix, a, b, t),
+    'step': lambda edge, x: _map(lambda e, v: (np.asarray(v) >= e) * 1.0, edge, x),
+    'smoothstep': lambda a, b, x: _map(_smoothstep, a, b, x),
+    'length': _length, 'distance': lambda a, b: _length(_arith('-', a, b)),
+    'dot': _dot_any, 'cross': _cross, 'normalize': _normalize, 'reflect': _reflect, 'refract': _refract,
+    'faceforward': lambda n, i, nref: _select(_dot_any(nref, i) < 0.0, n, _negate(n)),
+    'dFdx': lambda x: _map(lambda a: _derivative(a, 1), x), 'dFdy': lambda x: _map(lambda a: _derivative(a, 0), x),
+    'fwidth': lambda x: _map(lambda a: np.abs(_derivative(a, 1)) + np.abs(_derivative(a, 0)), x),
+    'transpose': _transpose, 'determinant': _determinant, 'inverse': _inverse,
+    'matrixCompMult': lambda a, b: Mat([_arith('*', x, y) for x, y in zip(a.cols, b.cols)]),
+    'lessThan': lambda a, b: _map(operator.lt, a, b), 'lessThanEqual': lambda a, b: _map(operator.le, a, b),
+    'greaterThan': lambda a, b: _map(operator.gt, a, b), 'greaterThanEqual': lambda a, b: _map(operator.ge, a, b),
+    'equal': lambda a, b: _map(operator.eq, a, b), 'notEqual': lambda a, b: _map(operator.ne, a, b),
+    'any': lambda v: _reduce_bool(_or, v), 'all': lambda v: _reduce_bool(_and, v),
+    'not': lambda v: _map(lambda a: _not(_as_mask(a)), v),
+    'isnan': lambda x: _map(np.isnan, x), 'isinf': lambda x: _map(np.isinf, x),
+}
+
+
+# --- INTERPRETE ---
+_MISSING = object()
+
+
+class _Frame:
+    """Stato di una chiamata: variabili locali, scope dei blocchi, valore di ritorno, cicli aperti."""
+
+    __slots__ = ('variables', 'scopes', 'result', 'loops')
+
+    def __init__(self):
+        self.variables = {}; self.scopes = []; self.result = None; self.loops = []
+
+
+class ShaderProgram:
+    """Sorgente GLSL analizzato una volta e valutabile più volte (dimensioni e uniform diversi)."""
+
+    def __init__(self, source):
+        text, macros = preprocess(source)
+        tokens = expand_macros(tokenize(text), macros)
+        if not tokens:
+            raise _glsl_error("sorgente vuoto")
+        self.functions, self.global_statements, self.uniforms = _Parser(tokens).parse_program()
+        if 'main' not in self.functions:
+            raise _glsl_error("funzione main() mancante")
+
+    def render(self, width, height, uniforms=None):
+        """Valuta main() su width x height pixel; restituisce gl_FragColor come array float (altezza, larghezza, 4)."""
+        with np.errstate(all='ignore'):
+            return _Execution(self, int(width), int(height), uniforms or {}).run()
+
+
+class _Execution:
+    def __init__(self, program, width, height, uniforms):
+        self.program = program
+        self.width = width; self.height = height
+        self.depth = 0
+        self.unsupported = set() # Funzioni sostituite da valori neutri (es. texture)
+        x = (np.arange(width, dtype=np.float64) + 0.5)[None, :]
+        y = (height - np.arange(height, dtype=np.float64) - 0.5)[:, None] # Origine in basso a sinistra come in GL
+        self.globals = {'gl_FragCoord': Vec([x, y, 0.0, 1.0]), 'gl_FragColor': Vec([0.0, 0.0, 0.0, 0.0])}
+        for name, type_name in program.uniforms.items():
+            value = uniforms.get(name)
+            if value is None: value = _zero(type_name)
+            elif isinstance(value, (tuple, list)): value = Vec([float(v) for v in value])
+            self.globals[name] = value
+        self.discarded = False
+        self.frame = None
+
+    def run(self):
+        self.frame = _Frame()
+        self.frame.variables = self.globals # Le dichiarazioni globali vivono nel dizionario dei globali
+        for statement in self.program.global_statements:
+            self.execute(statement, True)
+        self.call('main', [], True)
+        color = self.globals['gl_FragColor']
+        shape = (self.height, self.width)
+        channels = [np.broadcast_to(np.asarray(_to_float(component), dtype=np.float64), shape) for component in color.c]
+        image = np.stack(channels, axis=-1)
+        if self.discarded is not False:
+            image = np.where(np.broadcast_to(self.discarded, shape)[..., None], 0.0, image)
+        return image
+
+    # Variabili
+    def lookup(self, name, line=None):
+        value = self.frame.variables.get(name, _MISSING)
+        if value is _MISSING: value = self.globals.get(name, _MISSING)
+        if value is _MISSING: raise _glsl_error(f"identificatore non dichiarato '{name}'", line)
+        return value
+
+    def store(self, name, value):
+        if name in self.frame.variables: self.frame.variables[name] = value
+        elif name in self.globals: self.globals[name] = value
+        else: raise _glsl_error(f"assegnazione a una variabile non dichiarata '{name}'")
+
+    def declare(self, name, value):
+        frame = self.frame
+        if frame.scopes:
+            scope = frame.scopes[-1]
+            if name not in scope: scope[name] = frame.variables.get(name, _MISSING)
+        frame.variables[name] = value
+
+    # Istruzioni: restituiscono la maschera delle corsie che proseguono dopo l'istruzione
+    def execute(self, statement, mask):
+        kind = statement[0]
+        if kind == 'expr':
+            self.evaluate(statement[1], mask); return mask
+        if kind == 'decl':
+            type_name = statement[1]
+            for name, size, initializer in statement[2]:
+                if size is not None:
+                    value = self.evaluate(initializer, mask) if initializer is not None else None
+                    if value is None:
+                        value = [_zero(type_name) for _ in range(int(self.evaluate(size, True)))]
+                else:
+                    value = self.evaluate(initializer, mask) if initializer is not None else _zero(type_name)
+                    if type_name in SCALAR_TYPES and not isinstance(value, (Vec, Mat)): value = _convert(type_name, value)
+                self.declare(name, value)
+            return mask
+        if kind == 'block':
+            return self.execute_block(statement[1], mask)
+        if kind == 'if':
+            condition = _as_mask(self.evaluate(statement[1], mask))
+            then_mask = _and(mask, condition); else_mask = _and(mask, _not(condition))
+            remaining = False
+            if _any(then_mask): remaining = self.execute(statement[2], _simplify(then_mask))
+            if statement[3] is not None:
+                if _any(else_mask): remaining = _or(remaining, self.execute(statement[3], _simplify(else_mask)))
+            else:
+                remaining = _or(remaining, else_mask)
+            return remaining
+        if kind == 'for':
+            return self.execute_loop(statement, mask)
+        if kind == 'do':
+            return self.execute_loop(('for', None, statement[2], None, statement[1]), mask, check_first=False)
+        if kind == 'return':
+            if statement[1] is not None:
+                self.frame.result = _select(mask, self.evaluate(statement[1], mask), self.frame.result)
+            return False
+        if kind == 'break':
+            loop = self.frame.loops[-1]; loop[0] = _or(loop[0], mask); return False
+        if kind == 'continue':
+            loop = self.frame.loops[-1]; loop[1] = _or(loop[1], mask); return False
+        if kind == 'discard':
+            self.discarded = _or(self.discarded, mask); return False
+        raise _glsl_error(f"istruzione non supportata: {kind}")
+
+    def execute_block(self, statements, mask):
+        frame = self.frame
+        scope = {}; frame.scopes.append(scope)
+        try:
+            for statement in statements:
+                mask = self.execute(statement, mask)
+                if mask is False: break
+        finally:
+            frame.scopes.pop()
+            for name, previous in scope.items():
+                if previous is _MISSING: frame.variables.pop(name, None)
+                else: frame.variables[name] = previous
+        return mask
+
+    def execute_loop(self, statement, mask, check_first=True):
+        _, init, condition, step, body = statement
+        frame = self.frame
+        scope = {}; frame.scopes.append(scope)
+        loop = [False, False] # Corsie uscite con break, corsie con continue nell'iterazione
+        frame.loops.append(loop)
+        exited = False
+        try:
+            if init is not None: self.execute(init, mask)
+            active = mask
+            for iteration in range(MAX_LOOP_ITERATIONS):
+                if condition is not None and (check_first or iteration > 0):
+                    holds = _as_mask(self.evaluate(condition, active))
+                    exited = _or(exited, _and(active, _not(holds)))
+                    active = _simplify(_and(active, holds))
+                if active is False: break
+                loop[0] = False; loop[1] = False
+                remaining = self.execute(body, active)
+                exited = _or(exited, loop[0])
+                active = _simplify(_or(remaining, loop[1]))
+                if active is False: break
+                if step is not None: self.evaluate(step, active)
+            else:
+                raise _glsl_error(f"ciclo oltre {MAX_LOOP_ITERATIONS} iterazioni")
+        finally:
+            frame.loops.pop(); frame.scopes.pop()
+            for name, previous in scope.items():
+                if previous is _MISSING: frame.variables.pop(name, None)
+                else: frame.variables[name] = previous
+        return _simplify(exited) if not isinstance(exited, bool) else exited
+
+    # Espressioni
+    def evaluate(self, node, mask):
+        kind = node[0]
+        if kind == 'num': return node[1]
+        if kind == 'var': return self.lookup(node[1], node[2])
+        if kind == 'binary':
+            op = node[1]
+            if op in ('&&', '||'):
+                left = _as_mask(self.evaluate(node[2], mask))
+                if op == '&&' and left is False: return False
+                if op == '||' and left is True: return True
+                right = _as_mask(self.evaluate(node[3], _and(mask, left) if op == '&&' else _and(mask, _not(left))))
+                return _and(left, right) if op == '&&' else _or(left, right)
+            left = self.evaluate(node[2], mask); right = self.evaluate(node[3], mask)
+            if op in _ARITHMETIC: return _arith(op, left, right)
+            if op in _COMPARISON: return _COMPARISON[op](left, right)
+            if op in ('==', '!='):
+                if isinstance(left, (Vec, Mat)):
+                    equal = _reduce_bool(_and, Vec([operator.eq(a, b) for a, b in zip(_components(left), _components(right))]))
+                else:
+                    equal = _as_mask(left == right)
+                return equal if op == '==' else _not(equal)
+            if op == '^^': return _as_mask(left) != _as_mask(right)
+            return _map(lambda a, b: _BITWISE[op](_to_int(a), _to_int(b)), left, right)
+        if kind == 'call': return self.call(node[1], node[2], mask, node[3])
+        if kind == 'member': return _swizzle(self.evaluate(node[1], mask), node[2])
+        if kind == 'assign':
+            value = self.evaluate(node[3], mask)
+            if node[1] != '=': value = _arith(node[1][0], self.evaluate(node[2], mask), value)
+            self.assign(node[2], value, mask)
+            return value
+        if kind == 'unary':
+            value = self.evaluate(node[2], mask)
+            if node[1] == '-': return _negate(value)
+            if node[1] == '!': return _not(_as_mask(value))
+            return _map(lambda a: ~_to_int(a), value)
+        if kind == 'ternary':
+            condition = _as_mask(self.evaluate(node[1], mask))
+            if condition is True: return self.evaluate(node[2], mask)
+            if condition is False: return self.evaluate(node[3], mask)
+            return _select(condition, self.evaluate(node[2], _and(mask, condition)), self.evaluate(node[3], _and(mask, _not(condition))))
+        if kind == 'index': return _index(self.evaluate(node[1], mask), self.evaluate(node[2], mask))
+        if kind == 'incdec':
+            old = self.evaluate(node[2], mask)
+            new = _arith('+' if node[1] == '++' else '-', old, 1)
+            self.assign(node[2], new, mask)
+            return new if node[3] else old
+        if kind == 'seq':
+            value = None
+            for item in node[1]: value = self.evaluate(item, mask)
+            return value
+        if kind == 'array': return [_construct(node[1], [arg]) for arg in (self.evaluate(a, mask) for a in node[2])]
+        if kind == 'length':
+            value = self.evaluate(node[1], mask)
+            return len(value)
+        raise _glsl_error(f"espressione non supportata: {kind}")
+
+    def assign(self, target, value, mask):
+        kind = target[0]
+        if kind == 'var':
+            name = target[1]
+            self.store(name, _select(mask, value, self.lookup(name, target[2])))
+        elif kind == 'member':
+            base = self.evaluate(target[1], True)
+            self.assign(target[1], _select(mask, _with_swizzle(base, target[2], value), base), True)
+        elif kind == 'index':
+            base = self.evaluate(target[1], True); index = self.evaluate(target[2], True)
+            items = _items(base)
+            if isinstance(index, np.ndarray) and index.ndim > 0:
+                items = [_select(_and(mask, index == position), value, item) for position, item in enumerate(items)]
+            else:
+                items[int(index)] = _select(mask, value, items[int(index)])
+            self.assign(target[1], _rebuild(base, items), True)
+        else:
+            raise _glsl_error("assegnazione a un'espressione non modificabile")
+
+    def call(self, name, arg_nodes, mask, line=None):
+        functions = self.program.functions.get(name)
+        if functions is not None:
+            args = [self.evaluate(arg, mask) for arg in arg_nodes]
+            return self.call_user(name, self._overload(functions, args), args, arg_nodes, mask)
+        if name in VECTOR_SIZES or name in MATRIX_SIZES or name in SCALAR_TYPES:
+            return _construct(name, [self.evaluate(arg, mask) for arg in arg_nodes])
+        if name in TEXTURE_FUNCTIONS:
+            self.unsupported.add(name); return Vec([0.0, 0.0, 0.0, 1.0])
+        builtin = BUILTINS.get(name)
+        if builtin is None:
+            raise _glsl_error(f"funzione non supportata '{name}'", line)
+        return builtin(*[self.evaluate(arg, mask) for arg in arg_nodes])
+
+    def _overload(self, functions, args):
+        """Sceglie la definizione compatibile con numero e tipo degli argomenti."""
+        candidates = [f for f in functions if len(f[1]) == len(args)]
+        for function in candidates:
+            if all(_matches(param[1], arg) for param, arg in zip(function[1], args)): return function
+        if candidates: return candidates[0]
+        raise _glsl_error(f"nessuna definizione con {len(args)} argomenti")
+
+    def call_user(self, name, function, args, arg_nodes, mask):
+        return_type, params, body = function
+        if self.depth >= MAX_CALL_DEPTH:
+            raise _glsl_error(f"troppe chiamate annidate ({name}): ricorsione non supportata")
+        caller = self.frame
+        frame = _Frame()
+        for (qualifier, type_name, param_name), arg in zip(params, args):
+            frame.variables[param_name] = _zero(type_name if isinstance(type_name, str) else type_name[0]) if qualifier == 'out' else arg
+        self.frame = frame; self.depth += 1
+        try:
+            self.execute(body, mask)
+        finally:
+            self.frame = caller; self.depth -= 1
+        for (qualifier, _, param_name), node in zip(params, arg_nodes):
+            if qualifier in ('out', 'inout'): self.assign(node, frame.variables[param_name], mask)
+        if frame.result is None and return_type != 'void':
+            return _zero(return_type if isinstance(return_type, str) else return_type[0])
+        return frame.result
+
+
+def _matches(type_name, value):
+    if isinstance(type_name, tuple): return isinstance(value, list)
+    if type_name in VECTOR_SIZES: return isinstance(value, Vec) and len(value) == VECTOR_SIZES[type_name]
+    if type_name in MATRIX_SIZES: return isinstance(value, Mat) and len(value) == MATRIX_SIZES[type_name]
+    return not isinstance(value, (Vec, Mat, list))
@@ -14,12 +14,24 @@ import threading
 import time
 import platform
 import json # Per la cache shader e scrittura parametri
-import hashlib # Per hash file nella cache
 import re # Per parsing metadati shader
 from pathlib import Path # Per gestire i percorsi in modo robusto
-from datetime import datetime # Per timestamp nella cache
 import webbrowser # Per aprire link Shadertoy
 import traceback # Per una migliore diagnostica degli errori
+from shader_index import ShaderLibraryIndex, hash_file # Indice incrementale della libreria shader
+from shader_store import create_shader_store # Backend metadati shader (SQLite/JSON)
+import shader_metadata # Parsing metadati shader (usato anche dai processi worker)
+from shader_scan_pool import ShaderExtractionPool # Estrazione parallela dei metadati
+from shader_watcher import ShaderFolderWatcher # Aggiornamenti incrementali della libreria (inotify/polling)
+from shader_list_view import VirtualShaderListView # Lista shader virtualizzata (righe riciclate)
+from shader_search import ShaderSearchIndex # Indice di ricerca in memoria (testo, prefissi, tag)
+from audio_engine import AudioAnalysisEngine, LatencyStats # Analisi audio in tempo reale (ring buffer + FFT a bande)
+from audio_sources import PyAudioSource, FileAudioSource, SyntheticAudioSource # Sorgenti audio intercambiabili
+from tempo_tracker import create_tempo_tracker # Auto BPM: inviluppo di onset + autocorrelazione
+from beat_clock import BeatClock, TrackerClockFeed # Fase dei beat agganciata (Beat Sync)
+from spectrum_bands import create_spectrum_bands # Spettro a N bande (mel/log/ottave) per gli shader
+from audio_dsp import create_feature_chain # Noise gate, AGC e smoothing sui valori audio pubblicati
+from bonzomatic_params import ParamPublisher, SharedParamChannel # Trasporti dei parametri per Bonzomatic (file JSON / memoria condivisa)
 
 # Import requests con fallback (necessario per download da Shadertoy API)
 try:
@@ -93,17 +105,34 @@ class ShaderBridgePlayer:
     SUBPROCESS_CREATE_NO_WINDOW_FLAG = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
     BONZOMATIC_LIVE_SHADER_FILENAME = "live_shader.frag" # File che Bonzomatic dovrebbe ricaricare automaticamente
     BONZOMATIC_PARAMS_FILENAME = "bonzomatic_params.txt" # File per output parametri effetti
+    BONZOMATIC_PARAMS_SHM_FILENAME = "bonzomatic_params.bin" # Blocco binario mappato in memoria (trasporto "shm")
+    BONZOMATIC_PARAMS_RATE_HZ = 60 # Scritture massime al secondo del file parametri (gli aggiornamenti intermedi vengono fusi)
 
     # --- Costanti Audio Engine ---
     AUDIO_DEFAULT_SAMPLE_RATE = 44100
-    AUDIO_DEFAULT_CHUNK_SIZE = 1024
+    AUDIO_DEFAULT_CHUNK_SIZE = 256 # Campioni per callback di cattura (~5.8 ms a 44.1 kHz)
     AUDIO_DEFAULT_CHANNELS = 1
     AUDIO_DEFAULT_NOISE_THRESHOLD = 0.01
     AUDIO_DEFAULT_BPM_RANGE = [60, 200]
     AUDIO_DEFAULT_BEAT_SENSITIVITY = 0.5
     AUDIO_DEFAULT_BASS_FREQ_RANGE = [20, 250]
     AUDIO_ANALYSIS_THREAD_SLEEP_SECONDS = 0.05
-    AUDIO_SYNC_LOOP_SLEEP_SECONDS = 0.1 # Frequenza di aggiornamento dei parametri per Bonzomatic
+    AUDIO_ANALYSIS_HOP_SIZE = 512 # Campioni tra due analisi (indipendente dal chunk di cattura)
+    AUDIO_ANALYSIS_WINDOW_SIZE = 2048 # Campioni per FFT: finestre sovrapposte di 4 hop
+    AUDIO_CAPTURE_MODE = "callback" # "callback": analisi e pubblicazione a ogni frame nel callback; "loop": thread di analisi + ciclo periodico
+    AUDIO_BAND_COUNT = 4 # Bande logaritmiche pubblicate come fFreq1-4
+    AUDIO_BAND_FREQ_RANGE = [30, 16000]
+    AUDIO_RING_BUFFER_SECONDS = 2.0
+    AUDIO_SPECTRUM_BANDS = 32 # Bande pubblicate in audio.spectrum (array JSON / coda del blocco condiviso)
+    AUDIO_SPECTRUM_SCALE = "mel" # "mel", "log" oppure "octave"
+    AUDIO_SPECTRUM_ATTACK_SECONDS = 0.01
+    AUDIO_SPECTRUM_RELEASE_SECONDS = 0.25
+    AUDIO_SPECTRUM_DECIMALS = 3 # Precisione dei valori nel file JSON
+    AUDIO_INPUT_OPTIONS = ["Microfono", "USB", "Esterno", "File audio", "Segnale di prova"]
+    AUDIO_DEVICE_KEYWORDS = {"USB": ["usb"], "Esterno": ["line", "ext"]} # Ricerca del dispositivo per nome
+    AUDIO_FILE_TYPES = [("File audio", "*.wav *.flac *.ogg"), ("Tutti i file", "*.*")]
+    AUDIO_SYNC_LOOP_SLEEP_SECONDS = 0.1 # Frequenza di aggiornamento dei parametri per Bonzomatic in modalità "loop"
+    BEAT_PULSE_SECONDS = 0.05 # Durata minima di beat_detected: non va persa tra due scritture del publisher
     MIN_BEAT_INTERVAL_SECONDS = 0.1
     MAX_BEAT_TIMES_FOR_BPM = 8
     MIN_BEATS_FOR_BPM_CALC = 4
@@ -111,11 +140,22 @@ class ShaderBridgePlayer:
     TAP_TEMPO_RESET_THRESHOLD_SECONDS = 2.0
     BPM_SMOOTHING_FACTOR = 0.2
     BASS_LEVEL_EFFECT_THRESHOLD = 0.1 # Soglia di livello bass per attivare effetti
+    AUTO_BPM_WINDOW_SECONDS = 8.0 # Audio analizzato per ogni stima del tempo
+    AUTO_BPM_MIN_CONFIDENCE = 0.2 # Periodicità minima dell'inviluppo di onset per aggiornare il BPM
+    BEATS_PER_BAR = 4 # Per bar_position nei parametri pubblicati
 
     # --- Costanti File Manager & Shader Loading ---
-    SHADER_CACHE_FILENAME = "shader_cache.json"
+    SHADER_CACHE_FILENAME = "shader_cache.json" # Cache legacy, migrata nel database al primo avvio
+    SHADER_DB_FILENAME = "shader_cache.db"
+    SHADER_STORE_BATCH_SIZE = 500 # Entry per transazione durante la scansione
+    SHADER_SCAN_PROGRESS_INTERVAL_SECONDS = 0.1 # Aggiornamenti di progresso della scansione (max 10 al secondo)
     SHADER_SUPPORTED_EXTENSIONS = ['.frag', '.glsl', '.fs', '.shader']
     SHADER_TITLE_TRUNCATE_LENGTH = 27
+    SHADER_ITEM_PADDING_Y = 2 # Spaziatura verticale tra le righe della lista shader
+    SHADER_LIST_ROW_HEIGHT = 30 # Altezza di una riga della lista shader virtualizzata
+    SHADER_LIST_HEIGHT = 150
+    SHADER_WATCH_DEBOUNCE_SECONDS = 0.3 # Silenzio richiesto prima di elaborare un gruppo di modifiche
+    SHADER_WATCH_POLL_INTERVAL_SECONDS = 1.0 # Intervallo del polling se inotify non è disponibile
     MIN_SHADER_CODE_SIZE_KB = 0 # Usato per display info
     SHADER_CACHE_CLEANUP_THRESHOLD = 1000 # Max entry nella cache prima di pulire
 
@@ -171,6 +211,12 @@ class ShaderBridgePlayer:
         self.scale_factor = 1.0
         self.shadertoy_connected = False # Stato della connessione Selenium
         self.browser_driver = None # Istanza del browser Selenium
+        self.shader_files = []
+        self.shader_store = None # Backend metadati shader (vedi load_shader_cache)
+        self.shader_search_index = ShaderSearchIndex() # Allineato allo store da store_shader_metadata/remove_shader_metadata
+        self.shader_watcher = None # Osservatore della cartella shader (vedi start_shader_watcher)
+        self.params_publisher = None # Thread di scrittura dei parametri per Bonzomatic (vedi get_params_publisher)
+        self.params_publisher_lock = threading.RLock() # get_params_publisher è chiamato anche dal thread audio (cattura a callback)
 
         # --- Configurazioni Moduli (usano costanti globali) ---
         self.bonzomatic_config = {
@@ -179,11 +225,15 @@ class ShaderBridgePlayer:
             "working_dir": "",
             "window_title": self.BONZOMATIC_DEFAULT_WINDOW_TITLE,
             "auto_find": True,
-            "live_shader_path": self.BONZOMATIC_LIVE_SHADER_FILENAME
+            "live_shader_path": self.BONZOMATIC_LIVE_SHADER_FILENAME,
+            "params_transport": "json" # "json" (file di testo) oppure "shm" (blocco binario con seqlock, vedi bonzomatic_params)
         }
         self.file_manager_config = {
             "cache_enabled": True,
+            "cache_backend": "sqlite", # "sqlite" oppure "json" (formato legacy)
             "recursive_scan": True,
+            "parallel_parsing": True, # Parsing metadati in un pool di processi
+            "watch_folder": True, # Aggiorna la libreria quando i file della cartella cambiano
             "max_cache_size": self.SHADER_CACHE_CLEANUP_THRESHOLD
         }
         self.audio_config = {
@@ -191,7 +241,11 @@ class ShaderBridgePlayer:
             "channels": self.AUDIO_DEFAULT_CHANNELS, "format": pyaudio.paFloat32 if AUDIO_AVAILABLE else None,
             "input_device": None, "auto_gain": True, "noise_threshold": self.AUDIO_DEFAULT_NOISE_THRESHOLD,
             "bpm_range": self.AUDIO_DEFAULT_BPM_RANGE, "beat_sensitivity": self.AUDIO_DEFAULT_BEAT_SENSITIVITY,
-            "bass_freq_range": self.AUDIO_DEFAULT_BASS_FREQ_RANGE, "enable_fft": True
+            "bass_freq_range": self.AUDIO_DEFAULT_BASS_FREQ_RANGE, "enable_fft": True,
+            "hop_size": self.AUDIO_ANALYSIS_HOP_SIZE, "window_size": self.AUDIO_ANALYSIS_WINDOW_SIZE,
+            "capture_mode": self.AUDIO_CAPTURE_MODE, "band_count": self.AUDIO_BAND_COUNT,
+            "band_freq_range": self.AUDIO_BAND_FREQ_RANGE, "spectrum_bands": self.AUDIO_SPECTRUM_BANDS,
+            "spectrum_scale": self.AUDIO_SPECTRUM_SCALE
         }
         self.shadertoy_config = {
             "browser_type": "chrome", "headless": False, "auto_fullscreen": True,
@@ -206,9 +260,21 @@ class ShaderBridgePlayer:
         
         # --- Variabili di Stato dell'Audio Engine ---
         self.audio_stream = None; self.audio_thread = None; self.audio_recording = False
+        self.audio_engine = None; self.audio_source = None # Vedi setup_audio_engine/start_audio_capture
+        self.audio_file_path = None # File scelto per l'ingresso "File audio"
+        self.tempo_tracker = None # Registrato sul motore audio quando Auto BPM è attivo
         self.current_bpm = 120; self.beat_detected = False; self.audio_level = 0.0
-        self.frequency_data = []; self.bass_level = 0.0; self.tap_tempo_times = []
+        self.frequency_data = []; self.bass_level = 0.0
+        self.spectrum_bands = None; self.spectrum_data = [] # Spettro a N bande registrato sul motore audio
+        self.feature_chain = None # Gate -> AGC -> smoothing su livello, bassi e bande (vedi attach_feature_chain)
         self.auto_bpm_enabled = False; self.beat_sync_enabled = False; self.bass_response_enabled = False
+        self.beat_clock = BeatClock(bpm=self.current_bpm, beats_per_bar=self.BEATS_PER_BAR, bpm_range=self.audio_config["bpm_range"],
+                                    tap_reset_seconds=self.TAP_TEMPO_RESET_THRESHOLD_SECONDS, min_taps=self.MIN_TAPS_FOR_BPM_CALC,
+                                    max_taps=self.MAX_BEAT_TIMES_FOR_BPM) # Fase dei beat, anche dal tap tempo
+        self.beat_clock_feed = None # Collega lo stimatore del tempo all'orologio dei beat
+        self.audio_frame_listener = None # Sincronizzazione per frame in modalità "callback" (vedi attach_sync_listener)
+        self.last_beat_count = 0; self.last_beat_index = None; self.beat_pulse_until = 0.0
+        self.last_synced_frame = 0; self.publish_latency = None # Arrivo dei campioni -> parametri pubblicati (creato all'avvio della cattura: richiede numpy)
         
         # --- Variabili di Stato Effetti Video ---
         self.effect_zoom = self.EFFECTS_ZOOM_DEFAULT
@@ -318,13 +384,20 @@ class ShaderBridgePlayer:
         
         self.load_folder_btn = ctk.CTkButton(button_frame, text="Seleziona Cartella Shader", command=self.load_shader_folder)
         self.load_folder_btn.pack(side="left", expand=True, fill="x", padx=self.BUTTON_PADDING)
+
+        self.show_duplicates_btn = ctk.CTkButton(button_frame, text="Duplicati", width=90, command=self.show_duplicate_shaders)
+        self.show_duplicates_btn.pack(side="left", padx=self.BUTTON_PADDING)
         
         self.shader_status_label = ctk.CTkLabel(frame, text="Nessuna cartella caricata.", font=("Arial", self.SUB_LABEL_FONT_SIZE))
         self.shader_status_label.pack(pady=(0, self.UI_PADDING))
         
-        # Lista shader (semplice elenco con pulsante "Carica su Bonzomatic" per anteprima/uso)
-        self.shader_list_frame = ctk.CTkScrollableFrame(frame, height=150)
-        self.shader_list_frame.pack(fill="x", padx=self.UI_PADDING, pady=(0, self.UI_PADDING))
+        # Lista shader virtualizzata: solo le righe visibili esistono, con pulsante "Carica su Bonzomatic" per anteprima/uso
+        self.shader_list_view = VirtualShaderListView(
+            frame, get_row_text=self.get_shader_list_row_text, on_activate=self.load_shader_to_bonzomatic,
+            action_text="Carica su Bonzomatic", empty_text="Nessun shader caricato.", row_height=self.SHADER_LIST_ROW_HEIGHT,
+            row_padding=self.SHADER_ITEM_PADDING_Y, height=self.SHADER_LIST_HEIGHT,
+            font=("Arial", self.SUB_LABEL_FONT_SIZE + 1, self.BOLD_FONT_WEIGHT), empty_font=("Arial", self.SUB_LABEL_FONT_SIZE))
+        self.shader_list_view.pack(fill="x", padx=self.UI_PADDING, pady=(0, self.UI_PADDING))
         self.update_shader_list() # Popola l'elenco iniziale (mostrerà "Nessun shader caricato.")
 
     def create_shadertoy_download_section(self):
@@ -361,7 +434,7 @@ class ShaderBridgePlayer:
         
         ctk.CTkLabel(audio_frame, text="Ingresso:").pack(side="left", padx=self.BUTTON_PADDING)
         self.audio_input_var = ctk.StringVar(value="Microfono")
-        self.audio_dropdown = ctk.CTkOptionMenu(audio_frame, values=["Microfono", "USB", "Esterno"], variable=self.audio_input_var, command=self.change_audio_input)
+        self.audio_dropdown = ctk.CTkOptionMenu(audio_frame, values=self.AUDIO_INPUT_OPTIONS, variable=self.audio_input_var, command=self.change_audio_input)
         self.audio_dropdown.pack(side="left", padx=self.BUTTON_PADDING)
         
         self.bpm_label = ctk.CTkLabel(audio_frame, text="BPM: 120", font=("Arial", self.SUB_LABEL_FONT_SIZE, self.BOLD_FONT_WEIGHT))
@@ -374,6 +447,9 @@ class ShaderBridgePlayer:
         ctk.CTkSwitch(controls_frame, text="Auto BPM", command=self.toggle_auto_bpm).pack(side="left", padx=self.BUTTON_PADDING)
         ctk.CTkSwitch(controls_frame, text="Beat Sync", command=self.toggle_beat_sync).pack(side="left", padx=self.BUTTON_PADDING)
         ctk.CTkSwitch(controls_frame, text="Bass Response", command=self.toggle_bass_response).pack(side="left", padx=self.BUTTON_PADDING)
+        auto_gain_switch = ctk.CTkSwitch(controls_frame, text="Auto Gain", command=self.toggle_auto_gain)
+        auto_gain_switch.pack(side="left", padx=self.BUTTON_PADDING)
+        if self.audio_config["auto_gain"]: auto_gain_switch.select()
 
     def create_video_effects_section(self):
         """Sezione UI per il controllo degli effetti video base (Zoom, Pan, Rotazione, Distorsione)."""
@@ -483,6 +559,7 @@ class ShaderBridgePlayer:
             
     def scan_shader_files(self):
         """Scansiona i file shader nella cartella selezionata e li aggiunge alla libreria."""
+        self.stop_shader_watcher() # La scansione completa sostituisce gli aggiornamenti incrementali
         self.shader_files = [] # Resetta la lista dei file shader
         
         try:
@@ -522,39 +599,106 @@ class ShaderBridgePlayer:
         try:
             self.update_shader_list()
             self.shader_status_label.configure(text=f"Caricati {processed_count} shader.")
+            if self.file_manager_config.get('watch_folder', True): self.start_shader_watcher()
         except Exception as e:
             print(f"Errore durante la finalizzazione della scansione shader: {e}")
             traceback.print_exc()
             
-    def update_shader_list(self):
-        """Aggiorna la visualizzazione della lista degli shader nell'interfaccia, includendo il pulsante per caricare su Bonzomatic."""
+    def update_shader_list(self, changed_files=None):
+        """Aggiorna la lista degli shader: la vista virtualizzata ridisegna solo le righe visibili cambiate e mantiene lo scroll."""
         try:
-            for widget in self.shader_list_frame.winfo_children():
-                widget.destroy()
-                
-            if not self.shader_files:
-                ctk.CTkLabel(self.shader_list_frame, text="Nessun shader caricato.", font=("Arial", self.SUB_LABEL_FONT_SIZE)).pack(pady=self.UI_PADDING)
+            self.shader_list_view.set_items(self.shader_files)
+            if changed_files: self.shader_list_view.refresh(changed_files)
+        except Exception as e:
+            print(f"Errore durante l'aggiornamento della lista shader: {e}")
+            traceback.print_exc()
+
+    def get_shader_list_row_text(self, shader_path):
+        """Testo di una riga della lista: icona di validità e titolo troncato."""
+        display_info = self.get_shader_display_info(shader_path)
+        icon = "✅" if display_info['valid'] else "❌"
+        title_text = display_info['title'] or os.path.basename(shader_path)
+        if len(title_text) > self.SHADER_TITLE_TRUNCATE_LENGTH:
+            title_text = title_text[:self.SHADER_TITLE_TRUNCATE_LENGTH] + "..."
+        return f"{icon} {title_text}"
+
+    def show_duplicate_shaders(self):
+        """Mostra in una finestra i gruppi di shader con contenuto identico (copie in cartelle diverse)."""
+        try:
+            self.load_shader_cache()
+            groups = self.shader_store.find_duplicates()
+            if not groups:
+                messagebox.showinfo("Duplicati", "Nessuno shader duplicato nella libreria."); return
+            row_texts = {}
+            for content_hash, filepaths in groups:
+                title = self.get_shader_display_info(filepaths[0])['title']
+                for filepath in filepaths:
+                    location = os.path.relpath(filepath, self.shader_folder) if self.shader_folder else filepath
+                    row_texts[filepath] = f"×{len(filepaths)} {title[:self.SHADER_TITLE_TRUNCATE_LENGTH]} — {location}"
+            copies = sum(len(filepaths) - 1 for _, filepaths in groups)
+            window = ctk.CTkToplevel(self.root)
+            window.title(f"Shader duplicati: {len(groups)} contenuti, {copies} copie in eccesso")
+            window.geometry("640x420")
+            duplicates_view = VirtualShaderListView(
+                window, get_row_text=row_texts.get, on_activate=self.load_shader_to_bonzomatic, action_text="Carica su Bonzomatic",
+                empty_text="Nessuno shader duplicato.", row_height=self.SHADER_LIST_ROW_HEIGHT, row_padding=self.SHADER_ITEM_PADDING_Y,
+                height=400, font=("Arial", self.SUB_LABEL_FONT_SIZE + 1))
+            duplicates_view.pack(fill="both", expand=True, padx=self.UI_PADDING, pady=self.UI_PADDING)
+            duplicates_view.set_items(list(row_texts))
+        except Exception as e:
+            print(f"Errore durante la visualizzazione degli shader duplicati: {e}")
+            traceback.print_exc()
+
+    # --- OSSERVAZIONE CARTELLA SHADER (AGGIORNAMENTI INCREMENTALI) ---
+    def start_shader_watcher(self):
+        """Avvia l'osservazione della cartella shader corrente (inotify su Linux, polling altrove)."""
+        try:
+            self.stop_shader_watcher()
+            if not self.shader_folder or not os.path.isdir(self.shader_folder):
                 return
+            self.shader_watcher = ShaderFolderWatcher(
+                self.shader_folder, self.SHADER_SUPPORTED_EXTENSIONS, self.on_shader_folder_changed,
+                recursive=self.file_manager_config['recursive_scan'], debounce_seconds=self.SHADER_WATCH_DEBOUNCE_SECONDS,
+                poll_interval=self.SHADER_WATCH_POLL_INTERVAL_SECONDS)
+            self.shader_watcher.start()
+        except Exception as e:
+            print(f"Errore durante l'avvio dell'osservazione della cartella shader: {e}")
+            traceback.print_exc()
+            self.shader_watcher = None
 
-            for i, shader_path in enumerate(self.shader_files):
-                shader_item_frame = ctk.CTkFrame(self.shader_list_frame)
-                shader_item_frame.pack(fill="x", pady=self.SHADER_ITEM_PADDING_Y)
-                
-                display_info = self.get_shader_display_info(shader_path)
-                
-                # Icona e titolo shader
-                icon = "✅" if display_info['valid'] else "❌"
-                title_text = display_info['title'] or os.path.basename(shader_path)
-                if len(title_text) > self.SHADER_TITLE_TRUNCATE_LENGTH:
-                    title_text = title_text[:self.SHADER_TITLE_TRUNCATE_LENGTH] + "..."
-
-                item_label = ctk.CTkLabel(shader_item_frame, text=f"{icon} {title_text}", font=("Arial", self.SUB_LABEL_FONT_SIZE + 1, self.BOLD_FONT_WEIGHT))
-                item_label.pack(side="left", padx=self.BUTTON_PADDING, expand=True, anchor="w")
-
-                # Pulsante "Carica su Bonzomatic" per anteprima/uso
-                load_bonzo_btn = ctk.CTkButton(shader_item_frame, text="Carica su Bonzomatic", command=lambda s=shader_path: self.load_shader_to_bonzomatic(s))
-                load_bonzo_btn.pack(side="right", padx=self.BUTTON_PADDING)
-                
+    def stop_shader_watcher(self):
+        """Ferma l'osservazione della cartella shader, se attiva."""
+        if self.shader_watcher is not None:
+            try: self.shader_watcher.stop()
+            except Exception as e: print(f"Errore durante l'arresto dell'osservazione della cartella shader: {e}"); traceback.print_exc()
+            self.shader_watcher = None
+
+    def on_shader_folder_changed(self, updated, deleted, full_rescan):
+        """Callback del watcher (thread dell'osservatore): elabora solo i percorsi cambiati, poi aggiorna la lista nella UI."""
+        try:
+            if full_rescan:
+                self.root.after(0, self.scan_shader_files); return # Eventi persi o cartella spostata: riscansione completa
+            deleted_set = set(deleted); deleted_prefixes = tuple(path + os.sep for path in deleted)
+            deleted_files = [filepath for filepath in list(self.shader_files) if filepath in deleted_set or filepath.startswith(deleted_prefixes)]
+            self.load_shader_cache()
+            if deleted_files: self.remove_shader_metadata(deleted_files)
+            if updated: self.process_shader_files(updated)
+            self.root.after(0, self.apply_shader_folder_changes, updated, deleted_files)
+        except Exception as e:
+            print(f"Errore durante l'aggiornamento incrementale della libreria shader: {e}")
+            traceback.print_exc()
+
+    def apply_shader_folder_changes(self, updated, deleted_files):
+        """Aggiorna self.shader_files sul posto e ridisegna solo le righe visibili interessate."""
+        try:
+            removed = set(deleted_files)
+            if removed:
+                self.shader_files[:] = [filepath for filepath in self.shader_files if filepath not in removed]
+            known = set(self.shader_files); added = 0
+            for filepath in updated:
+                if filepath not in known: self.shader_files.append(filepath); known.add(filepath); added += 1
+            self.update_shader_list(changed_files=updated)
+            self.shader_status_label.configure(text=f"Libreria aggiornata: {added} nuovi, {len(updated) - added} modificati, {len(deleted_files)} rimossi ({len(self.shader_files)} shader).")
         except Exception as e:
             print(f"Errore durante l'aggiornamento della lista shader: {e}")
             traceback.print_exc()
@@ -1117,31 +1261,39 @@ class ShaderBridgePlayer:
 
     # --- METODI DI SUPPORTO PER FILE MANAGER E SHADER (DA VERSIONI PRECEDENTI) ---
     def load_shader_cache(self):
-        """Carica i metadati degli shader dalla cache (file JSON)."""
+        """Apre il backend dei metadati shader (SQLite di default; migra la vecchia cache JSON al primo avvio)."""
+        if self.shader_store is not None:
+            return True
         try:
-            if os.path.exists(self.SHADER_CACHE_FILENAME):
-                with open(self.SHADER_CACHE_FILENAME, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                    self.shader_metadata = cache_data.get('shaders', {})
-                    print(f"Cache shader caricata da {self.SHADER_CACHE_FILENAME}.")
-                    return True
-            print("Nessuna cache shader trovata.")
+            backend = self.file_manager_config.get('cache_backend', 'sqlite') if self.file_manager_config['cache_enabled'] else 'memory'
+            self.shader_store = create_shader_store(backend, self.SHADER_DB_FILENAME, self.SHADER_CACHE_FILENAME)
+            self.shader_search_index.rebuild(self.shader_store.load_search_fields())
+            print(f"Cache shader aperta (backend: {backend}, {self.shader_store.count()} shader).")
+            return True
         except Exception as e:
             print(f"Errore durante il caricamento della cache shader: {e}")
             traceback.print_exc()
+            self.shader_store = create_shader_store('memory', None, None) # Fallback non persistente
+            self.shader_search_index.clear()
         return False
+
+    def store_shader_metadata(self, entries):
+        """Salva i metadati nello store e aggiorna l'indice di ricerca (unico punto di scrittura dei metadati)."""
+        self.shader_store.upsert_many(entries)
+        self.shader_search_index.update_many(entries)
+
+    def remove_shader_metadata(self, filepaths):
+        """Rimuove i metadati dallo store e dall'indice di ricerca."""
+        self.shader_store.delete_many(filepaths)
+        self.shader_search_index.remove_many(filepaths)
         
     def save_shader_cache(self):
-        """Salva i metadati degli shader nella cache (file JSON)."""
+        """Rende persistenti le modifiche pendenti della cache shader (il backend SQLite salva già per riga)."""
         try:
-            cache_data = {
-                'version': '1.0',
-                'timestamp': datetime.now().isoformat(),
-                'shaders': self.shader_metadata
-            }
-            with open(self.SHADER_CACHE_FILENAME, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, indent=2, ensure_ascii=False)
-            print(f"Cache shader salvata in {self.SHADER_CACHE_FILENAME}.")
+            if self.shader_store is None:
+                return False
+            self.shader_store.flush()
+            print("Cache shader salvata.")
             return True
         except Exception as e:
             print(f"Errore durante il salvataggio della cache shader: {e}")
@@ -1152,27 +1304,22 @@ class ShaderBridgePlayer:
         """Pulisce la cache degli shader rimuovendo le entry obsolete o in eccesso."""
         try:
             max_size = self.file_manager_config.get('max_cache_size', self.SHADER_CACHE_CLEANUP_THRESHOLD)
-            if len(self.shader_metadata) <= max_size:
+            if self.shader_store.count() <= max_size:
                 return # Non è necessario pulire se la cache non supera la dimensione massima
                 
-            initial_count = len(self.shader_metadata)
             files_to_remove_from_cache = [
-                filepath for filepath in list(self.shader_metadata.keys())
+                filepath for filepath in self.shader_store.all_filepaths()
                 if not os.path.exists(filepath)
             ]
-            for filepath in files_to_remove_from_cache:
-                del self.shader_metadata[filepath]
+            self.remove_shader_metadata(files_to_remove_from_cache)
             
             removed_non_existent = len(files_to_remove_from_cache)
             if removed_non_existent > 0:
                 print(f"Rimosse {removed_non_existent} entry di shader non esistenti dalla cache.")
 
-            if len(self.shader_metadata) > max_size:
-                sorted_files = sorted(self.shader_metadata.items(), key=lambda item: item[1].get('modified', 0))
-                to_remove_by_size = len(sorted_files) - max_size
-                for i in range(to_remove_by_size):
-                    filepath = sorted_files[i][0]
-                    del self.shader_metadata[filepath]
+            to_remove_by_size = self.shader_store.count() - max_size
+            if to_remove_by_size > 0:
+                self.shader_search_index.remove_many(self.shader_store.delete_oldest(to_remove_by_size))
                 print(f"Rimosse {to_remove_by_size} entry di shader più vecchie dalla cache per ridurre la dimensione.")
                 
         except Exception as e:
@@ -1180,15 +1327,13 @@ class ShaderBridgePlayer:
             traceback.print_exc()
         
     def calculate_file_hash(self, filepath):
-        """Calcola l'hash MD5 di un file per rilevare modifiche."""
+        """Calcola l'hash BLAKE2 di un file (lettura a blocchi) per rilevare modifiche."""
         try:
             if not os.path.exists(filepath):
                 print(f"Avviso: Il file {filepath} non esiste, impossibile calcolare l'hash.")
                 return None
             
-            with open(filepath, 'rb') as f:
-                content = f.read()
-                return hashlib.md5(content).hexdigest()
+            return hash_file(filepath)
         except Exception as e:
             print(f"Errore durante il calcolo dell'hash del file {filepath}: {e}")
             traceback.print_exc()
@@ -1196,94 +1341,19 @@ class ShaderBridgePlayer:
             
     def parse_shader_metadata(self, filepath):
         """Estrae i metadati (titolo, autore, tag, ecc.) da un file shader."""
-        metadata = {
-            'filepath': filepath, 'filename': os.path.basename(filepath),
-            'size': 0, 'modified': 0, 'hash': '', 'title': '', 'author': '',
-            'description': '', 'tags': [], 'uniforms': [], 'passes': 1,
-            'type': 'fragment', 'shadertoy_id': '', 'valid': False, 'error': ''
-        }
-        try:
-            filepath_obj = Path(filepath)
-            stat = filepath_obj.stat()
-            metadata['size'] = stat.st_size
-            metadata['modified'] = stat.st_mtime
-            metadata['hash'] = self.calculate_file_hash(filepath)
-            
-            with filepath_obj.open('r', encoding='utf-8') as f:
-                content = f.read()
-                
-            metadata.update(self.extract_shader_info_from_content(content))
-            
-            validation_result = self.validate_shader_syntax(content)
-            metadata['valid'] = validation_result['valid']
-            metadata['error'] = validation_result.get('error', '')
-            
-        except Exception as e:
-            metadata['error'] = str(e)
-            print(f"Errore durante il parsing dei metadati dello shader per {filepath}: {e}")
-            traceback.print_exc()
-            
-        return metadata
+        return shader_metadata.parse_shader_file(filepath)
         
     def extract_shader_info_from_content(self, content):
         """Estrae informazioni specifiche dai commenti all'inizio del file shader."""
-        info = {
-            'title': '', 'author': '', 'description': '',
-            'tags': [], 'uniforms': [], 'passes': 1, 'shadertoy_id': ''
-        }
-        patterns_to_extract = {
-            'title': r'//\s*title\s*:\s*(.+?)(?:\n|$)', 'author': r'//\s*author\s*:\s*(.+?)(?:\n|$)',
-            'description': r'//\s*description\s*:\s*(.+?)(?:\n|$)', 'tags': r'//\s*tags\s*:\s*(.+?)(?:\n|$)',
-            'shadertoy': r'//\s*shadertoy\s*:\s*(.+?)(?:\n|$)'
-        }
-        for key, pattern in patterns_to_extract.items():
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            if matches:
-                if key == 'tags': info[key] = [tag.strip() for tag in matches[0].split(',') if tag.strip()]
-                elif key == 'shadertoy':
-                    extracted_id = self.extract_shadertoy_id_from_url_static(matches[0].strip())
-                    if extracted_id: info['shadertoy_id'] = extracted_id
-                else: info[key] = matches[0].strip()
-        
-        uniform_pattern = r'uniform\s+(?:vec\d+|mat\d+|float|int|sampler2D|sampler3D)\s+(\w+)\s*;'
-        uniforms = re.findall(uniform_pattern, content)
-        info['uniforms'] = [{'type': 'auto_detected', 'name': u} for u in uniforms]
-        main_count = len(re.findall(r'void\s+(?:mainImage|main)\s*\(', content))
-        if main_count > 1: info['passes'] = main_count
-        return info
+        return shader_metadata.extract_shader_info(content)
         
     def extract_shadertoy_id_from_url_static(self, url_to_parse):
         """Versione statica di extract_shadertoy_id_from_url per l'uso nel parsing dei metadati."""
-        try:
-            if not url_to_parse: return None
-            patterns = [
-                r'shadertoy\.com/view/([a-zA-Z0-9]+)', r'shadertoy\.com/embed/([a-zA-Z0-9]+)', 
-                r'view/([a-zA-Z0-9]{6,})', r'embed/([a-zA-Z0-9]{6,})',
-                r'/([a-zA-Z0-9]{6,})(?:\?|$)', r'#([a-zA-Z0-9]{6,})'
-            ]
-            for pattern in patterns:
-                match = re.search(pattern, url_to_parse)
-                if match and len(match.group(1)) >= self.SHADERTOY_ID_MIN_LENGTH: return match.group(1)
-            return None
-        except Exception as e:
-            print(f"Errore durante l'estrazione statica dell'ID shader: {e}")
-            traceback.print_exc()
-            return None
+        return shader_metadata.extract_shadertoy_id(url_to_parse, self.SHADERTOY_ID_MIN_LENGTH)
 
     def validate_shader_syntax(self, content):
         """Esegue una validazione sintattica di base per i file shader GLSL."""
-        result = {'valid': True, 'error': ''}
-        try:
-            if 'void main(' not in content and 'void mainImage(' not in content:
-                result['valid'] = False; result['error'] = 'Manca la funzione main() o mainImage().'; return result
-            if 'gl_FragColor' not in content and 'fragColor' not in content and 'out vec4 fragColor' not in content:
-                result['valid'] = False; result['error'] = 'Manca l\'assegnazione del colore di output (gl_FragColor o fragColor).'; return result
-            open_braces = content.count('{'); close_braces = content.count('}')
-            if open_braces != close_braces:
-                result['valid'] = False; result['error'] = f'Parentesi graffe non bilanciate: {open_braces} aperte, {close_braces} chiuse.'; return result
-        except Exception as e:
-            result['valid'] = False; result['error'] = f"Errore critico durante la validazione sintattica: {e}"; traceback.print_exc()
-        return result
+        return shader_metadata.validate_shader_syntax(content)
         
     def scan_shader_directory(self, directory, recursive=True):
         """Scansiona una directory alla ricerca di file shader con estensioni supportate."""
@@ -1292,12 +1362,12 @@ class ShaderBridgePlayer:
             if recursive:
                 for root, dirs, files in os.walk(directory):
                     for file in files:
-                        if any(file.lower().endswith(ext) for ext in self.supported_extensions):
+                        if any(file.lower().endswith(ext) for ext in self.SHADER_SUPPORTED_EXTENSIONS):
                             found_files.append(os.path.join(root, file))
             else:
                 for file in os.listdir(directory):
                     filepath = os.path.join(directory, file)
-                    if os.path.isfile(filepath) and any(file.lower().endswith(ext) for ext in self.supported_extensions):
+                    if os.path.isfile(filepath) and any(file.lower().endswith(ext) for ext in self.SHADER_SUPPORTED_EXTENSIONS):
                         found_files.append(filepath)
             print(f"Trovati {len(found_files)} file shader nella directory: {directory}.")
         except (OSError, PermissionError) as e:
@@ -1307,34 +1377,40 @@ class ShaderBridgePlayer:
         return found_files
         
     def process_shader_files(self, file_list):
-        """Elabora una lista di file shader, estraendo metadati e aggiornando la cache."""
+        """Elabora una lista di file shader in parallelo, estraendo metadati e aggiornando la cache a blocchi."""
         processed = 0; total = len(file_list)
-        if self.file_manager_config['cache_enabled']: self.load_shader_cache()
-        for filepath in file_list:
-            try:
-                need_reprocess = True
-                if filepath in self.shader_metadata:
-                    cached_hash = self.shader_metadata[filepath].get('hash', ''); current_hash = self.calculate_file_hash(filepath)
-                    if cached_hash == current_hash: need_reprocess = False
-                if need_reprocess:
-                    metadata = self.parse_shader_metadata(filepath); self.shader_metadata[filepath] = metadata
-                processed += 1
-                if hasattr(self, 'shader_status_label') and hasattr(self, 'root'): # Usato shader_status_label
-                    progress = int((processed / total) * 100)
-                    try: self.root.after(0, lambda p=progress: self.shader_status_label.configure(text=f"Elaborazione shader: {p}% ({processed}/{total})"))
-                    except Exception as e: print(f"Errore nell'aggiornamento della UI (progress bar): {e}"); traceback.print_exc(); pass
-            except Exception as e:
-                print(f"Errore durante l'elaborazione del file shader {filepath}: {e}"); traceback.print_exc()
+        self.load_shader_cache()
+        index = ShaderLibraryIndex(self.shader_store.load_signatures()) # Rilegge/rihasha solo i file con firma stat cambiata
+        pool = ShaderExtractionPool(index, batch_size=self.SHADER_STORE_BATCH_SIZE, progress_interval=self.SHADER_SCAN_PROGRESS_INTERVAL_SECONDS,
+                                    use_processes=self.file_manager_config.get('parallel_parsing', True),
+                                    content_lookup=self.shader_store.get_content) # Parsing una sola volta per contenuto
+        try:
+            processed = pool.run(file_list, self.store_shader_metadata, self.report_shader_scan_progress)
+        except Exception as e:
+            print(f"Errore durante l'elaborazione parallela dei file shader: {e}"); traceback.print_exc()
+        try:
+            stored = ((filepath, self.shader_store.get(filepath)) for filepath in index.touched)
+            self.store_shader_metadata([dict(metadata, **index.entries[filepath]) for filepath, metadata in stored if metadata]) # Percorsi assenti dallo store: nulla da aggiornare
+        except Exception as e:
+            print(f"Errore durante l'aggiornamento della cache shader: {e}"); traceback.print_exc()
         if self.file_manager_config['cache_enabled']: self.cleanup_shader_cache(); self.save_shader_cache()
-        print(f"Elaborazione completata. Processati {processed} di {total} shader.")
+        print(f"Elaborazione completata. Processati {processed} di {total} shader (invariati: {index.stats[index.STATUS_UNCHANGED]}, toccati: {index.stats[index.STATUS_TOUCHED]}, rielaborati: {index.stats[index.STATUS_CHANGED]}; "
+              f"analizzati: {pool.stats['parsed']}, già in cache: {pool.stats['cached']}, copie duplicate: {pool.stats['duplicates']}).")
         return processed
         
+    def report_shader_scan_progress(self, processed, total):
+        """Aggiorna il label di progresso della scansione (chiamata dal pool a frequenza limitata)."""
+        if not hasattr(self, 'shader_status_label') or not hasattr(self, 'root'): return
+        progress = int((processed / total) * 100) if total else 100
+        try: self.root.after(0, lambda: self.shader_status_label.configure(text=f"Elaborazione shader: {progress}% ({processed}/{total})"))
+        except Exception as e: print(f"Errore nell'aggiornamento della UI (progress bar): {e}"); traceback.print_exc()
+
     def get_shader_display_info(self, filepath):
         """Ottiene le informazioni di uno shader per la visualizzazione nell'interfaccia utente."""
         try:
-            if filepath not in self.shader_metadata:
+            metadata = self.shader_store.get(filepath) if self.shader_store else None
+            if metadata is None:
                 return {'title': os.path.basename(filepath), 'author': 'Unknown', 'valid': False, 'tags': [], 'description': 'Metadati non disponibili.', 'uniforms_count': 0, 'size_kb': 0}
-            metadata = self.shader_metadata[filepath]
             title = metadata.get('title', '') or metadata.get('filename', os.path.basename(filepath))
             return {'title': title, 'author': metadata.get('author', 'Unknown'), 'valid': metadata.get('valid', False), 'tags': metadata.get('tags', []), 'description': metadata.get('description', ''), 'uniforms_count': len(metadata.get('uniforms', [])), 'size_kb': round(metadata.get('size', 0) / 1024, 1)}
         except Exception as e:
@@ -1342,21 +1418,12 @@ class ShaderBridgePlayer:
             return {'title': os.path.basename(filepath) if filepath else 'Sconosciuto', 'author': 'Errore', 'valid': False, 'tags': [], 'description': 'Errore caricamento metadati.', 'uniforms_count': 0, 'size_kb': 0}
         
     def filter_shaders_by_criteria(self, criteria):
-        """Filtra la lista degli shader basandosi su criteri specificati (es. testo, validità, tag)."""
+        """Filtra la lista degli shader (testo anche per prefisso, validità, tag) tramite l'indice di ricerca; con testo, risultati ordinati per rilevanza."""
         filtered = []
         try:
-            for filepath, metadata in self.shader_metadata.items():
-                matches = True
-                if criteria.get('text', ''):
-                    text_search = criteria['text'].lower()
-                    searchable_text = ' '.join([metadata.get('title', ''), metadata.get('author', ''), metadata.get('description', ''), ' '.join(metadata.get('tags', []))]).lower()
-                    if text_search not in searchable_text: matches = False
-                if criteria.get('valid_only', False):
-                    if not metadata.get('valid', False): matches = False
-                if criteria.get('tags', []):
-                    shader_tags = {tag.lower() for tag in metadata.get('tags', [])}; required_tags = {tag.lower() for tag in criteria['tags']}
-                    if not shader_tags.intersection(required_tags): matches = False
-                if matches: filtered.append(filepath)
+            self.load_shader_cache()
+            filtered = self.shader_search_index.query(text=criteria.get('text', ''), valid_only=criteria.get('valid_only', False),
+                                                      tags=criteria.get('tags', []), limit=criteria.get('limit'))
         except Exception as e:
             print(f"Errore durante il filtro degli shader: {e}"); traceback.print_exc()
         return filtered
@@ -1379,7 +1446,7 @@ class ShaderBridgePlayer:
     def export_shader_for_bonzomatic(self, filepath, output_path=None):
         """Esporta uno shader in un file compatibile con Bonzomatic."""
         try:
-            if filepath not in self.shader_metadata: raise ValueError("Shader non trovato nella cache. Impossibile esportare.")
+            if not self.shader_store or filepath not in self.shader_store: raise ValueError("Shader non trovato nella cache. Impossibile esportare.")
             with open(filepath, 'r', encoding='utf-8') as f: content = f.read()
             converted_content = self.convert_shadertoy_to_bonzomatic(content)
             if not output_path:
@@ -1568,6 +1635,210 @@ class ShaderBridgePlayer:
             messagebox.showwarning("Bonzomatic", "Bonzomatic è terminato inaspettatamente! Controlla il terminale per errori."); print("UI Bonzomatic aggiornata: Crash rilevato.")
         except Exception as e: print(f"Errore nella callback 'Bonzomatic crashato': {e}"); traceback.print_exc()
 
+    # --- METODI AUDIO ENGINE ---
+    def setup_audio_engine(self, sample_rate=None):
+        """Crea il motore di analisi audio (buffer e FFT preallocati) se le librerie audio sono disponibili."""
+        if not AUDIO_AVAILABLE:
+            print("Audio engine non inizializzato: librerie audio non disponibili."); return
+        try:
+            config = self.audio_config
+            self.audio_engine = AudioAnalysisEngine(
+                sample_rate=sample_rate or config["sample_rate"], hop_size=config["hop_size"], window_size=config["window_size"],
+                band_count=config["band_count"], band_range=config["band_freq_range"], bass_range=config["bass_freq_range"],
+                ring_seconds=self.AUDIO_RING_BUFFER_SECONDS, inline=config["capture_mode"] == "callback") # Gate nella catena DSP
+            print(f"Audio engine pronto: {config['sample_rate']} Hz, hop {config['hop_size']}, finestra {config['window_size']}, "
+                  f"{config['band_count']} bande, modalità {config['capture_mode']}.")
+        except Exception as e: self.audio_engine = None; print(f"Errore durante l'inizializzazione dell'audio engine: {e}"); traceback.print_exc()
+
+    def create_audio_source(self):
+        """Crea la sorgente per l'ingresso selezionato: dispositivo PyAudio, file audio o segnale sintetico."""
+        config = self.audio_config
+        if self.audio_input == "File audio":
+            if not self.audio_file_path: return None
+            return FileAudioSource(self.audio_file_path, chunk_size=config["chunk_size"], realtime=True, loop=True)
+        if self.audio_input == "Segnale di prova":
+            return SyntheticAudioSource(sample_rate=config["sample_rate"], chunk_size=config["chunk_size"], bpm=self.current_bpm, sweep_range=(40.0, 8000.0))
+        device_index = config["input_device"]
+        if device_index is None and self.audio_input in self.AUDIO_DEVICE_KEYWORDS:
+            device_index = PyAudioSource.find_input_device(self.AUDIO_DEVICE_KEYWORDS[self.audio_input])
+        return PyAudioSource(sample_rate=config["sample_rate"], chunk_size=config["chunk_size"], channels=config["channels"], device_index=device_index)
+
+    def change_audio_input(self, choice):
+        """Cambia la sorgente audio; se la cattura è attiva la riavvia sulla nuova sorgente."""
+        try:
+            if choice == "File audio":
+                filepath = filedialog.askopenfilename(title="Seleziona file audio", filetypes=self.AUDIO_FILE_TYPES)
+                if not filepath:
+                    self.audio_input_var.set(self.audio_input); return # Selezione annullata: resta l'ingresso precedente
+                self.audio_file_path = filepath
+            self.audio_input = choice; print(f"Ingresso audio selezionato: {choice}")
+            if self.audio_recording: self.stop_audio_capture(); self.start_audio_capture()
+        except Exception as e: print(f"Errore durante il cambio di ingresso audio: {e}"); traceback.print_exc()
+
+    def start_audio_capture(self):
+        """Avvia la sorgente audio selezionata verso il motore di analisi e la sincronizzazione dei parametri."""
+        if self.audio_recording or not AUDIO_AVAILABLE: return
+        try:
+            source = self.create_audio_source()
+            if source is None: print("Nessuna sorgente audio disponibile per l'ingresso selezionato."); return
+            if self.audio_engine is None or self.audio_engine.sample_rate != source.sample_rate:
+                self.setup_audio_engine(source.sample_rate) # Es. file con frequenza di campionamento diversa
+            if self.audio_engine is None: return
+            self.attach_spectrum_bands(); self.attach_feature_chain()
+            if self.auto_bpm_enabled: self.attach_tempo_tracker()
+            self.audio_source = source
+            self.last_beat_count = self.tempo_tracker.beat_count if self.tempo_tracker is not None else 0
+            self.last_beat_index = None; self.audio_engine.latency.reset()
+            if self.publish_latency is None: self.publish_latency = LatencyStats()
+            else: self.publish_latency.reset()
+            self.audio_recording = True
+            if self.audio_config["capture_mode"] == "callback": self.attach_sync_listener()
+            else: self.start_audio_sync_loop()
+            self.audio_engine.start()
+            source.start(self.audio_engine.feed)
+            print(f"Cattura audio avviata: {source.name}.")
+        except Exception as e: print(f"Errore durante l'avvio della cattura audio: {e}"); traceback.print_exc(); self.stop_audio_capture()
+
+    def stop_audio_capture(self):
+        """Ferma sorgente, analisi e sincronizzazione (sicuro anche se la cattura non è mai partita)."""
+        self.audio_recording = False
+        try:
+            if self.audio_source is not None: self.audio_source.stop()
+        except Exception as e: print(f"Errore durante la chiusura della sorgente audio: {e}"); traceback.print_exc()
+        self.audio_source = None
+        if self.audio_engine is not None and self.audio_engine.running:
+            self.audio_engine.stop(); self.audio_engine.remove_frame_listener(self.audio_frame_listener)
+            print(f"Cattura audio fermata: {self.audio_engine.format_stats()}")
+            if self.publish_latency is not None: print(f"  {self.publish_latency.format('latenza ingresso-pubblicazione')}")
+            if self.feature_chain is not None: print(f"  {self.feature_chain.format_stats()}")
+        if self.audio_thread is not None and self.audio_thread is not threading.current_thread():
+            self.audio_thread.join(timeout=self.AUDIO_SYNC_LOOP_SLEEP_SECONDS * 5)
+        self.audio_thread = None
+
+    def attach_spectrum_bands(self):
+        """Registra lo spettro a N bande sul motore audio corrente (se non è già registrato)."""
+        if self.audio_engine is None or self.audio_config["spectrum_bands"] <= 0: return
+        if self.spectrum_bands is not None and self.spectrum_bands in self.audio_engine.frame_listeners: return
+        config = self.audio_config
+        self.spectrum_bands = create_spectrum_bands(
+            self.audio_engine, band_count=config["spectrum_bands"], scale=config["spectrum_scale"], freq_range=config["band_freq_range"],
+            attack_seconds=self.AUDIO_SPECTRUM_ATTACK_SECONDS, release_seconds=self.AUDIO_SPECTRUM_RELEASE_SECONDS, auto_gain=config["auto_gain"])
+
+    def attach_feature_chain(self):
+        """Registra la catena gate -> AGC -> smoothing sul motore audio corrente (se non è già registrata)."""
+        if self.audio_engine is None: return
+        if self.feature_chain is not None and self.feature_chain in self.audio_engine.frame_listeners: return
+        self.feature_chain = create_feature_chain(self.audio_engine, noise_threshold=self.audio_config["noise_threshold"],
+                                                  auto_gain=self.audio_config["auto_gain"])
+
+    def toggle_auto_gain(self):
+        """Attiva/disattiva l'AGC della catena DSP e dello spettro (gli stadi restano allocati)."""
+        enabled = not self.audio_config["auto_gain"]
+        self.audio_config["auto_gain"] = enabled
+        if self.feature_chain is not None: self.feature_chain.enable_stage("agc", enabled)
+        if self.spectrum_bands is not None: self.spectrum_bands.auto_gain = enabled
+        print(f"Auto Gain {'abilitato' if enabled else 'disabilitato'}.")
+
+    def attach_tempo_tracker(self):
+        """Registra un nuovo stimatore del tempo sul motore audio corrente (se non è già registrato)."""
+        if self.audio_engine is None: return
+        if self.tempo_tracker is not None and self.tempo_tracker in self.audio_engine.frame_listeners: return
+        self.tempo_tracker = create_tempo_tracker(self.audio_engine, bpm_range=self.audio_config["bpm_range"],
+                                                  window_seconds=self.AUTO_BPM_WINDOW_SECONDS, smoothing=self.BPM_SMOOTHING_FACTOR)
+        self.beat_clock_feed = TrackerClockFeed(self.tempo_tracker, self.beat_clock, min_confidence=self.AUTO_BPM_MIN_CONFIDENCE)
+        self.audio_engine.add_frame_listener(self.beat_clock_feed) # Dopo lo stimatore: vede i beat del frame corrente
+        if self.audio_recording and self.audio_config["capture_mode"] == "callback": self.attach_sync_listener()
+
+    def attach_sync_listener(self):
+        """Registra (o sposta in fondo) la sincronizzazione per frame: deve vedere i risultati degli altri listener."""
+        if self.audio_engine is None: return
+        if self.audio_frame_listener is None: self.audio_frame_listener = self.sync_audio_frame
+        self.audio_engine.remove_frame_listener(self.audio_frame_listener)
+        self.audio_engine.add_frame_listener(self.audio_frame_listener)
+
+    def toggle_auto_bpm(self):
+        """Attiva/disattiva la stima automatica del BPM dall'audio in ingresso."""
+        self.auto_bpm_enabled = not self.auto_bpm_enabled
+        try:
+            if self.auto_bpm_enabled:
+                print("Auto BPM abilitato.")
+                if not self.audio_recording: self.start_audio_capture() # Registra anche lo stimatore
+                else: self.attach_tempo_tracker()
+            else:
+                if self.tempo_tracker is not None:
+                    print(f"Auto BPM disabilitato ({self.tempo_tracker.format_stats()}).")
+                    if self.audio_engine is not None:
+                        self.audio_engine.remove_frame_listener(self.tempo_tracker); self.audio_engine.remove_frame_listener(self.beat_clock_feed)
+                self.tempo_tracker = None; self.beat_clock_feed = None; self.beat_detected = False
+        except Exception as e: print(f"Errore durante il cambio di stato di Auto BPM: {e}"); traceback.print_exc()
+
+    def apply_auto_bpm(self, tracker, last_beat_count):
+        """Aggiorna BPM e beat dallo stimatore; restituisce il contatore dei beat per il confronto successivo."""
+        self.beat_detected = tracker.beat_count != last_beat_count # Beat avvenuto dall'ultima sincronizzazione
+        if tracker.bpm > 0 and tracker.confidence >= self.AUTO_BPM_MIN_CONFIDENCE: self.set_current_bpm(tracker.bpm)
+        return tracker.beat_count
+
+    def set_current_bpm(self, bpm):
+        """Aggiorna il BPM corrente e (nel thread della UI) la sua etichetta."""
+        bpm = round(bpm, 1)
+        if bpm != self.current_bpm:
+            self.current_bpm = bpm
+            self.root.after(0, lambda: self.bpm_label.configure(text=f"BPM: {bpm:.1f}"))
+
+    def tap_tempo_button_clicked(self):
+        """Tap tempo: ogni tap è un beat per l'orologio dei beat (il primo di una serie segna l'inizio della battuta)."""
+        try:
+            bpm = self.beat_clock.tap()
+            if bpm is not None: self.set_current_bpm(bpm); print(f"Tap tempo: {bpm:.1f} BPM.")
+        except Exception as e: print(f"Errore nel tap tempo: {e}"); traceback.print_exc()
+
+    def toggle_beat_sync(self):
+        """Attiva/disattiva Beat Sync: beat_detected segue l'orologio dei beat invece dei soli beat rilevati."""
+        self.beat_sync_enabled = not self.beat_sync_enabled
+        if self.beat_sync_enabled and not self.auto_bpm_enabled:
+            self.beat_clock.set_tempo(self.current_bpm) # Senza Auto BPM l'orologio segue il BPM corrente (o il tap tempo)
+        print(f"Beat Sync {'abilitato' if self.beat_sync_enabled else 'disabilitato'}.")
+
+    def toggle_bass_response(self):
+        """Attiva/disattiva la modulazione dello zoom dai bassi (con Audio Zoom attivo)."""
+        self.bass_response_enabled = not self.bass_response_enabled
+        print(f"Bass Response {'abilitato' if self.bass_response_enabled else 'disabilitato'}.")
+
+    def sync_audio_state(self):
+        """Copia i valori del motore nello stato dell'app e pubblica i parametri per Bonzomatic."""
+        engine = self.audio_engine
+        self.audio_level, self.bass_level, self.frequency_data = (self.feature_chain or engine).snapshot() # Valori dopo gate/AGC se presente
+        if self.spectrum_bands is not None:
+            self.spectrum_data = [round(value, self.AUDIO_SPECTRUM_DECIMALS) for value in self.spectrum_bands.values.tolist()]
+        tracker = self.tempo_tracker
+        if tracker is not None and self.auto_bpm_enabled: self.last_beat_count = self.apply_auto_bpm(tracker, self.last_beat_count)
+        if self.beat_sync_enabled: # Beat dall'orologio: nessun beat perso anche con un polling lento
+            beat_index = self.beat_clock.state()["beat_index"]
+            self.beat_detected = self.last_beat_index is not None and beat_index != self.last_beat_index
+            self.last_beat_index = beat_index
+        now = time.monotonic()
+        if self.beat_detected: self.beat_pulse_until = now + self.BEAT_PULSE_SECONDS
+        self.beat_detected = now < self.beat_pulse_until
+        self.write_bonzomatic_params()
+        if engine.frame_count != self.last_synced_frame: # Latenza del frame più recente pubblicato
+            self.last_synced_frame = engine.frame_count
+            if self.publish_latency is not None: self.publish_latency.record(time.perf_counter() - engine.frame_arrival)
+
+    def sync_audio_frame(self, engine, end):
+        """Listener del motore in modalità "callback": pubblica i parametri appena il frame è analizzato."""
+        try: self.sync_audio_state()
+        except Exception as e: print(f"Errore nella sincronizzazione audio per frame: {e}"); traceback.print_exc()
+
+    def start_audio_sync_loop(self):
+        """Modalità "loop": sincronizza periodicamente lo stato dell'app con il motore (thread di analisi separato)."""
+        def sync_loop():
+            while self.audio_recording:
+                try: self.sync_audio_state()
+                except Exception as e: print(f"Errore nel ciclo di sincronizzazione audio: {e}"); traceback.print_exc()
+                time.sleep(self.AUDIO_SYNC_LOOP_SLEEP_SECONDS)
+        self.audio_thread = threading.Thread(target=sync_loop, name="audio-sync", daemon=True)
+        self.audio_thread.start()
+
     # --- METODI PER GLI EFFETTI VIDEO ---
     def update_zoom(self, value):
         """Aggiorna il fattore di zoom e il label associato."""
@@ -1605,13 +1876,32 @@ class ShaderBridgePlayer:
             self.root.after(0, lambda: self.zoom_slider.set(self.EFFECTS_ZOOM_DEFAULT))
         self.write_bonzomatic_params() # Scrive i parametri aggiornati
 
+    def get_params_publisher(self):
+        """Restituisce il publisher dei parametri per la cartella di lavoro e il trasporto correnti (ricreato se cambiano)."""
+        shared = self.bonzomatic_config.get("params_transport", "json") == "shm"
+        filename = self.BONZOMATIC_PARAMS_SHM_FILENAME if shared else self.BONZOMATIC_PARAMS_FILENAME
+        params_filepath = os.path.join(self.bonzomatic_config["working_dir"], filename)
+        with self.params_publisher_lock: # Un solo publisher anche con chiamate concorrenti da thread UI e audio
+            if self.params_publisher is None or self.params_publisher.filepath != params_filepath:
+                self.stop_params_publisher()
+                if shared: self.params_publisher = SharedParamChannel(params_filepath, spectrum_size=self.audio_config["spectrum_bands"])
+                else: self.params_publisher = ParamPublisher(params_filepath, rate_hz=self.BONZOMATIC_PARAMS_RATE_HZ)
+            return self.params_publisher
+
+    def stop_params_publisher(self):
+        """Scrive gli ultimi parametri in attesa, ferma il thread di pubblicazione e ne stampa i contatori."""
+        with self.params_publisher_lock:
+            if self.params_publisher is None: return
+            try:
+                self.params_publisher.stop(); print(f"Publisher parametri Bonzomatic fermato: {self.params_publisher.format_stats()}")
+            except Exception as e: print(f"Errore durante l'arresto del publisher dei parametri: {e}"); traceback.print_exc()
+            self.params_publisher = None
+
     def write_bonzomatic_params(self):
-        """Scrive i parametri degli effetti e dell'audio in un file JSON per Bonzomatic."""
+        """Pubblica i parametri degli effetti e dell'audio per Bonzomatic (scritti in JSON dal thread del publisher)."""
         try:
             if not self.bonzomatic_path: return
 
-            params_filepath = os.path.join(self.bonzomatic_config["working_dir"], self.BONZOMATIC_PARAMS_FILENAME)
-            
             audio_params = {
                 "bpm": self.current_bpm, "beat_detected": self.beat_detected,
                 "audio_level": self.audio_level, "bass_level": self.bass_level,
@@ -1620,6 +1910,9 @@ class ShaderBridgePlayer:
                 "fFreq3": float(self.frequency_data[2]) if self.frequency_data and len(self.frequency_data) >= 4 else 0.0,
                 "fFreq4": float(self.frequency_data[3]) if self.frequency_data and len(self.frequency_data) >= 4 else 0.0,
             }
+            beat = self.beat_clock.state() # Parametri continui: il consumatore può estrapolare la fase a qualsiasi frame rate
+            audio_params.update({"beat_phase": beat["beat_phase"], "bar_position": beat["bar_position"], "next_beat_in": beat["next_beat_in"]})
+            audio_params["spectrum"] = self.spectrum_data # N bande 0..1 dalle basse alle alte frequenze
 
             current_zoom = self.effect_zoom
             if self.audio_zoom_enabled:
@@ -1636,9 +1929,9 @@ class ShaderBridgePlayer:
             }
 
             all_params = {"audio": audio_params, "effects": effect_params}
-            
-            with open(params_filepath, 'w', encoding='utf-8') as f: json.dump(all_params, f, indent=4)
-            
+
+            self.get_params_publisher().publish(all_params) # Non blocca: scrittura atomica e limitata nel thread del publisher
+
         except Exception as e:
             print(f"Errore durante la scrittura dei parametri di Bonzomatic: {e}"); traceback.print_exc()
 
@@ -1717,6 +2010,9 @@ class ShaderBridgePlayer:
             if hasattr(self, 'browser_driver') and self.browser_driver:
                 try: self.browser_driver.quit(); print("Driver browser chiuso durante la chiusura dell'app.")
                 except Exception as e: print(f"Errore durante la chiusura del browser driver in on_closing: {e}"); traceback.print_exc()
+            self.stop_shader_watcher()
+            self.stop_params_publisher()
             if hasattr(self, 'file_manager_config') and self.file_manager_config.get('cache_enabled', False): self.save_shader_cache()
+            if self.shader_store: self.shader_store.close()
             self.root.destroy(); print("Applicazione chiusa con successo.")
         except Exception as e: print(f"Errore durante la chiusura dell'applicazione: {e}"); traceback.print_exc()
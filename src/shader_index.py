@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SHADER LIBRARY INDEX - Indice incrementale della libreria shader.
+Confronta prima la firma os.stat (dimensione, mtime, inode) con quella in cache e ricalcola
+l'hash del contenuto (BLAKE2 in streaming, a blocchi) solo quando la firma è cambiata.
+Eseguito come script lancia un benchmark di riscansione su una libreria generata.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import tempfile
+import shutil
+import threading
+import traceback
+
+# --- Costanti Indice ---
+HASH_CHUNK_SIZE = 1024 * 1024 # Blocco di lettura per l'hash in streaming (1 MB)
+HASH_DIGEST_SIZE = 16 # Byte del digest BLAKE2b (32 caratteri esadecimali, come il vecchio MD5)
+
+
+def new_content_hasher():
+    """Restituisce un nuovo oggetto hash per il contenuto degli shader."""
+    return hashlib.blake2b(digest_size=HASH_DIGEST_SIZE)
+
+
+def hash_bytes(data):
+    """Calcola l'hash di un contenuto già letto in memoria."""
+    hasher = new_content_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def hash_file(filepath, chunk_size=HASH_CHUNK_SIZE):
+    """Calcola l'hash BLAKE2b di un file leggendolo a blocchi (senza caricarlo tutto in memoria)."""
+    hasher = new_content_hasher()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def stat_signature(stat_result):
+    """Estrae i campi della firma os.stat salvati nei metadati dello shader."""
+    return {
+        'size': stat_result.st_size, 'modified': stat_result.st_mtime,
+        'mtime_ns': stat_result.st_mtime_ns, 'inode': stat_result.st_ino
+    }
+
+
+class ShaderLibraryIndex:
+    """
+    Decide quali file shader vanno rielaborati partendo dai metadati in cache (filepath -> metadati).
+    Un file con firma stat invariata non viene nemmeno aperto; se la firma cambia ma l'hash è lo
+    stesso (es. file solo "toccato") viene aggiornata solo la firma. Utilizzabile da più thread I/O.
+    """
+
+    STATUS_UNCHANGED = "unchanged" # Firma stat identica: nessuna lettura
+    STATUS_TOUCHED = "touched" # Firma cambiata ma contenuto identico: solo firma aggiornata
+    STATUS_CHANGED = "changed" # Contenuto cambiato o file nuovo: va rielaborato
+
+    def __init__(self, entries=None):
+        self.entries = entries if entries is not None else {}
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Azzera i contatori della scansione corrente."""
+        self.stats = {self.STATUS_UNCHANGED: 0, self.STATUS_TOUCHED: 0, self.STATUS_CHANGED: 0}
+        self.touched = [] # Filepath con firma aggiornata da rendere persistente
+
+    def signature_matches(self, cached, stat_result):
+        """Verifica se la firma os.stat coincide con quella salvata nei metadati."""
+        if not cached or 'mtime_ns' not in cached:
+            return False # Entry create da versioni precedenti della cache: firma incompleta
+        return (cached.get('size') == stat_result.st_size
+                and cached.get('mtime_ns') == stat_result.st_mtime_ns
+                and cached.get('inode') == stat_result.st_ino)
+
+    def check(self, filepath, stat_result=None):
+        """Classifica un file come invariato, toccato o cambiato, aggiornando la firma se possibile."""
+        if stat_result is None:
+            stat_result = os.stat(filepath)
+        cached = self.entries.get(filepath)
+        if self.signature_matches(cached, stat_result):
+            status = self.STATUS_UNCHANGED
+        elif cached and cached.get('hash') and cached.get('hash') == hash_file(filepath):
+            cached.update(stat_signature(stat_result))
+            status = self.STATUS_TOUCHED
+        else:
+            status = self.STATUS_CHANGED
+        with self.lock:
+            self.stats[status] += 1
+            if status == self.STATUS_TOUCHED: self.touched.append(filepath)
+        return status
+
+    def needs_reprocess(self, filepath, stat_result=None):
+        """True se il file va rielaborato (contenuto nuovo o cambiato)."""
+        return self.check(filepath, stat_result) == self.STATUS_CHANGED
+
+
+# --- BENCHMARK ---
+def _generate_library(folder, count):
+    """Genera una libreria di shader sintetici per il benchmark."""
+    for i in range(count):
+        subfolder = os.path.join(folder, f"set_{i % 50:02d}")
+        os.makedirs(subfolder, exist_ok=True)
+        body = "\n".join(f"    col += 0.5 + 0.5 * cos(iTime + uv.xyx * {j}.0 + vec3(0, 2, 4));" for j in range(40))
+        with open(os.path.join(subfolder, f"shader_{i:05d}.frag"), 'w', encoding='utf-8') as f:
+            f.write(f"// title: Shader {i}\n// author: bench\n"
+                    f"void mainImage(out vec4 fragColor, in vec2 fragCoord) {{\n"
+                    f"    vec2 uv = fragCoord / iResolution.xy;\n    vec3 col = vec3(0.0);\n{body}\n"
+                    f"    fragColor = vec4(col, 1.0);\n}}\n")
+
+
+def _walk(folder):
+    found = []
+    for root, dirs, files in os.walk(folder):
+        for file in files:
+            if file.endswith('.frag'):
+                found.append(os.path.join(root, file))
+    return found
+
+
+def _legacy_md5(filepath):
+    with open(filepath, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def run_benchmark(count=5000):
+    """Confronta la riscansione di una cartella invariata: rehash MD5 completo vs indice stat."""
+    folder = tempfile.mkdtemp(prefix="shader_index_bench_")
+    try:
+        _generate_library(folder, count)
+
+        start = time.perf_counter(); files = _walk(folder); walk_time = time.perf_counter() - start
+
+        entries = {}
+        for filepath in files:
+            entry = {'hash': hash_file(filepath)}
+            entry.update(stat_signature(os.stat(filepath)))
+            entries[filepath] = entry
+        legacy_hashes = {filepath: _legacy_md5(filepath) for filepath in files}
+
+        start = time.perf_counter()
+        files = _walk(folder)
+        legacy_changed = sum(1 for filepath in files if _legacy_md5(filepath) != legacy_hashes[filepath])
+        legacy_time = time.perf_counter() - start
+
+        index = ShaderLibraryIndex(entries)
+        start = time.perf_counter()
+        files = _walk(folder)
+        indexed_changed = sum(1 for filepath in files if index.needs_reprocess(filepath))
+        indexed_time = time.perf_counter() - start
+
+        print(f"Benchmark riscansione libreria invariata ({len(files)} shader)")
+        print(f"  Solo walk directory:        {walk_time * 1000:8.1f} ms")
+        print(f"  Rehash MD5 completo:        {legacy_time * 1000:8.1f} ms ({legacy_changed} da rielaborare)")
+        print(f"  Indice stat (size/mtime):   {indexed_time * 1000:8.1f} ms ({indexed_changed} da rielaborare)")
+        print(f"  Contatori indice: {index.stats}")
+    except Exception as e:
+        print(f"Errore durante il benchmark dell'indice shader: {e}")
+        traceback.print_exc()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
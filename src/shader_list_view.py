@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SHADER LIST VIEW - Lista shader virtualizzata per CustomTkinter.
+Crea solo le righe visibili (un pool di frame+label+pulsante riciclati durante lo scroll), quindi memoria
+e tempo di ridisegno non dipendono dalla dimensione della libreria. Gli aggiornamenti confrontano le
+righe visibili con lo stato precedente e riconfigurano solo quelle cambiate, mantenendo la posizione.
+Eseguito come script apre una finestra di prova con una libreria fittizia e misura i tempi di ridisegno.
+"""
+
+import sys
+import time
+import traceback
+import customtkinter as ctk
+
+
+class _ListRow:
+    """Riga riciclabile: widget creati una volta, contenuto rilegato a un elemento diverso durante lo scroll."""
+    __slots__ = ('frame', 'label', 'button', 'key', 'text', 'shown')
+
+    def __init__(self, frame, label, button):
+        self.frame = frame; self.label = label; self.button = button
+        self.key = None; self.text = None; self.shown = False
+
+
+class VirtualShaderListView(ctk.CTkFrame):
+    """
+    Lista virtualizzata di chiavi (es. filepath shader). get_row_text(key) fornisce il testo della riga
+    (chiamato solo per le righe visibili), on_activate(key) viene chiamato dal pulsante della riga.
+    """
+
+    DEFAULT_ROW_HEIGHT = 30 # Altezza di una riga (px, prima dello scaling CustomTkinter)
+    WHEEL_SCROLL_ROWS = 3 # Righe scorse per ogni scatto della rotella
+
+    def __init__(self, master, get_row_text, on_activate, action_text="Apri", empty_text="Nessun elemento.",
+                 row_height=DEFAULT_ROW_HEIGHT, row_padding=2, height=150, font=None, empty_font=None, **kwargs):
+        super().__init__(master, height=height, **kwargs)
+        self.get_row_text = get_row_text
+        self.on_activate = on_activate
+        self.action_text = action_text
+        self.row_height = row_height
+        self.row_padding = row_padding
+        self.font = font
+        self.items = []
+        self.first_index = 0 # Indice del primo elemento visibile
+        self.view_height = height
+        self.rows = []
+
+        self.grid_propagate(False)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.rows_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.rows_frame.grid(row=0, column=0, sticky="nsew")
+        self.rows_frame.grid_propagate(False)
+        self.rows_frame.grid_columnconfigure(0, weight=1)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.empty_label = ctk.CTkLabel(self.rows_frame, text=empty_text, font=empty_font)
+
+        self.rows_frame.bind("<Configure>", self._on_configure)
+        self._bind_wheel(self.rows_frame)
+        self._render()
+
+    # --- Dati ---
+    def set_items(self, items):
+        """Sostituisce gli elementi mantenendo in vista lo stesso primo elemento (se ancora presente)."""
+        anchor = self.items[self.first_index] if self.first_index < len(self.items) else None
+        self.items = list(items)
+        if anchor is not None:
+            try: self.first_index = self.items.index(anchor)
+            except ValueError: pass # Elemento rimosso: resta allo stesso indice (limitato sotto)
+        self.first_index = self._clamp(self.first_index)
+        self._render()
+
+    def refresh(self, keys=None):
+        """Ricalcola il testo delle righe visibili (solo quelle di 'keys', se indicato)."""
+        keys = set(keys) if keys is not None else None
+        for row in self.rows:
+            if row.shown and (keys is None or row.key in keys): row.text = None # Forza il confronto al prossimo render
+        self._render()
+
+    # --- Scroll ---
+    def visible_count(self):
+        """Numero di righe che entrano nell'area visibile."""
+        try: scaling = ctk.ScalingTracker.get_widget_scaling(self)
+        except Exception: scaling = 1.0
+        return max(1, int(self.view_height // ((self.row_height + 2 * self.row_padding) * scaling)))
+
+    def _clamp(self, index):
+        return max(0, min(index, len(self.items) - self.visible_count()))
+
+    def scroll_to(self, index):
+        """Porta l'elemento 'index' in cima alla vista."""
+        index = self._clamp(index)
+        if index != self.first_index:
+            self.first_index = index
+            self._render()
+
+    def see(self, key):
+        """Scorre solo se necessario per rendere visibile l'elemento indicato."""
+        try: index = self.items.index(key)
+        except ValueError: return
+        if index < self.first_index: self.scroll_to(index)
+        elif index >= self.first_index + self.visible_count(): self.scroll_to(index - self.visible_count() + 1)
+
+    def yview(self, *args):
+        """Comando della scrollbar (protocollo Tk: 'moveto' frazione o 'scroll' n units|pages)."""
+        if not args: return
+        if args[0] == "moveto":
+            self.scroll_to(int(round(float(args[1]) * len(self.items))))
+        elif args[0] == "scroll":
+            step = self.visible_count() if args[2] == "pages" else 1
+            self.scroll_to(self.first_index + int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        if getattr(event, 'num', None) == 4: direction = -1
+        elif getattr(event, 'num', None) == 5: direction = 1
+        else: direction = -1 if event.delta > 0 else 1
+        self.scroll_to(self.first_index + direction * self.WHEEL_SCROLL_ROWS)
+        return "break" # Non far scorrere anche il contenitore esterno
+
+    def _bind_wheel(self, widget):
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            widget.bind(sequence, self._on_wheel, add="+")
+
+    def _on_configure(self, event):
+        if event.height != self.view_height:
+            self.view_height = event.height
+            self.first_index = self._clamp(self.first_index)
+            self._render()
+
+    # --- Righe ---
+    def _create_row(self):
+        frame = ctk.CTkFrame(self.rows_frame, height=self.row_height)
+        label = ctk.CTkLabel(frame, text="", font=self.font, anchor="w")
+        label.pack(side="left", padx=5, expand=True, fill="x")
+        row = _ListRow(frame, label, None)
+        row.button = ctk.CTkButton(frame, text=self.action_text, height=self.row_height - 4, command=lambda r=row: self._activate(r))
+        row.button.pack(side="right", padx=5)
+        for widget in (frame, label, row.button): self._bind_wheel(widget)
+        return row
+
+    def _activate(self, row):
+        if row.key is not None:
+            try: self.on_activate(row.key)
+            except Exception as e: print(f"Errore nell'azione della riga {row.key}: {e}"); traceback.print_exc()
+
+    def _render(self):
+        """Rilega le righe del pool agli elementi visibili, toccando solo i widget il cui contenuto è cambiato."""
+        visible = self.visible_count()
+        while len(self.rows) < min(visible, len(self.items)):
+            self.rows.append(self._create_row()) # Il pool cresce solo fino al numero di righe visibili
+        for position, row in enumerate(self.rows):
+            index = self.first_index + position
+            if position < visible and index < len(self.items):
+                key = self.items[index]
+                text = self.get_row_text(key)
+                if row.key != key or row.text != text:
+                    row.label.configure(text=text); row.key = key; row.text = text
+                if not row.shown:
+                    row.frame.grid(row=position, column=0, sticky="ew", pady=self.row_padding); row.shown = True
+            elif row.shown:
+                row.frame.grid_remove(); row.shown = False; row.key = None; row.text = None
+        if self.items: self.empty_label.grid_remove()
+        else: self.empty_label.grid(row=0, column=0, pady=10)
+        total = len(self.items)
+        if total: self.scrollbar.set(self.first_index / total, min(1.0, (self.first_index + visible) / total))
+        else: self.scrollbar.set(0.0, 1.0)
+
+
+# --- DEMO / BENCHMARK ---
+def run_demo(count=100000):
+    """Apre una lista con 'count' elementi fittizi e misura il tempo di set_items e di uno scroll."""
+    root = ctk.CTk()
+    root.geometry("520x400")
+    view = VirtualShaderListView(root, get_row_text=lambda key: f"✅ Shader {key}", on_activate=lambda key: print(f"Attivato: {key}"),
+                                 action_text="Carica", empty_text="Nessun shader caricato.", height=360)
+    view.pack(fill="both", expand=True, padx=10, pady=10)
+
+    def measure():
+        start = time.perf_counter(); view.set_items(range(count)); root.update_idletasks(); set_time = time.perf_counter() - start
+        start = time.perf_counter(); view.scroll_to(count // 2); root.update_idletasks(); scroll_time = time.perf_counter() - start
+        start = time.perf_counter(); view.set_items([key for key in range(count) if key % 100]); root.update_idletasks(); diff_time = time.perf_counter() - start
+        print(f"Lista virtualizzata con {count} elementi ({len(view.rows)} righe create)")
+        print(f"  set_items iniziale:       {set_time * 1000:8.1f} ms")
+        print(f"  scroll a metà lista:      {scroll_time * 1000:8.1f} ms")
+        print(f"  aggiornamento (-1%):      {diff_time * 1000:8.1f} ms (primo visibile: {view.items[view.first_index]})")
+
+    root.after(200, measure)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    run_demo(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+SHADER METADATA - Estrazione dei metadati dai file shader (titolo, autore, tag, uniform, validazione).
+Funzioni a livello di modulo, senza dipendenze dalla GUI, così da poter essere eseguite anche nei
+processi worker del pool di scansione. I tag vengono letti solo dai commenti di intestazione, fermandosi
+alla prima riga di codice; uniform, entry point e graffe solo dal codice, con pattern precompilati.
+Eseguito come script lancia un micro-benchmark contro l'implementazione a regex multiple.
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import traceback
+from pathlib import Path
+
+from shader_index import hash_bytes, stat_signature
+
+SHADERTOY_ID_MIN_LENGTH = 6 # Lunghezza minima per l'ID di uno shader su Shadertoy
+
+# Tag di intestazione nei commenti iniziali (es. "// title: Plasma")
+HEADER_TAGS = frozenset(('title', 'author', 'description', 'tags', 'shadertoy'))
+# Pattern del corpo, compilati una volta e ancorati a un prefisso letterale (ricerca veloce nel motore re)
+UNIFORM_RE = re.compile(r'uniform\s+(?:vec\d+|mat\d+|float|int|sampler2D|sampler3D)\s+(\w+)\s*;')
+ENTRY_POINT_RE = re.compile(r'void\s+(mainImage|main)\s*\(')
+COMMENT_RE = re.compile(r'//[^\n]*|/\*.*?(?:\*/|\Z)', re.DOTALL)
+SHADERTOY_ID_PATTERNS = [
+    r'shadertoy\.com/view/([a-zA-Z0-9]+)', r'shadertoy\.com/embed/([a-zA-Z0-9]+)',
+    r'view/([a-zA-Z0-9]{6,})', r'embed/([a-zA-Z0-9]{6,})',
+    r'/([a-zA-Z0-9]{6,})(?:\?|$)', r'#([a-zA-Z0-9]{6,})'
+]
+
+
+def new_shader_metadata(filepath):
+    """Metadati di default per un file shader."""
+    return {
+        'filepath': filepath, 'filename': os.path.basename(filepath),
+        'size': 0, 'modified': 0, 'hash': '', 'title': '', 'author': '',
+        'description': '', 'tags': [], 'uniforms': [], 'passes': 1,
+        'type': 'fragment', 'shadertoy_id': '', 'valid': False, 'error': ''
+    }
+
+
+def extract_shadertoy_id(url_to_parse, min_length=SHADERTOY_ID_MIN_LENGTH):
+    """Estrae l'ID Shadertoy da un URL (view/embed/hash)."""
+    try:
+        if not url_to_parse: return None
+        for pattern in SHADERTOY_ID_PATTERNS:
+            match = re.search(pattern, url_to_parse)
+            if match and len(match.group(1)) >= min_length: return match.group(1)
+        return None
+    except Exception as e:
+        print(f"Errore durante l'estrazione statica dell'ID shader: {e}")
+        traceback.print_exc()
+        return None
+
+
+def _scan_header(content, header):
+    """Legge i commenti di intestazione (righe //, blocchi /* */, direttive # e righe vuote) fino alla prima riga di codice."""
+    pos = 0; length = len(content); in_block = False
+    while pos < length:
+        end = content.find('\n', pos)
+        if end == -1: end = length
+        line = content[pos:end].strip()
+        if in_block or line.startswith('/*'):
+            text = line[2:] if not in_block else line
+            close = text.find('*/')
+            in_block = close == -1
+            text = text if in_block else text[:close]
+        elif line.startswith('//'):
+            text = line[2:]
+        elif not line or line.startswith('#'):
+            pos = end + 1; continue
+        else:
+            return pos # Inizio del codice: l'intestazione è finita
+        key, separator, value = text.lstrip('*').partition(':')
+        if separator:
+            key = key.strip().lower(); value = value.strip()
+            if key in HEADER_TAGS and value: header.setdefault(key, value) # Vale la prima occorrenza
+        pos = end + 1
+    return length
+
+
+def _count_braces_outside_comments(content, start):
+    """Conta le graffe escludendo quelle nei commenti (usato solo se il conteggio semplice non torna)."""
+    open_braces = content.count('{', start); close_braces = content.count('}', start)
+    for match in COMMENT_RE.finditer(content, start):
+        comment = match.group()
+        open_braces -= comment.count('{'); close_braces -= comment.count('}')
+    return open_braces, close_braces
+
+
+def scan_shader_source(content):
+    """
+    Scansione unica del sorgente: i tag vengono letti solo dall'intestazione (che si ferma alla prima riga
+    di codice), uniform, entry point, output e graffe solo dal codice che segue.
+    """
+    header = {}
+    code_start = _scan_header(content, header)
+    open_braces = content.count('{', code_start); close_braces = content.count('}', code_start)
+    if open_braces != close_braces:
+        open_braces, close_braces = _count_braces_outside_comments(content, code_start)
+    return {
+        'header': header,
+        'uniforms': UNIFORM_RE.findall(content, code_start),
+        'entry_points': ENTRY_POINT_RE.findall(content, code_start),
+        'has_output': content.find('fragColor', code_start) != -1 or content.find('gl_FragColor', code_start) != -1,
+        'open_braces': open_braces, 'close_braces': close_braces
+    }
+
+
+def _info_from_scan(scan):
+    info = {
+        'title': '', 'author': '', 'description': '',
+        'tags': [], 'uniforms': [], 'passes': 1, 'shadertoy_id': ''
+    }
+    header = scan['header']
+    for key in ('title', 'author', 'description'):
+        if key in header: info[key] = header[key]
+    if 'tags' in header: info['tags'] = [tag.strip() for tag in header['tags'].split(',') if tag.strip()]
+    if 'shadertoy' in header:
+        extracted_id = extract_shadertoy_id(header['shadertoy'])
+        if extracted_id: info['shadertoy_id'] = extracted_id
+    info['uniforms'] = [{'type': 'auto_detected', 'name': u} for u in scan['uniforms']]
+    if len(scan['entry_points']) > 1: info['passes'] = len(scan['entry_points'])
+    return info
+
+
+def _validation_from_scan(scan):
+    result = {'valid': True, 'error': ''}
+    if not scan['entry_points']:
+        result['valid'] = False; result['error'] = 'Manca la funzione main() o mainImage().'
+    elif not scan['has_output']:
+        result['valid'] = False; result['error'] = 'Manca l\'assegnazione del colore di output (gl_FragColor o fragColor).'
+    elif scan['open_braces'] != scan['close_braces']:
+        result['valid'] = False; result['error'] = f"Parentesi graffe non bilanciate: {scan['open_braces']} aperte, {scan['close_braces']} chiuse."
+    return result
+
+
+def extract_shader_info(content):
+    """Estrae informazioni specifiche dai commenti all'inizio del file shader."""
+    return _info_from_scan(scan_shader_source(content))
+
+
+def validate_shader_syntax(content):
+    """Esegue una validazione sintattica di base per i file shader GLSL."""
+    try:
+        return _validation_from_scan(scan_shader_source(content))
+    except Exception as e:
+        traceback.print_exc()
+        return {'valid': False, 'error': f"Errore critico durante la validazione sintattica: {e}"}
+
+
+def analyze_shader_content(content):
+    """Parsing completo del sorgente (info + validazione) con una sola scansione. Parte CPU-bound eseguita nei processi worker."""
+    scan = scan_shader_source(content)
+    info = _info_from_scan(scan)
+    validation_result = _validation_from_scan(scan)
+    info['valid'] = validation_result['valid']
+    info['error'] = validation_result.get('error', '')
+    return info
+
+
+def read_shader_file(filepath, metadata):
+    """Parte I/O del parsing: stat, lettura unica del file e hash (scritti in metadata). Restituisce il sorgente."""
+    filepath_obj = Path(filepath)
+    metadata.update(stat_signature(filepath_obj.stat()))
+    raw_content = filepath_obj.read_bytes() # Letto una sola volta: hash e parsing sullo stesso buffer
+    metadata['hash'] = hash_bytes(raw_content)
+    return raw_content.decode('utf-8')
+
+
+def parse_shader_file(filepath):
+    """Estrae i metadati (titolo, autore, tag, ecc.) da un file shader."""
+    metadata = new_shader_metadata(filepath)
+    try:
+        content = read_shader_file(filepath, metadata)
+        metadata.update(analyze_shader_content(content))
+    except Exception as e:
+        metadata['error'] = str(e)
+        print(f"Errore durante il parsing dei metadati dello shader per {filepath}: {e}")
+        traceback.print_exc()
+    return metadata
+
+
+# --- BENCHMARK ---
+_LEGACY_HEADER_TAG_PATTERNS = {
+    'title': r'//\s*title\s*:\s*(.+?)(?:\n|$)', 'author': r'//\s*author\s*:\s*(.+?)(?:\n|$)',
+    'description': r'//\s*description\s*:\s*(.+?)(?:\n|$)', 'tags': r'//\s*tags\s*:\s*(.+?)(?:\n|$)',
+    'shadertoy': r'//\s*shadertoy\s*:\s*(.+?)(?:\n|$)'
+}
+
+
+def _legacy_analyze_shader_content(content):
+    """Implementazione precedente (una regex per campo + scansioni di validazione separate), per confronto."""
+    info = {'title': '', 'author': '', 'description': '', 'tags': [], 'uniforms': [], 'passes': 1, 'shadertoy_id': ''}
+    for key, pattern in _LEGACY_HEADER_TAG_PATTERNS.items():
+        matches = re.findall(pattern, content, re.IGNORECASE)
+        if matches:
+            if key == 'tags': info[key] = [tag.strip() for tag in matches[0].split(',') if tag.strip()]
+            elif key == 'shadertoy':
+                extracted_id = extract_shadertoy_id(matches[0].strip())
+                if extracted_id: info['shadertoy_id'] = extracted_id
+            else: info[key] = matches[0].strip()
+    uniforms = re.findall(r'uniform\s+(?:vec\d+|mat\d+|float|int|sampler2D|sampler3D)\s+(\w+)\s*;', content)
+    info['uniforms'] = [{'type': 'auto_detected', 'name': u} for u in uniforms]
+    main_count = len(re.findall(r'void\s+(?:mainImage|main)\s*\(', content))
+    if main_count > 1: info['passes'] = main_count
+    info['valid'] = True; info['error'] = ''
+    if 'void main(' not in content and 'void mainImage(' not in content:
+        info['valid'] = False; info['error'] = 'Manca la funzione main() o mainImage().'
+    elif 'gl_FragColor' not in content and 'fragColor' not in content and 'out vec4 fragColor' not in content:
+        info['valid'] = False; info['error'] = 'Manca l\'assegnazione del colore di output (gl_FragColor o fragColor).'
+    elif content.count('{') != content.count('}'):
+        info['valid'] = False; info['error'] = f"Parentesi graffe non bilanciate: {content.count('{')} aperte, {content.count('}')} chiuse."
+    return info
+
+
+def _generate_corpus(count, seed=1234):
+    """Genera shader sintetici di dimensioni variabili (intestazione, uniform, funzioni, commenti)."""
+    rng = random.Random(seed); corpus = []
+    for i in range(count):
+        functions = "\n".join(
+            f"// helper {j}\nfloat fn{j}(vec2 p) {{\n    /* rumore */ float d = length(p) - {rng.random():.3f};\n"
+            f"    for (int k = 0; k < 4; k++) {{ d += sin(p.x * float(k)) * 0.1; }}\n    return d;\n}}"
+            for j in range(rng.randint(2, 30)))
+        uniforms = "\n".join(f"uniform float u_param{j};" for j in range(rng.randint(0, 6)))
+        corpus.append(
+            f"// title: Generated {i}\n// author: bench{i % 7}\n// description: shader di test numero {i}\n"
+            f"// tags: generated, bench, set{i % 5}\n// shadertoy: https://www.shadertoy.com/view/Xs{i:06d}\n\n"
+            f"{uniforms}\n{functions}\n"
+            f"void mainImage(out vec4 fragColor, in vec2 fragCoord) {{\n    vec2 uv = fragCoord / iResolution.xy;\n"
+            f"    fragColor = vec4(vec3(fn0(uv)), 1.0);\n}}\n")
+    return corpus
+
+
+def run_benchmark(count=2000, repeat=5):
+    """Confronta il parser a passata singola con l'implementazione a regex multiple sullo stesso corpus."""
+    corpus = _generate_corpus(count)
+    total_kb = sum(len(content) for content in corpus) / 1024
+    timings = {}
+    for name, analyze in (("regex multiple (precedente)", _legacy_analyze_shader_content), ("passata singola", analyze_shader_content)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for content in corpus: analyze(content)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    mismatches = sum(1 for content in corpus if _legacy_analyze_shader_content(content) != analyze_shader_content(content))
+    print(f"Micro-benchmark estrazione metadati ({count} shader, {total_kb:.0f} KB, migliore di {repeat})")
+    for name, elapsed in timings.items():
+        print(f"  {name:28s} {elapsed * 1000:8.1f} ms  ({elapsed / count * 1e6:6.1f} us/shader)")
+    print(f"  Risultati diversi dall'implementazione precedente: {mismatches}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
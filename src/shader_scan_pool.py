@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+SHADER SCAN POOL - Estrazione parallela dei metadati della libreria shader.
+I thread I/O eseguono stat, confronto con l'indice, lettura e hash; il parsing (regex e validazione)
+va in un pool di processi, una sola volta per contenuto: le copie identiche (stesso hash) riusano il
+risultato già in cache o quello della copia in elaborazione. Il numero di file letti ma non ancora
+consegnati è limitato, i risultati arrivano alla cache a blocchi e il progresso viene notificato a frequenza fissa.
+"""
+
+import os
+import time
+import queue
+import multiprocessing
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from shader_metadata import new_shader_metadata, read_shader_file, analyze_shader_content
+from shader_store import CONTENT_FIELDS
+
+
+class ShaderExtractionPool:
+    """Motore di estrazione metadati con thread per l'I/O e processi per il parsing."""
+
+    DEFAULT_IO_WORKERS = 8
+    DEFAULT_BATCH_SIZE = 500 # Entry consegnate alla cache per blocco
+    DEFAULT_IN_FLIGHT_PER_WORKER = 4 # File in volo per worker di parsing
+    DEFAULT_PROGRESS_INTERVAL_SECONDS = 0.1 # Massimo 10 aggiornamenti di progresso al secondo
+    MIN_FILES_FOR_PROCESS_POOL = 200 # Sotto questa soglia l'avvio dei processi costa più del parsing
+    # Mai fork: il processo Tk ha già thread attivi (watcher, publisher, audio) e un fork ne copierebbe i lock
+    PROCESS_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+    def __init__(self, index, io_workers=None, parse_workers=None, max_in_flight=None,
+                 batch_size=DEFAULT_BATCH_SIZE, progress_interval=DEFAULT_PROGRESS_INTERVAL_SECONDS, use_processes=True,
+                 content_lookup=None):
+        self.index = index
+        self.content_lookup = content_lookup # hash -> metadati del contenuto già in cache (es. ShaderMetadataStore.get_content)
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.io_workers = io_workers or min(self.DEFAULT_IO_WORKERS, self.parse_workers * 2)
+        self.max_in_flight = max_in_flight or self.parse_workers * self.DEFAULT_IN_FLIGHT_PER_WORKER
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.use_processes = use_processes
+        self.parse_pool = None
+        self.content_lock = threading.Lock()
+        self.reset_contents()
+
+    def reset_contents(self):
+        """Azzera lo stato di deduplicazione della scansione."""
+        self.known_hashes = {entry.get('hash') for entry in self.index.entries.values() if entry and entry.get('hash')}
+        self.contents = {} # hash -> campi del contenuto già risolti in questa scansione
+        self.waiting = {} # hash -> metadati di copie in attesa del parsing della prima
+        self.stats = {'parsed': 0, 'cached': 0, 'duplicates': 0}
+
+    def _copy_content(self, metadata, content):
+        metadata.update({field: content.get(field) for field in CONTENT_FIELDS})
+
+    def _claim_content(self, metadata, results):
+        """
+        Decide chi analizza un contenuto: True se il file è già risolto (copia nota o in attesa di un'altra),
+        False se tocca a questo file fare il parsing.
+        """
+        content_hash = metadata.get('hash')
+        with self.content_lock:
+            content = self.contents.get(content_hash)
+            if content is None and content_hash in self.waiting:
+                self.waiting[content_hash].append(metadata) # Consegnato insieme alla prima copia
+                self.stats['duplicates'] += 1
+                results.put(('alias', None, None)); return True
+            if content is None:
+                self.waiting[content_hash] = []
+        if content is not None:
+            self._copy_content(metadata, content)
+            with self.content_lock: self.stats['duplicates'] += 1
+            results.put(('parsed', metadata, None)); return True
+        if self.content_lookup and content_hash in self.known_hashes:
+            content = self.content_lookup(content_hash) # Stesso contenuto di uno shader già in cache (es. file copiato)
+            if content is not None:
+                self._copy_content(metadata, content)
+                with self.content_lock: self.stats['cached'] += 1
+                results.put(('parsed', metadata, None)); return True
+        with self.content_lock: self.stats['parsed'] += 1
+        return False
+
+    def _resolve_content(self, metadata):
+        """Registra il risultato della prima copia di un contenuto e restituisce le copie che lo attendevano."""
+        content_hash = metadata.get('hash')
+        with self.content_lock:
+            waiting = self.waiting.pop(content_hash, None)
+            if waiting is None:
+                return []
+            self.contents[content_hash] = {field: metadata.get(field) for field in CONTENT_FIELDS}
+        for alias in waiting:
+            self._copy_content(alias, metadata)
+        return waiting
+
+    def _parse(self, content, results, metadata):
+        """Invia il sorgente al pool di processi (o lo analizza nel thread corrente come fallback)."""
+        if self.parse_pool is not None:
+            try:
+                future = self.parse_pool.submit(analyze_shader_content, content)
+                future.add_done_callback(lambda f: results.put(('parsed', metadata, f)))
+                return
+            except (BrokenProcessPool, RuntimeError) as e:
+                print(f"Pool di processi non disponibile, parsing nei thread: {e}")
+                self.parse_pool = None
+        metadata.update(analyze_shader_content(content))
+        results.put(('parsed', metadata, None))
+
+    def _io_task(self, filepath, results):
+        """Lavoro di un thread I/O per un singolo file."""
+        metadata = new_shader_metadata(filepath)
+        try:
+            if not self.index.needs_reprocess(filepath):
+                results.put(('skipped', filepath, None)); return
+            content = read_shader_file(filepath, metadata)
+            if not self._claim_content(metadata, results):
+                self._parse(content, results, metadata)
+        except Exception as e:
+            metadata['error'] = str(e)
+            print(f"Errore durante il parsing dei metadati dello shader per {filepath}: {e}")
+            traceback.print_exc()
+            results.put(('parsed', metadata, None))
+
+    def run(self, file_list, on_batch, on_progress=None):
+        """Elabora file_list; on_batch(entries) riceve i metadati a blocchi, on_progress(done, total) è limitato nel tempo."""
+        total = len(file_list); processed = 0; batch = []
+        self.reset_contents()
+        results = queue.Queue()
+        slots = threading.Semaphore(self.max_in_flight)
+        if self.use_processes and self.parse_workers > 1 and total >= self.MIN_FILES_FOR_PROCESS_POOL:
+            try:
+                self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=multiprocessing.get_context(self.PROCESS_START_METHOD))
+            except Exception as e:
+                print(f"Impossibile avviare il pool di processi, parsing nei thread: {e}")
+                self.parse_pool = None
+        io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="shader-io")
+        stop_feeding = threading.Event()
+
+        def feeder():
+            for filepath in file_list:
+                slots.acquire() # Blocca finché ci sono troppi file in volo
+                if stop_feeding.is_set(): return
+                try: io_pool.submit(self._io_task, filepath, results)
+                except RuntimeError: return # Pool già chiuso (scansione interrotta)
+
+        feeder_thread = threading.Thread(target=feeder, daemon=True)
+        feeder_thread.start()
+        last_progress = 0.0
+        try:
+            for _ in range(total):
+                kind, payload, future = results.get()
+                slots.release()
+                processed += 1
+                if kind == 'parsed':
+                    if future is not None:
+                        try: payload.update(future.result())
+                        except Exception as e: payload['error'] = str(e); print(f"Errore nel worker di parsing per {payload['filepath']}: {e}")
+                    batch.append(payload)
+                    batch.extend(self._resolve_content(payload))
+                    if len(batch) >= self.batch_size: on_batch(batch); batch = []
+                now = time.monotonic()
+                if on_progress and (now - last_progress >= self.progress_interval or processed == total):
+                    last_progress = now
+                    on_progress(processed, total)
+            if batch: on_batch(batch)
+        finally:
+            stop_feeding.set()
+            for _ in range(self.max_in_flight): slots.release() # Sblocca il feeder se interrotto a metà
+            io_pool.shutdown(wait=True)
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown(wait=True)
+                self.parse_pool = None
+        return processed
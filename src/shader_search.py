@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SHADER SEARCH INDEX - Indice di ricerca in memoria per la libreria shader.
+Indice invertito (token -> documenti con punteggio per campo) con indice dei prefissi sul vocabolario,
+per la ricerca mentre si digita, più bitmap (interi Python) per tag e validità. Aggiornato in modo
+incrementale a ogni modifica dei metadati; le query testo+tag+validità restituiscono risultati ordinati.
+Eseguito come script confronta i tempi di query con la scansione lineare di tutti i metadati.
+"""
+
+import re
+import sys
+import time
+import heapq
+import random
+import threading
+
+from shader_store import build_search_text
+
+# --- Costanti Indice ---
+TOKEN_PATTERN = re.compile(r'[^\W_]+') # Parole alfanumeriche (l'underscore separa, es. "neon_tunnel_02")
+FIELD_WEIGHTS = {'title': 4.0, 'tags': 3.0, 'author': 2.0, 'filename': 2.0, 'description': 1.0} # Peso del campo nel punteggio
+PREFIX_MATCH_FACTOR = 0.5 # Un token che inizia con il termine vale metà di una corrispondenza esatta
+MAX_PREFIX_LENGTH = 8 # Prefissi indicizzati; i termini più lunghi filtrano i token del prefisso massimo
+
+
+def tokenize(text):
+    """Token minuscoli (lettere e cifre) di un testo."""
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def iter_bits(mask):
+    """Indici dei bit a 1 di una bitmap, in ordine crescente."""
+    bits = bin(mask)[:1:-1] # Cifre binarie dalla meno significativa
+    position = bits.find('1')
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+
+class ShaderSearchIndex:
+    """
+    Indice di ricerca per filepath. Ogni shader riceve un id numerico (riutilizzato dopo le rimozioni)
+    che è anche la posizione del suo bit nelle bitmap dei tag e della validità.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        """Svuota l'indice."""
+        with self.lock:
+            self.doc_ids = {} # filepath -> id
+            self.filepaths = [] # id -> filepath (None se libero)
+            self.free_ids = []
+            self.doc_tokens = {} # id -> {token: punteggio}
+            self.doc_tags = {} # id -> tag minuscoli
+            self.postings = {} # token -> {id: punteggio}
+            self.prefixes = {} # prefisso -> token del vocabolario che iniziano così
+            self.tag_bitmaps = {} # tag -> bitmap degli id
+            self.valid_bitmap = 0
+            self.all_bitmap = 0
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def rebuild(self, entries):
+        """Ricostruisce l'indice da un elenco di metadati (es. ShaderMetadataStore.load_search_fields())."""
+        with self.lock:
+            self.clear()
+            self.update_many(entries)
+
+    # --- Aggiornamento incrementale ---
+    def _score_tokens(self, metadata):
+        scores = {}
+        fields = dict(metadata, tags=' '.join(metadata.get('tags', []) or []))
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(field) or ''):
+                scores[token] = scores.get(token, 0.0) + weight
+        return scores
+
+    def _allocate_id(self, filepath):
+        doc_id = self.doc_ids.get(filepath)
+        if doc_id is None:
+            doc_id = self.free_ids.pop() if self.free_ids else len(self.filepaths)
+            if doc_id == len(self.filepaths): self.filepaths.append(filepath)
+            else: self.filepaths[doc_id] = filepath
+            self.doc_ids[filepath] = doc_id
+        return doc_id
+
+    def _unindex(self, doc_id):
+        """Rimuove i token e i bit di un documento (l'id resta assegnato)."""
+        for token in self.doc_tokens.pop(doc_id, {}):
+            posting = self.postings[token]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[token] # Token non più usato: esce anche dall'indice dei prefissi
+                for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                    tokens = self.prefixes[token[:length]]
+                    tokens.discard(token)
+                    if not tokens: del self.prefixes[token[:length]]
+        bit = 1 << doc_id
+        for tag in self.doc_tags.pop(doc_id, ()):
+            bitmap = self.tag_bitmaps[tag] & ~bit
+            if bitmap: self.tag_bitmaps[tag] = bitmap
+            else: del self.tag_bitmaps[tag]
+        self.valid_bitmap &= ~bit
+        self.all_bitmap &= ~bit
+
+    def update(self, metadata):
+        """Inserisce o aggiorna un documento."""
+        filepath = metadata.get('filepath')
+        if not filepath:
+            return
+        with self.lock:
+            doc_id = self._allocate_id(filepath)
+            self._unindex(doc_id)
+            scores = self._score_tokens(metadata)
+            for token, score in scores.items():
+                posting = self.postings.get(token)
+                if posting is None:
+                    posting = self.postings[token] = {}
+                    for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                        self.prefixes.setdefault(token[:length], set()).add(token)
+                posting[doc_id] = score
+            self.doc_tokens[doc_id] = scores
+            bit = 1 << doc_id
+            tags = {tag.lower() for tag in metadata.get('tags', []) or [] if tag}
+            for tag in tags:
+                self.tag_bitmaps[tag] = self.tag_bitmaps.get(tag, 0) | bit
+            self.doc_tags[doc_id] = tags
+            if metadata.get('valid', False): self.valid_bitmap |= bit
+            self.all_bitmap |= bit
+
+    def update_many(self, entries):
+        with self.lock:
+            for metadata in entries:
+                self.update(metadata)
+
+    def remove_many(self, filepaths):
+        """Rimuove i documenti indicati (gli id tornano disponibili)."""
+        with self.lock:
+            for filepath in filepaths:
+                doc_id = self.doc_ids.pop(filepath, None)
+                if doc_id is None: continue
+                self._unindex(doc_id)
+                self.filepaths[doc_id] = None
+                self.free_ids.append(doc_id)
+
+    # --- Query ---
+    def _term_postings(self, term):
+        """Posting list che corrispondono a un termine: [(posting, fattore)], prima quella esatta e poi i token che iniziano con il termine."""
+        matches = [(self.postings[term], 1.0)] if term in self.postings else []
+        matches.extend((self.postings[token], PREFIX_MATCH_FACTOR) for token in self.prefixes.get(term[:MAX_PREFIX_LENGTH], ())
+                       if token != term and token.startswith(term))
+        return matches
+
+    def _term_scores(self, matches):
+        """Punteggi dei documenti per un termine (il migliore tra corrispondenza esatta e prefissi)."""
+        if len(matches) == 1 and matches[0][1] == 1.0:
+            return matches[0][0] # Caso comune: nessuna copia, si usa direttamente la posting list
+        scores = {}
+        for posting, factor in matches:
+            for doc_id, score in posting.items():
+                score *= factor
+                if score > scores.get(doc_id, 0.0): scores[doc_id] = score
+        return scores
+
+    def _intersect(self, scores, matches):
+        """Documenti di 'scores' che corrispondono anche a questo termine: ogni posting list viene intersecata
+        con i soli candidati (insiemi di chiavi, si scorre il più piccolo), senza costruire l'unione dei prefissi."""
+        candidates = scores.keys(); best = {}
+        for posting, factor in matches:
+            for doc_id in candidates & posting.keys():
+                other = posting[doc_id] * factor
+                if other > best.get(doc_id, 0.0): best[doc_id] = other
+        return {doc_id: score + best[doc_id] for doc_id, score in scores.items() if doc_id in best} # Ordine dei candidati invariato
+
+    def query(self, text='', valid_only=False, tags=None, limit=None):
+        """
+        Filepath che contengono tutti i termini di 'text' (ognuno anche come prefisso, per la ricerca
+        mentre si digita), con almeno uno dei 'tags' e validi se richiesto. Con testo, ordinati per punteggio.
+        """
+        with self.lock:
+            mask = self.all_bitmap
+            if valid_only: mask &= self.valid_bitmap
+            if tags:
+                tag_mask = 0
+                for tag in tags: tag_mask |= self.tag_bitmaps.get(tag.lower(), 0)
+                mask &= tag_mask
+            terms = tokenize(text)
+            if not terms:
+                ids = iter_bits(mask)
+                if limit is not None: ids = (doc_id for _, doc_id in zip(range(limit), ids))
+                return [self.filepaths[doc_id] for doc_id in ids]
+
+            # Si parte dal termine più selettivo; per gli altri si controllano solo i documenti rimasti
+            term_matches = sorted((self._term_postings(term) for term in set(terms)), key=lambda matches: sum(len(p) for p, _ in matches))
+            scores = self._term_scores(term_matches[0])
+            for matches in term_matches[1:]:
+                if not scores: break
+                scores = self._intersect(scores, matches)
+            if not scores: return []
+            if mask != self.all_bitmap:
+                allowed = mask.to_bytes((mask.bit_length() + 7) // 8, 'little') # Bitmap come byte: test di appartenenza O(1)
+                limit_byte = len(allowed)
+                scores = {doc_id: score for doc_id, score in scores.items()
+                          if (doc_id >> 3) < limit_byte and allowed[doc_id >> 3] >> (doc_id & 7) & 1}
+            if limit is not None: ranked = heapq.nlargest(limit, scores, key=scores.__getitem__)
+            else: ranked = sorted(scores, key=scores.__getitem__, reverse=True) # Ordinamento stabile: a parità di punteggio, ordine di inserimento
+            return [self.filepaths[doc_id] for doc_id in ranked]
+
+
+# --- BENCHMARK ---
+_WORDS = ("plasma neon tunnel fractal raymarch noise glow kaleido voronoi fire water cloud star galaxy "
+          "metaball sdf retro synth wave grid terrain ocean aurora crystal chrome liquid smoke vortex").split()
+_SYLLABLES = ("ka", "lo", "mi", "ra", "to", "ze", "vu", "ne", "pa", "sh", "qu", "da", "fi", "gr", "on", "el")
+
+
+def _generate_entries(count, seed=42):
+    """Libreria sintetica: poche parole molto comuni più un vocabolario ampio di parole rare."""
+    rng = random.Random(seed)
+    vocabulary = _WORDS + [''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(3000)]
+    return [{
+        'filepath': f"/library/set_{i % 40:02d}/shader_{i:06d}.frag", 'filename': f"shader_{i:06d}.frag",
+        'title': ' '.join(rng.sample(vocabulary, 2)).title(), 'author': f"artist{i % 97}",
+        'description': ' '.join(rng.choice(vocabulary) for _ in range(12)),
+        'tags': rng.sample(_WORDS, 2), 'valid': rng.random() > 0.1
+    } for i in range(count)]
+
+
+def _linear_query(entries, text, valid_only, tags):
+    """Filtro precedente: testo di ricerca ricostruito per ogni shader a ogni query."""
+    text = text.lower(); required_tags = {tag.lower() for tag in tags or []}
+    return [m['filepath'] for m in entries
+            if (not text or text in build_search_text(m)) and (not valid_only or m.get('valid', False))
+            and (not required_tags or required_tags.intersection(t.lower() for t in m.get('tags', [])))]
+
+
+def run_benchmark(count=20000, repeat=200):
+    """Confronta i tempi di query dell'indice con la scansione lineare, simulando la digitazione."""
+    entries = _generate_entries(count)
+    index = ShaderSearchIndex()
+    start = time.perf_counter(); index.rebuild(entries); build_time = time.perf_counter() - start
+    queries = [("p", False, None), ("pla", False, None), ("plasma", False, None), ("plasma ne", True, None),
+               ("kaloze", False, None), ("", False, ["glow"]), ("kal", True, ["neon", "fire"])]
+    print(f"Indice di ricerca shader ({count} shader, {len(index.postings)} token, costruzione {build_time * 1000:.1f} ms)")
+    for text, valid_only, tags in queries:
+        start = time.perf_counter()
+        for _ in range(max(1, repeat // 50)): linear = _linear_query(entries, text, valid_only, tags)
+        linear_time = (time.perf_counter() - start) / max(1, repeat // 50)
+        start = time.perf_counter()
+        for _ in range(repeat): indexed = index.query(text, valid_only, tags, limit=100)
+        indexed_time = (time.perf_counter() - start) / repeat
+        print(f"  {repr(text):14s} valid={valid_only!s:5s} tags={tags!s:18s} lineare {linear_time * 1e6:9.0f} us ({len(linear)} risultati)"
+              f" | indice {indexed_time * 1e6:8.0f} us (primi {len(indexed)})")
+    start = time.perf_counter()
+    for metadata in entries[:1000]: index.update(dict(metadata, title="Aggiornato " + metadata['title']))
+    print(f"  Aggiornamento incrementale: {(time.perf_counter() - start) / 1000 * 1e6:.1f} us per shader")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+"""
+SHADER METADATA STORE - Backend per i metadati della libreria shader.
+Backend disponibili: SQLite embedded (WAL, aggiornamenti per riga, metadati indirizzati per contenuto:
+le copie identiche di uno shader condividono una sola entry) e il vecchio file JSON monolitico, mantenuto
+come fallback. Al primo avvio il backend SQLite importa la cache JSON esistente.
+Eseguito come script verifica sul backend in memoria l'eliminazione dei contenuti non più referenziati.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import traceback
+from datetime import datetime
+
+# Campi dei metadati shader, nell'ordine delle colonne della tabella 'shaders'
+SHADER_FIELDS = (
+    'filepath', 'filename', 'size', 'modified', 'mtime_ns', 'inode', 'hash', 'title', 'author',
+    'description', 'tags', 'uniforms', 'passes', 'type', 'shadertoy_id', 'valid', 'error'
+)
+PATH_FIELDS = ('filepath', 'filename', 'size', 'modified', 'mtime_ns', 'inode', 'hash') # Dati del singolo file
+CONTENT_FIELDS = tuple(field for field in SHADER_FIELDS if field not in PATH_FIELDS) # Dati estratti dal sorgente, condivisi tra le copie
+JSON_FIELDS = ('tags', 'uniforms') # Campi lista serializzati in JSON nella colonna
+SIGNATURE_FIELDS = ('size', 'mtime_ns', 'inode', 'hash') # Campi usati da ShaderLibraryIndex
+SEARCH_FIELDS = ('filepath', 'filename', 'title', 'author', 'description', 'tags', 'valid') # Campi usati da ShaderSearchIndex
+
+
+def content_key_for(metadata):
+    """Chiave del contenuto: l'hash del sorgente; i file illeggibili (senza hash) restano entry a sé."""
+    return metadata.get('hash') or f"!{metadata['filepath']}"
+
+
+def build_search_text(metadata):
+    """Testo di ricerca (minuscolo) usato per i filtri: titolo, autore, descrizione e tag."""
+    return ' '.join([metadata.get('title', '') or '', metadata.get('author', '') or '',
+                     metadata.get('description', '') or '', ' '.join(metadata.get('tags', []) or [])]).lower()
+
+
+class ShaderMetadataStore:
+    """Interfaccia comune dei backend di metadati shader."""
+
+    def get(self, filepath):
+        """Restituisce i metadati di uno shader o None."""
+        raise NotImplementedError
+
+    def get_content(self, content_hash):
+        """Restituisce i metadati estratti dal sorgente (CONTENT_FIELDS) per un hash di contenuto, o None."""
+        raise NotImplementedError
+
+    def find_duplicates(self):
+        """Gruppi di file con contenuto identico: [(hash, [filepath, ...])], dal gruppo più numeroso."""
+        raise NotImplementedError
+
+    def count_contents(self):
+        """Numero di contenuti distinti."""
+        raise NotImplementedError
+
+    def load_signatures(self):
+        """Restituisce {filepath: {size, mtime_ns, inode, hash}} per l'indice incrementale."""
+        raise NotImplementedError
+
+    def load_search_fields(self):
+        """Restituisce i soli campi di ricerca (SEARCH_FIELDS) di tutti gli shader, per costruire l'indice di ricerca."""
+        raise NotImplementedError
+
+    def upsert_many(self, entries):
+        """Inserisce o aggiorna più entry di metadati in un'unica operazione."""
+        raise NotImplementedError
+
+    def delete_many(self, filepaths):
+        """Rimuove le entry indicate."""
+        raise NotImplementedError
+
+    def delete_oldest(self, count):
+        """Rimuove le 'count' entry con data di modifica più vecchia e ne restituisce i filepath."""
+        raise NotImplementedError
+
+    def all_filepaths(self):
+        """Elenco di tutti i filepath presenti."""
+        raise NotImplementedError
+
+    def count(self):
+        """Numero di entry presenti."""
+        raise NotImplementedError
+
+    def query(self, text='', valid_only=False, tags=None):
+        """Filepath che soddisfano testo (sottostringa), validità e tag (almeno uno in comune)."""
+        raise NotImplementedError
+
+    def upsert(self, metadata):
+        """Inserisce o aggiorna una singola entry."""
+        self.upsert_many([metadata])
+
+    def __contains__(self, filepath):
+        return self.get(filepath) is not None
+
+    def flush(self):
+        """Rende persistenti le modifiche pendenti (se il backend ne ha)."""
+        return True
+
+    def close(self):
+        """Chiude il backend."""
+        pass
+
+
+class JsonShaderMetadataStore(ShaderMetadataStore):
+    """Backend legacy: tutti i metadati in memoria, riscritti interamente su file JSON a ogni flush."""
+
+    def __init__(self, json_path):
+        self.json_path = json_path
+        self.shaders = {}
+        self.content_index = None # hash -> filepath, costruito alla prima get_content e azzerato a ogni modifica
+        self.lock = threading.RLock()
+        if json_path and os.path.exists(json_path):
+            with open(json_path, 'r', encoding='utf-8') as f:
+                self.shaders = json.load(f).get('shaders', {})
+
+    def get(self, filepath):
+        with self.lock:
+            return self.shaders.get(filepath)
+
+    def load_signatures(self):
+        with self.lock:
+            return {fp: {k: m.get(k) for k in SIGNATURE_FIELDS} for fp, m in self.shaders.items()}
+
+    def load_search_fields(self):
+        with self.lock:
+            return [dict({k: m.get(k) for k in SEARCH_FIELDS}, filepath=fp) for fp, m in self.shaders.items()]
+
+    def get_content(self, content_hash):
+        with self.lock:
+            if self.content_index is None:
+                self.content_index = {metadata.get('hash'): filepath for filepath, metadata in self.shaders.items() if metadata.get('hash')}
+            filepath = self.content_index.get(content_hash)
+            return {field: self.shaders[filepath].get(field) for field in CONTENT_FIELDS} if filepath else None
+
+    def find_duplicates(self):
+        groups = {}
+        with self.lock:
+            for filepath, metadata in self.shaders.items():
+                groups.setdefault(content_key_for(dict(metadata, filepath=filepath)), []).append(filepath)
+        return sorted(((key, sorted(paths)) for key, paths in groups.items() if len(paths) > 1), key=lambda item: -len(item[1]))
+
+    def count_contents(self):
+        with self.lock:
+            return len({content_key_for(dict(metadata, filepath=filepath)) for filepath, metadata in self.shaders.items()})
+
+    def upsert_many(self, entries):
+        with self.lock:
+            for metadata in entries:
+                self.shaders[metadata['filepath']] = metadata
+            self.content_index = None
+
+    def delete_many(self, filepaths):
+        with self.lock:
+            for filepath in filepaths:
+                self.shaders.pop(filepath, None)
+            self.content_index = None
+
+    def delete_oldest(self, count):
+        with self.lock:
+            oldest = sorted(self.shaders.items(), key=lambda item: item[1].get('modified', 0))[:max(0, count)]
+            for filepath, _ in oldest:
+                del self.shaders[filepath]
+            self.content_index = None
+            return [filepath for filepath, _ in oldest]
+
+    def all_filepaths(self):
+        with self.lock:
+            return list(self.shaders.keys())
+
+    def count(self):
+        with self.lock:
+            return len(self.shaders)
+
+    def query(self, text='', valid_only=False, tags=None):
+        text = (text or '').lower()
+        required_tags = {tag.lower() for tag in (tags or [])}
+        with self.lock:
+            return [
+                filepath for filepath, metadata in self.shaders.items()
+                if (not text or text in build_search_text(metadata))
+                and (not valid_only or metadata.get('valid', False))
+                and (not required_tags or required_tags.intersection(t.lower() for t in metadata.get('tags', [])))
+            ]
+
+    def flush(self):
+        if not self.json_path:
+            return True
+        with self.lock:
+            cache_data = {'version': '1.0', 'timestamp': datetime.now().isoformat(), 'shaders': self.shaders}
+            with open(self.json_path, 'w', encoding='utf-8') as f:
+                json.dump(cache_data, f, indent=2, ensure_ascii=False)
+        return True
+
+
+class SqliteShaderMetadataStore(ShaderMetadataStore):
+    """
+    Backend SQLite (WAL), indirizzato per contenuto: i metadati estratti dal sorgente stanno una sola volta
+    in 'shader_contents' (chiave = hash del contenuto), mentre 'shader_paths' contiene solo i dati del file
+    (firma stat) e il riferimento al contenuto. Le copie dello stesso shader sono quindi alias di una riga.
+    Una sola connessione condivisa tra thread UI e thread di scansione, serializzata da un lock.
+    """
+
+    SCHEMA_VERSION = 2
+    SQL_CHUNK_SIZE = 500 # Parametri per clausola IN (limite SQLite: 999 nelle versioni più vecchie)
+
+    def __init__(self, db_path, legacy_json_path=None):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if db_path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < self.SCHEMA_VERSION:
+            self._create_schema()
+            if version == 1: self._migrate_schema_v1()
+            else: self._migrate_json_cache(legacy_json_path)
+
+    def _create_schema(self):
+        with self.lock, self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS shader_contents (
+                    content_key TEXT PRIMARY KEY, title TEXT, author TEXT, description TEXT, tags TEXT,
+                    uniforms TEXT, passes INTEGER, type TEXT, shadertoy_id TEXT, valid INTEGER, error TEXT,
+                    search_text TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_shader_contents_valid ON shader_contents(valid);
+                CREATE TABLE IF NOT EXISTS shader_paths (
+                    filepath TEXT PRIMARY KEY, filename TEXT, size INTEGER, modified REAL, mtime_ns INTEGER,
+                    inode INTEGER, hash TEXT, content_key TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_shader_paths_content ON shader_paths(content_key);
+                CREATE INDEX IF NOT EXISTS idx_shader_paths_modified ON shader_paths(modified);
+                CREATE TABLE IF NOT EXISTS shader_content_tags (
+                    tag TEXT NOT NULL, content_key TEXT NOT NULL, PRIMARY KEY (tag, content_key)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_shader_content_tags_key ON shader_content_tags(content_key);
+            """)
+            self.conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+
+    def _migrate_schema_v1(self):
+        """Converte la tabella 'shaders' della versione 1 (una riga completa per file) in percorsi + contenuti."""
+        try:
+            with self.lock:
+                rows = self.conn.execute("SELECT * FROM shaders").fetchall()
+                entries = [{field: row[field] for field in SHADER_FIELDS} for row in rows]
+                for metadata in entries:
+                    for field in JSON_FIELDS:
+                        metadata[field] = json.loads(metadata[field]) if metadata[field] else []
+                self.upsert_many(entries)
+                with self.conn:
+                    self.conn.executescript("DROP TABLE IF EXISTS shader_tags; DROP TABLE IF EXISTS shaders;")
+            print(f"Database shader {self.db_path} aggiornato alla versione {self.SCHEMA_VERSION} ({len(entries)} entry).")
+        except Exception as e:
+            print(f"Errore durante l'aggiornamento dello schema del database shader: {e}")
+            traceback.print_exc()
+
+    def _migrate_json_cache(self, legacy_json_path):
+        """Importa la vecchia cache JSON (se presente) in un'unica transazione."""
+        if not legacy_json_path or not os.path.exists(legacy_json_path):
+            return
+        try:
+            with open(legacy_json_path, 'r', encoding='utf-8') as f:
+                shaders = json.load(f).get('shaders', {})
+            entries = [dict(metadata, filepath=filepath) for filepath, metadata in shaders.items()]
+            self.upsert_many(entries)
+            print(f"Migrate {len(entries)} entry dalla cache JSON {legacy_json_path} al database {self.db_path}.")
+        except Exception as e:
+            print(f"Errore durante la migrazione della cache JSON {legacy_json_path}: {e}")
+            traceback.print_exc()
+
+    def _row_to_metadata(self, row):
+        metadata = {field: row[field] for field in SHADER_FIELDS}
+        for field in JSON_FIELDS:
+            metadata[field] = json.loads(metadata[field]) if metadata[field] else []
+        metadata['valid'] = bool(metadata['valid'])
+        return metadata
+
+    def _content_row(self, content_key, metadata):
+        row = [content_key]
+        for field in CONTENT_FIELDS:
+            value = metadata.get(field)
+            if field in JSON_FIELDS:
+                value = json.dumps(value or [], ensure_ascii=False)
+            elif field == 'valid':
+                value = 1 if value else 0
+            row.append(value)
+        row.append(build_search_text(metadata))
+        return row
+
+    def _collect_orphan_contents(self, content_keys):
+        """Elimina i contenuti indicati (e i loro tag) se non più referenziati da alcun percorso."""
+        params = [(content_key, content_key) for content_key in content_keys]
+        self.conn.executemany("DELETE FROM shader_contents WHERE content_key = ? AND NOT EXISTS (SELECT 1 FROM shader_paths p WHERE p.content_key = ?)", params)
+        self.conn.executemany("DELETE FROM shader_content_tags WHERE content_key = ? AND NOT EXISTS (SELECT 1 FROM shader_contents c WHERE c.content_key = ?)", params)
+
+    def _content_keys_of(self, filepaths):
+        """Contenuti a cui puntano i percorsi indicati (query a blocchi di SQL_CHUNK_SIZE parametri)."""
+        content_keys = set()
+        for start in range(0, len(filepaths), self.SQL_CHUNK_SIZE):
+            chunk = filepaths[start:start + self.SQL_CHUNK_SIZE]
+            content_keys.update(row[0] for row in self.conn.execute(f"SELECT content_key FROM shader_paths WHERE filepath IN ({', '.join('?' * len(chunk))})", chunk))
+        return content_keys
+
+    _SELECT_METADATA = ("SELECT p.filepath, p.filename, p.size, p.modified, p.mtime_ns, p.inode, p.hash, c.* "
+                        "FROM shader_paths p JOIN shader_contents c ON c.content_key = p.content_key")
+
+    def get(self, filepath):
+        with self.lock:
+            row = self.conn.execute(self._SELECT_METADATA + " WHERE p.filepath = ?", (filepath,)).fetchone()
+        return self._row_to_metadata(row) if row else None
+
+    def get_content(self, content_hash):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM shader_contents WHERE content_key = ?", (content_hash,)).fetchone()
+        if not row:
+            return None
+        content = {field: row[field] for field in CONTENT_FIELDS}
+        for field in JSON_FIELDS:
+            content[field] = json.loads(content[field]) if content[field] else []
+        content['valid'] = bool(content['valid'])
+        return content
+
+    def load_signatures(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT filepath, size, mtime_ns, inode, hash FROM shader_paths").fetchall()
+        return {row['filepath']: {k: row[k] for k in SIGNATURE_FIELDS} for row in rows}
+
+    def load_search_fields(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT p.filepath, p.filename, c.title, c.author, c.description, c.tags, c.valid "
+                                     "FROM shader_paths p JOIN shader_contents c ON c.content_key = p.content_key").fetchall()
+        return [{'filepath': row['filepath'], 'filename': row['filename'], 'title': row['title'], 'author': row['author'],
+                 'description': row['description'], 'tags': json.loads(row['tags']) if row['tags'] else [], 'valid': bool(row['valid'])}
+                for row in rows]
+
+    def upsert_many(self, entries):
+        entries = [metadata for metadata in entries if metadata.get('filepath')]
+        if not entries:
+            return
+        contents = {} # Una riga per contenuto, anche se il blocco contiene più copie
+        path_rows = []
+        for metadata in entries:
+            content_key = content_key_for(metadata)
+            contents[content_key] = metadata
+            path_rows.append([metadata.get(field) for field in PATH_FIELDS] + [content_key])
+        tag_rows = [(tag.lower(), content_key) for content_key, metadata in contents.items() for tag in set(metadata.get('tags', []) or [])]
+        path_columns = ', '.join(PATH_FIELDS) + ', content_key'
+        content_columns = 'content_key, ' + ', '.join(CONTENT_FIELDS) + ', search_text'
+        with self.lock, self.conn:
+            # Contenuti a cui puntavano i percorsi aggiornati (es. shader modificato): orfani se nessun altro li usa
+            replaced = self._content_keys_of([row[0] for row in path_rows]) - contents.keys()
+            self.conn.executemany(f"INSERT OR REPLACE INTO shader_contents ({content_columns}) VALUES ({', '.join('?' * (len(CONTENT_FIELDS) + 2))})",
+                                  [self._content_row(content_key, metadata) for content_key, metadata in contents.items()])
+            self.conn.executemany(f"INSERT OR REPLACE INTO shader_paths ({path_columns}) VALUES ({', '.join('?' * (len(PATH_FIELDS) + 1))})", path_rows)
+            self.conn.executemany("DELETE FROM shader_content_tags WHERE content_key = ?", [(content_key,) for content_key in contents])
+            self.conn.executemany("INSERT OR IGNORE INTO shader_content_tags (tag, content_key) VALUES (?, ?)", tag_rows)
+            if replaced: self._collect_orphan_contents(replaced)
+
+    def delete_many(self, filepaths):
+        params = [(filepath,) for filepath in filepaths]
+        if not params:
+            return
+        with self.lock, self.conn:
+            removed = self._content_keys_of([filepath for filepath, in params]) # Solo questi contenuti possono restare orfani
+            self.conn.executemany("DELETE FROM shader_paths WHERE filepath = ?", params)
+            if removed: self._collect_orphan_contents(removed)
+
+    def delete_oldest(self, count):
+        if count <= 0:
+            return []
+        with self.lock:
+            rows = self.conn.execute("SELECT filepath FROM shader_paths ORDER BY modified ASC LIMIT ?", (count,)).fetchall()
+        filepaths = [row['filepath'] for row in rows]
+        self.delete_many(filepaths)
+        return filepaths
+
+    def all_filepaths(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT filepath FROM shader_paths")]
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM shader_paths").fetchone()[0]
+
+    def count_contents(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM shader_contents").fetchone()[0]
+
+    def find_duplicates(self):
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT p.content_key, p.filepath FROM shader_paths p
+                WHERE p.content_key IN (SELECT content_key FROM shader_paths GROUP BY content_key HAVING COUNT(*) > 1)
+                ORDER BY p.content_key, p.filepath
+            """).fetchall()
+        groups = {}
+        for row in rows:
+            groups.setdefault(row['content_key'], []).append(row['filepath'])
+        return sorted(groups.items(), key=lambda item: -len(item[1]))
+
+    def query(self, text='', valid_only=False, tags=None):
+        clauses = []; params = []
+        if text:
+            clauses.append("instr(c.search_text, ?) > 0"); params.append(text.lower())
+        if valid_only:
+            clauses.append("c.valid = 1")
+        if tags:
+            required_tags = sorted({tag.lower() for tag in tags})
+            clauses.append(f"EXISTS (SELECT 1 FROM shader_content_tags t WHERE t.content_key = p.content_key AND t.tag IN ({', '.join('?' * len(required_tags))}))")
+            params.extend(required_tags)
+        sql = ("SELECT p.filepath FROM shader_paths p JOIN shader_contents c ON c.content_key = p.content_key"
+               + (" WHERE " + " AND ".join(clauses) if clauses else ""))
+        with self.lock:
+            return [row[0] for row in self.conn.execute(sql, params)]
+
+    def flush(self):
+        with self.lock:
+            self.conn.commit()
+        return True
+
+    def close(self):
+        with self.lock:
+            try:
+                self.conn.commit()
+                self.conn.close()
+            except sqlite3.ProgrammingError:
+                pass # Connessione già chiusa
+
+
+def create_shader_store(backend, db_path, json_path):
+    """Crea il backend di metadati richiesto ('sqlite', 'json' o 'memory')."""
+    if backend == "json":
+        return JsonShaderMetadataStore(json_path)
+    if backend == "memory":
+        return SqliteShaderMetadataStore(":memory:")
+    return SqliteShaderMetadataStore(db_path, legacy_json_path=json_path)
+
+
+# --- VERIFICA ---
+def run_self_check():
+    """Controlla sul backend in memoria che i contenuti non più referenziati vengano eliminati (modifica, copia, rimozione)."""
+    store = create_shader_store("memory", None, None)
+    entry = lambda filepath, content_hash, title: {'filepath': filepath, 'filename': os.path.basename(filepath), 'hash': content_hash, 'title': title, 'tags': [title], 'valid': True}
+    store.upsert(entry('a.frag', 'h1', 'prima'))
+    store.upsert(entry('a.frag', 'h2', 'dopo')) # Shader modificato: h1 non è più usato
+    assert store.count_contents() == 1 and store.get_content('h1') is None and store.query(tags=['prima']) == []
+    store.upsert_many([entry('b.frag', 'h2', 'dopo'), entry('c.frag', 'h3', 'terzo')])
+    store.upsert(entry('b.frag', 'h3', 'terzo')) # h2 resta: lo usa ancora a.frag
+    assert store.count_contents() == 2 and store.get_content('h2') is not None
+    store.delete_many(['a.frag', 'mancante.frag'])
+    assert store.count_contents() == 1 and store.get_content('h2') is None and store.query(tags=['dopo']) == []
+    store.delete_oldest(5)
+    assert store.count_contents() == 0 and store.query(tags=['terzo']) == []
+    store.close()
+    print("Store metadati shader: verifica contenuti orfani superata.")
+
+
+if __name__ == "__main__":
+    run_self_check()
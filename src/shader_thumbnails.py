@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+SHADER THUMBNAILS - Miniature degli shader renderizzate su CPU, senza GPU né display.
+Il sorgente viene adattato come fa il player WebGL (uniform u_*, mainImage) e renderizzato a bassa risoluzione
+con un contesto OpenGL software (moderngl su EGL/llvmpipe, se installato) oppure con il valutatore NumPy di
+glsl_numpy. Le miniature sono PNG in cache per hash del contenuto, istante e dimensione; il rendering
+è distribuito su un pool di processi, una sola volta per contenuto anche se il file è copiato più volte.
+Eseguito come script: 'python shader_thumbnails.py [cartella_shader] [cartella_cache]' oppure benchmark.
+"""
+
+import os
+import re
+import sys
+import time
+import zlib
+import queue
+import struct
+import tempfile
+import multiprocessing
+import traceback
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from glsl_numpy import ShaderProgram
+from shader_metadata import read_shader_file
+
+try:
+    import moderngl
+    MODERNGL_AVAILABLE = True
+except ImportError:
+    MODERNGL_AVAILABLE = False
+
+SHADER_SUPPORTED_EXTENSIONS = ('.frag', '.glsl', '.fs', '.shader')
+DEFAULT_THUMBNAIL_SIZE = (160, 90)
+DEFAULT_TIME_OFFSET = 5.0 # Stesso istante delle miniature WebGL della galleria
+BACKENDS = ('auto', 'moderngl', 'numpy')
+SHADER_HEADER = ("precision mediump float; uniform vec2 u_resolution; uniform float u_time; uniform float u_zoom; uniform vec2 u_pan; "
+                 "uniform float u_rotation; uniform float u_distortion; uniform float u_opacity; uniform vec2 u_chromaKey; "
+                 "uniform float u_audioLevel; uniform float u_bass; uniform float u_beat;\n")
+THUMBNAIL_UNIFORMS = {'u_zoom': 1.0, 'u_pan': (0.0, 0.0), 'u_opacity': 1.0} # Gli altri uniform restano a zero
+MAIN_IMAGE_RE = re.compile(r'void\s+mainImage\s*\(')
+MAIN_RE = re.compile(r'void\s+main\s*\(\s*(void)?\s*\)')
+VERTEX_SHADER_330 = "#version 330\nin vec2 p;\nvoid main() { gl_Position = vec4(p, 0.0, 1.0); }\n"
+
+
+def adapt_shader_source(source):
+    """Sorgente come lo compila il player WebGL: intestazione degli uniform, iResolution/iTime e main() da mainImage."""
+    body = re.sub(r'\biResolution\b', 'u_resolution', source)
+    body = re.sub(r'\biTime\b', 'u_time', body)
+    if MAIN_IMAGE_RE.search(body):
+        body += "\nvoid main() { vec4 color = vec4(0.0, 0.0, 0.0, 1.0); mainImage(color, gl_FragCoord.xy); gl_FragColor = color; }\n"
+    elif MAIN_RE.search(body):
+        body = MAIN_RE.sub('void main_user()', body) + "\nvoid main() { main_user(); }\n"
+    return SHADER_HEADER + body
+
+
+def encode_png(rgb):
+    """PNG RGB a 8 bit da un array (altezza, larghezza, 3) uint8, senza dipendenze esterne."""
+    height, width, _ = rgb.shape
+    rows = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 0] = 0 # Filtro 'None' per ogni riga
+    rows[:, 1:] = rgb.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)) + chunk(b'IEND', b'')
+
+
+def _to_rgb8(rgba):
+    rgb = np.nan_to_num(rgba[..., :3], nan=0.0, posinf=1.0, neginf=0.0)
+    return np.rint(np.minimum(np.maximum(rgb, 0.0), 1.0) * 255.0).astype(np.uint8)
+
+
+class NumpyShaderRenderer:
+    """Renderer software: interpreta il sottoinsieme GLSL con NumPy (nessuna libreria grafica richiesta)."""
+
+    name = 'numpy'
+    version = 1 # Da incrementare quando cambia l'output (o il sottoinsieme supportato): le miniature in cache vengono rifatte
+
+    def __init__(self):
+        self.source = None
+        self.program = None
+
+    def render(self, source, width, height, time_offset):
+        if source != self.source: # Più istanti dello stesso shader: analizzato una volta sola
+            self.program = ShaderProgram(adapt_shader_source(source)); self.source = source
+        uniforms = dict(THUMBNAIL_UNIFORMS, u_resolution=(width, height), u_time=time_offset)
+        return _to_rgb8(self.program.render(width, height, uniforms))
+
+
+class ModernGLRenderer:
+    """Renderer OpenGL 3.3 senza finestra (contesto EGL; su macchine senza GPU lo fornisce Mesa llvmpipe)."""
+
+    name = 'moderngl'
+    version = 1
+
+    def __init__(self):
+        try: self.ctx = moderngl.create_standalone_context(backend='egl')
+        except Exception: self.ctx = moderngl.create_standalone_context()
+        quad = np.array([-1.0, -1.0, 1.0, -1.0, -1.0, 1.0, 1.0, 1.0], dtype='f4')
+        self.quad = self.ctx.buffer(quad.tobytes())
+        self.source = None
+        self.program = None
+        self.vao = None
+
+    def _compile(self, source):
+        fragment = re.sub(r'\bgl_FragColor\b', 'thumbnailColor', adapt_shader_source(source))
+        fragment = "#version 330\n#define texture2D texture\nout vec4 thumbnailColor;\n" + fragment
+        if self.vao is not None: self.vao.release(); self.program.release()
+        self.vao = None
+        self.program = self.ctx.program(vertex_shader=VERTEX_SHADER_330, fragment_shader=fragment)
+        self.vao = self.ctx.simple_vertex_array(self.program, self.quad, 'p')
+        self.source = source
+
+    def render(self, source, width, height, time_offset):
+        if source != self.source:
+            self._compile(source)
+        uniforms = dict(THUMBNAIL_UNIFORMS, u_resolution=(width, height), u_time=time_offset)
+        for name, value in uniforms.items():
+            if name in self.program: self.program[name].value = value # Uniform eliminati dal compilatore: ignorati
+        framebuffer = self.ctx.simple_framebuffer((width, height), components=4)
+        try:
+            framebuffer.use(); framebuffer.clear(0.0, 0.0, 0.0, 1.0)
+            self.vao.render(moderngl.TRIANGLE_STRIP)
+            pixels = np.frombuffer(framebuffer.read(components=3), dtype=np.uint8).reshape(height, width, 3)
+        finally:
+            framebuffer.release()
+        return pixels[::-1].copy() # OpenGL legge dal basso verso l'alto
+
+    def release(self):
+        if self.vao is not None: self.vao.release(); self.program.release()
+        self.quad.release(); self.ctx.release()
+
+
+def create_renderer(backend='auto'):
+    """Renderer richiesto; 'auto' prova il contesto OpenGL software e ripiega sul valutatore NumPy."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend miniature non supportato: {backend} (validi: {', '.join(BACKENDS)})")
+    if backend in ('auto', 'moderngl') and MODERNGL_AVAILABLE:
+        try:
+            return ModernGLRenderer()
+        except Exception as e:
+            if backend == 'moderngl': raise
+            print(f"Contesto OpenGL non disponibile, miniature con NumPy: {e}")
+    elif backend == 'moderngl':
+        raise RuntimeError("moderngl non installato: pip install moderngl")
+    return NumpyShaderRenderer()
+
+
+def resolve_renderer(backend='auto'):
+    """Classe del renderer che create_renderer sceglierebbe (nome e versione per la chiave della cache),
+    senza lasciare aperto un contesto OpenGL nel processo: il contesto di prova viene rilasciato subito."""
+    renderer = create_renderer(backend)
+    if hasattr(renderer, 'release'): renderer.release()
+    return type(renderer)
+
+
+class ThumbnailCache:
+    """
+    PNG in una cartella, chiave = hash del contenuto + istante + dimensione + renderer (nome e versione).
+    I fallimenti sono marcati con '.err' per lo stesso renderer: uno shader rifiutato dal valutatore NumPy
+    viene riprovato quando è disponibile il contesto OpenGL, e le due versioni della miniatura non si mescolano.
+    """
+
+    def __init__(self, folder, width=DEFAULT_THUMBNAIL_SIZE[0], height=DEFAULT_THUMBNAIL_SIZE[1]):
+        self.folder = Path(folder)
+        self.width = int(width)
+        self.height = int(height)
+
+    def path_for(self, content_hash, time_offset, renderer):
+        key = f"{content_hash}_{int(round(time_offset * 1000))}ms_{self.width}x{self.height}_{renderer.name}{renderer.version}"
+        return self.folder / content_hash[:2] / f"{key}.png" # Sottocartelle per non avere migliaia di file in una sola
+
+    def lookup(self, content_hash, time_offsets, renderer):
+        """({istante: percorso}, errore) se tutti gli istanti sono già in cache, altrimenti (None, None)."""
+        outputs = {}
+        for time_offset in time_offsets:
+            path = self.path_for(content_hash, time_offset, renderer)
+            if path.exists():
+                outputs[time_offset] = str(path); continue
+            error_path = path.with_suffix('.err')
+            if not error_path.exists():
+                return None, None
+            return {}, error_path.read_text(encoding='utf-8', errors='replace')
+        return outputs, None
+
+    @staticmethod
+    def write(path, data):
+        """Scrittura atomica (file temporaneo + rename): mai PNG parziali visibili ad altri processi."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+
+def render_to_files(renderer, source, width, height, targets):
+    """Renderizza gli istanti di targets [(istante, percorso)]; restituisce ({istante: percorso}, errore)."""
+    outputs = {}
+    for time_offset, path in targets:
+        try:
+            ThumbnailCache.write(path, encode_png(renderer.render(source, width, height, time_offset)))
+            outputs[time_offset] = str(path)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            ThumbnailCache.write(Path(path).with_suffix('.err'), error.encode('utf-8'))
+            return outputs, error
+    return outputs, None
+
+
+_worker_backend = 'auto'
+_worker_renderer = None
+
+
+def _init_worker(backend):
+    global _worker_backend
+    _worker_backend = backend
+
+
+def _render_job(source, width, height, targets):
+    """Lavoro eseguito nei processi: il renderer (e l'eventuale contesto GL) è creato una volta per processo."""
+    global _worker_renderer
+    if _worker_renderer is None:
+        _worker_renderer = create_renderer(_worker_backend)
+    return render_to_files(_worker_renderer, source, width, height, targets)
+
+
+class ThumbnailRenderPool:
+    """Rendering parallelo delle miniature di una lista di file con cache e deduplicazione per contenuto."""
+
+    DEFAULT_IN_FLIGHT_PER_WORKER = 2
+    DEFAULT_PROGRESS_INTERVAL_SECONDS = 0.1
+    MIN_JOBS_FOR_PROCESS_POOL = 4 # Ogni miniatura costa decine di ms: il pool conviene quasi subito
+    # Mai fork: i processi erediterebbero il contesto EGL/llvmpipe e i thread del processo principale
+    PROCESS_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+    def __init__(self, cache, backend='auto', workers=None, time_offsets=(DEFAULT_TIME_OFFSET,), use_processes=True,
+                 max_in_flight=None, progress_interval=DEFAULT_PROGRESS_INTERVAL_SECONDS):
+        self.cache = cache
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.time_offsets = tuple(float(t) for t in time_offsets)
+        self.use_processes = use_processes
+        self.max_in_flight = max_in_flight or self.workers * self.DEFAULT_IN_FLIGHT_PER_WORKER
+        self.progress_interval = progress_interval
+        self.renderer_class = None # Renderer effettivo ('auto' risolto in run): nome e versione nella chiave della cache
+        self.renderer = None # Istanza per il rendering nel processo corrente, creata solo se serve
+        self.stats = {'rendered': 0, 'cached': 0, 'duplicates': 0, 'errors': 0}
+
+    def _use_pool(self, total):
+        return self.use_processes and self.workers > 1 and total >= self.MIN_JOBS_FOR_PROCESS_POOL
+
+    def _start_pool(self):
+        try: # I processi usano il renderer già scelto qui ('auto' risolto): le chiavi della cache corrispondono
+            return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(self.PROCESS_START_METHOD),
+                                       initializer=_init_worker, initargs=(self.renderer_class.name,))
+        except Exception as e:
+            print(f"Impossibile avviare il pool di processi, miniature nel processo corrente: {e}")
+            return None
+
+    def _render_local(self, source, targets):
+        if self.renderer is None: self.renderer = create_renderer(self.renderer_class.name)
+        return render_to_files(self.renderer, source, self.cache.width, self.cache.height, targets)
+
+    def run(self, file_list, on_result=None, on_progress=None):
+        """
+        Miniature per file_list. on_result(filepath, {istante: percorso png}, errore) per ogni file,
+        on_progress(done, total) limitato nel tempo. Restituisce le statistiche (renderizzati, cache, duplicati, errori).
+        """
+        total = len(file_list); done = 0; last_progress = 0.0
+        self.stats = {'rendered': 0, 'cached': 0, 'duplicates': 0, 'errors': 0}
+        results = queue.Queue()
+        waiting = {} # hash -> file con quel contenuto in attesa del rendering
+        use_pool = self._use_pool(total)
+        if self.renderer_class is None: # Anche con i processi: il renderer effettivo fa parte della chiave di cache
+            if use_pool: self.renderer_class = resolve_renderer(self.backend) # Nessun contesto GL aperto nel processo principale
+            else: self.renderer = create_renderer(self.backend); self.renderer_class = type(self.renderer)
+        pool = self._start_pool() if use_pool else None
+        in_flight = 0
+
+        def deliver(filepath, outputs, error):
+            nonlocal done, last_progress
+            done += 1
+            if error: self.stats['errors'] += 1
+            if on_result:
+                try: on_result(filepath, outputs, error)
+                except Exception as e: print(f"Errore nella consegna della miniatura di {filepath}: {e}"); traceback.print_exc()
+            now = time.monotonic()
+            if on_progress and (now - last_progress >= self.progress_interval or done == total):
+                last_progress = now
+                on_progress(done, total)
+
+        def collect(block):
+            nonlocal in_flight
+            content_hash, future, outputs, error = results.get(block=block)
+            in_flight -= 1
+            if future is not None:
+                try: outputs, error = future.result()
+                except Exception as e: outputs, error = {}, f"{type(e).__name__}: {e}"
+            self.stats['rendered'] += 1
+            for filepath in waiting.pop(content_hash, []):
+                deliver(filepath, outputs, error)
+
+        try:
+            for filepath in file_list:
+                try:
+                    metadata = {}
+                    source = read_shader_file(filepath, metadata)
+                except Exception as e:
+                    deliver(filepath, {}, str(e)); continue
+                content_hash = metadata['hash']
+                if content_hash in waiting: # Copia di un contenuto già in rendering
+                    waiting[content_hash].append(filepath); self.stats['duplicates'] += 1; continue
+                outputs, error = self.cache.lookup(content_hash, self.time_offsets, self.renderer_class)
+                if outputs is not None:
+                    self.stats['cached'] += 1; deliver(filepath, outputs, error); continue
+                targets = [(t, str(self.cache.path_for(content_hash, t, self.renderer_class))) for t in self.time_offsets]
+                waiting[content_hash] = [filepath]; in_flight += 1
+                if pool is not None:
+                    try:
+                        future = pool.submit(_render_job, source, self.cache.width, self.cache.height, targets)
+                        future.add_done_callback(lambda f, h=content_hash: results.put((h, f, None, None)))
+                    except (BrokenProcessPool, RuntimeError) as e:
+                        print(f"Pool di processi non disponibile, miniature nel processo corrente: {e}")
+                        pool = None
+                if pool is None:
+                    outputs, error = self._render_local(source, targets)
+                    results.put((content_hash, None, outputs, error))
+                while in_flight >= self.max_in_flight or not results.empty():
+                    collect(True)
+            while in_flight:
+                collect(True)
+        finally:
+            if pool is not None: pool.shutdown(wait=True, cancel_futures=True)
+        return dict(self.stats)
+
+
+def list_shader_files(folder):
+    """File shader della cartella (ricorsivo), in ordine stabile."""
+    return sorted(str(path) for path in Path(folder).rglob('*') if path.suffix.lower() in SHADER_SUPPORTED_EXTENSIONS and path.is_file())
+
+
+# --- BENCHMARK ---
+def run_folder(folder, cache_folder=None, backend='auto'):
+    """Miniature di tutti gli shader di una cartella."""
+    cache = ThumbnailCache(cache_folder or Path(folder) / '.thumbnails')
+    files = list_shader_files(folder)
+    errors = []
+    start = time.perf_counter()
+    stats = ThumbnailRenderPool(cache, backend=backend).run(
+        files, on_result=lambda path, outputs, error: error and errors.append((path, error)),
+        on_progress=lambda done, total: print(f"\r  {done}/{total}", end='', flush=True))
+    print(f"\nMiniature in {cache.folder}: {stats} in {time.perf_counter() - start:.1f} s")
+    for path, error in errors[:20]: print(f"  {os.path.basename(path)}: {error}")
+
+
+def run_benchmark(count=200, backend='auto', workers=None):
+    """Rendering di shader generati: un processo contro tutti i core, poi seconda passata servita dalla cache."""
+    from shader_metadata import _generate_corpus
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as temp:
+        folder = Path(temp) / 'shaders'; folder.mkdir()
+        for i, content in enumerate(_generate_corpus(count)):
+            (folder / f"generated_{i:05d}.frag").write_text(content, encoding='utf-8')
+        files = list_shader_files(folder)
+        print(f"Miniature {DEFAULT_THUMBNAIL_SIZE[0]}x{DEFAULT_THUMBNAIL_SIZE[1]} di {count} shader, backend {resolve_renderer(backend).name}")
+        for run, (label, pool_workers) in enumerate((("1 processo", 1), (f"{workers} processi", workers))):
+            cache = ThumbnailCache(Path(temp) / f"cache_{run}")
+            start = time.perf_counter()
+            stats = ThumbnailRenderPool(cache, backend=backend, workers=pool_workers).run(files)
+            elapsed = time.perf_counter() - start
+            print(f"  {label:12s} {elapsed:6.2f} s ({elapsed / count * 1000:6.1f} ms/shader) {stats}")
+        start = time.perf_counter()
+        stats = ThumbnailRenderPool(cache, backend=backend, workers=workers).run(files)
+        print(f"  {'cache':12s} {time.perf_counter() - start:6.2f} s {stats}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and not sys.argv[1].isdigit():
+        run_folder(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        run_benchmark(*(int(arg) for arg in sys.argv[1:2]))
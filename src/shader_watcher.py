@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SHADER WATCHER - Osservazione della cartella shader per aggiornamenti incrementali della libreria.
+Su Linux usa inotify (via ctypes, senza dipendenze esterne), altrove o in caso di errore ripiega su un
+polling delle firme os.stat. Gli eventi vengono raggruppati (debounce) e consegnati come due liste:
+file creati/modificati/rinominati da rielaborare e percorsi rimossi (file o intere cartelle).
+Eseguito come script stampa le modifiche rilevate nella cartella indicata.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import platform
+import threading
+import traceback
+import ctypes
+import ctypes.util
+
+# --- Costanti inotify (da <sys/inotify.h>) ---
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK if hasattr(os, 'O_NONBLOCK') else 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                      | IN_DELETE_SELF | IN_MOVE_SELF)
+INOTIFY_EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, len
+INOTIFY_READ_SIZE = 64 * 1024
+
+# Evento grezzo di un backend: (percorso, rimosso). None come percorso = coda persa, serve una riscansione completa
+RESCAN_EVENT = (None, False)
+
+
+def is_supported_shader(path, extensions):
+    """True se il percorso ha una delle estensioni shader supportate."""
+    return path.lower().endswith(tuple(extensions))
+
+
+def walk_shader_files(folder, extensions, recursive=True):
+    """Elenca i file shader presenti in una cartella."""
+    found = []
+    for root, dirs, files in os.walk(folder):
+        found.extend(os.path.join(root, file) for file in files if is_supported_shader(file, extensions))
+        if not recursive: break
+    return found
+
+
+class InotifyBackend:
+    """Backend Linux: un watch inotify per cartella, aggiunto anche per le sottocartelle create o spostate dentro."""
+
+    def __init__(self, folder, extensions, recursive=True):
+        self.folder = folder; self.extensions = extensions; self.recursive = recursive
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fallita")
+        self.watches = {} # wd -> cartella
+        self._add_tree(folder)
+
+    def _add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_WATCH_MASK | IN_ONLYDIR)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, "Limite di watch inotify raggiunto (fs.inotify.max_user_watches)")
+            return # Cartella sparita nel frattempo o senza permessi
+        self.watches[wd] = directory
+
+    def _remove_tree(self, directory):
+        """Toglie i watch di una cartella (e sottocartelle) uscita dall'albero: i percorsi registrati non sarebbero più validi."""
+        prefix = os.path.join(directory, '')
+        for wd, watched in list(self.watches.items()):
+            if watched == directory or watched.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd) # Errore ignorato se il watch è già stato rimosso dal kernel
+                del self.watches[wd]
+
+    def _add_tree(self, directory):
+        """Aggiunge i watch a una cartella (e sottocartelle) e restituisce i file shader già presenti."""
+        found = []
+        for root, dirs, files in os.walk(directory):
+            self._add_watch(root)
+            found.extend(os.path.join(root, file) for file in files if is_supported_shader(file, self.extensions))
+            if not self.recursive: break
+        return found
+
+    def read_events(self, timeout):
+        """Attende fino a 'timeout' secondi e restituisce gli eventi (percorso, rimosso) disponibili."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, INOTIFY_READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []; offset = 0
+        while offset + INOTIFY_EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append(RESCAN_EVENT); continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None); continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if directory == self.folder: events.append(RESCAN_EVENT) # La cartella radice è stata spostata/rimossa
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._remove_tree(path) # Se la cartella è stata spostata dentro l'albero, IN_MOVED_TO la riaggiunge
+                    events.append((path, True)) # Rimuove tutti gli shader sotto la cartella
+                elif mask & (IN_CREATE | IN_MOVED_TO) and self.recursive:
+                    events.extend((found, False) for found in self._add_tree(path))
+            elif is_supported_shader(name, self.extensions):
+                events.append((path, bool(mask & (IN_DELETE | IN_MOVED_FROM))))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd); self.fd = -1
+
+
+class PollingBackend:
+    """Backend di riserva: confronta periodicamente le firme os.stat (dimensione, mtime, inode) dei file shader."""
+
+    def __init__(self, folder, extensions, recursive=True, poll_interval=1.0):
+        self.folder = folder; self.extensions = extensions; self.recursive = recursive
+        self.poll_interval = poll_interval
+        self.snapshot = self._take_snapshot()
+        self.next_poll = time.monotonic() + poll_interval
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for path in walk_shader_files(self.folder, self.extensions, self.recursive):
+            try:
+                st = os.stat(path)
+                snapshot[path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+            except OSError:
+                pass # File rimosso durante la scansione
+        return snapshot
+
+    def read_events(self, timeout):
+        wait = self.next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout); return []
+        if wait > 0: time.sleep(wait)
+        self.next_poll = time.monotonic() + self.poll_interval
+        previous, self.snapshot = self.snapshot, self._take_snapshot()
+        events = [(path, False) for path, signature in self.snapshot.items() if previous.get(path) != signature]
+        events.extend((path, True) for path in previous if path not in self.snapshot)
+        return events
+
+    def close(self):
+        pass
+
+
+class ShaderFolderWatcher:
+    """
+    Osserva una cartella shader in un thread dedicato e chiama on_changes(updated, deleted, full_rescan)
+    solo dopo 'debounce_seconds' senza nuovi eventi (o al più ogni 'max_delay_seconds' con eventi continui).
+    """
+
+    DEFAULT_DEBOUNCE_SECONDS = 0.3 # Silenzio richiesto prima di consegnare un gruppo di modifiche
+    DEFAULT_MAX_DELAY_SECONDS = 2.0 # Latenza massima con eventi continui (es. salvataggi ripetuti)
+    DEFAULT_POLL_INTERVAL_SECONDS = 1.0
+    WAIT_TIMEOUT_SECONDS = 0.5 # Intervallo massimo tra i controlli della richiesta di stop
+
+    def __init__(self, folder, extensions, on_changes, recursive=True, debounce_seconds=DEFAULT_DEBOUNCE_SECONDS,
+                 max_delay_seconds=DEFAULT_MAX_DELAY_SECONDS, poll_interval=DEFAULT_POLL_INTERVAL_SECONDS, use_inotify=True):
+        self.folder = folder # Non normalizzato: i percorsi devono coincidere con quelli della scansione
+        self.extensions = list(extensions)
+        self.on_changes = on_changes
+        self.recursive = recursive
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.backend = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def _create_backend(self):
+        if self.use_inotify and platform.system() == "Linux":
+            try:
+                return InotifyBackend(self.folder, self.extensions, self.recursive)
+            except (OSError, AttributeError) as e:
+                print(f"inotify non disponibile, uso il polling della cartella shader: {e}")
+        return PollingBackend(self.folder, self.extensions, self.recursive, self.poll_interval)
+
+    @property
+    def mode(self):
+        """Nome del backend attivo ('inotify' o 'polling')."""
+        return 'inotify' if isinstance(self.backend, InotifyBackend) else 'polling'
+
+    def start(self):
+        """Crea il backend (i watch vengono registrati subito) e avvia il thread di osservazione."""
+        if self.thread is not None:
+            return
+        self.stop_event = threading.Event() # Nuovo per ogni avvio: un thread precedente ancora in uscita resta fermo
+        self.backend = self._create_backend()
+        self.thread = threading.Thread(target=self._run, args=(self.backend, self.stop_event), name="shader-watcher", daemon=True)
+        self.thread.start()
+        print(f"Osservazione cartella shader avviata ({self.mode}): {self.folder}")
+
+    def stop(self):
+        """Ferma il thread; le modifiche ancora in attesa vengono scartate. Il backend viene chiuso dal thread stesso all'uscita."""
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=self.WAIT_TIMEOUT_SECONDS * 4)
+            if self.thread.is_alive():
+                print("Thread di osservazione ancora nel callback: il backend verrà chiuso alla sua uscita")
+        self.thread = None; self.backend = None
+
+    def _run(self, backend, stop_event):
+        pending = {} # percorso -> rimosso (vale l'ultimo evento)
+        full_rescan = False; first_event = last_event = 0.0
+        try:
+            while not stop_event.is_set():
+                now = time.monotonic()
+                timeout = self.WAIT_TIMEOUT_SECONDS
+                if pending or full_rescan:
+                    timeout = max(0.0, min(last_event + self.debounce_seconds, first_event + self.max_delay_seconds) - now)
+                events = backend.read_events(timeout)
+                now = time.monotonic()
+                if events:
+                    if not (pending or full_rescan): first_event = now # Inizio di un nuovo gruppo di modifiche
+                    last_event = now
+                for path, removed in events:
+                    if path is None: full_rescan = True
+                    else: pending[path] = removed
+                if (pending or full_rescan) and (now - last_event >= self.debounce_seconds or now - first_event >= self.max_delay_seconds):
+                    self._deliver(pending, full_rescan)
+                    pending = {}; full_rescan = False
+        except Exception as e:
+            print(f"Errore nel thread di osservazione della cartella shader: {e}")
+            traceback.print_exc()
+        finally:
+            backend.close() # Solo qui: il descrittore non viene mai chiuso mentre il thread lo sta ancora usando
+
+    def _deliver(self, pending, full_rescan):
+        """Classifica i percorsi in base allo stato attuale del disco e notifica il callback."""
+        updated = []; deleted = []
+        for path in pending:
+            if os.path.isfile(path): updated.append(path)
+            elif not os.path.exists(path): deleted.append(path)
+        if not (updated or deleted or full_rescan):
+            return # Es. file creato e rimosso nello stesso intervallo
+        try:
+            self.on_changes(updated, deleted, full_rescan)
+        except Exception as e:
+            print(f"Errore nel callback delle modifiche alla cartella shader: {e}")
+            traceback.print_exc()
+
+
+if __name__ == "__main__":
+    watch_folder = sys.argv[1] if len(sys.argv) > 1 else "."
+    watcher = ShaderFolderWatcher(watch_folder, ['.frag', '.glsl', '.fs', '.shader'],
+                                  lambda updated, deleted, rescan: print(f"Aggiornati: {updated}\nRimossi: {deleted}\nRiscansione: {rescan}"))
+    watcher.start()
+    try:
+        while True: time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
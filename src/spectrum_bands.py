@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SPECTRUM BANDS - Spettro a N bande configurabili (mel, log, ottave) per gli shader.
+Le bande si ottengono con un unico prodotto matrice-vettore tra un banco di filtri (calcolato una volta e
+tenuto in cache) e lo spettro di potenza del motore audio; seguono conversione in dB, auto-gain per banda e
+smoothing attack/release, tutto su buffer preallocati. Il risultato è disponibile come array float32 e come
+texture 1D a 8 bit, come le texture FFT di Bonzomatic. Eseguito come script misura il costo per numero di bande.
+"""
+
+import time
+import functools
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+SCALES = ('mel', 'log', 'octave')
+DEFAULT_BAND_COUNT = 32
+DEFAULT_SCALE = 'mel'
+DEFAULT_FREQ_RANGE = (30.0, 16000.0)
+DEFAULT_ATTACK_SECONDS = 0.01 # Costante di tempo in salita (reattivo ai transienti)
+DEFAULT_RELEASE_SECONDS = 0.25 # Costante di tempo in discesa
+DEFAULT_GAIN_RELEASE_SECONDS = 10.0 # Decadimento del picco usato dall'auto-gain
+DEFAULT_LEVEL_FLOOR_DB = -60.0
+MIN_GAIN_PEAK = 0.1 # Limita l'amplificazione del silenzio
+POWER_EPSILON = 1e-12
+
+
+def _hz_to_mel(freq):
+    return 2595.0 * np.log10(1.0 + np.asarray(freq, dtype=np.float64) / 700.0)
+
+
+def _mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel, dtype=np.float64) / 2595.0) - 1.0)
+
+
+@functools.lru_cache(maxsize=16)
+def build_filterbank(scale, band_count, window_size, sample_rate, freq_range=DEFAULT_FREQ_RANGE):
+    """
+    Matrice (band_count x bin) in sola lettura. 'mel' e 'log': filtri triangolari equispaziati sulla scala;
+    'octave': bande rettangolari a frazioni d'ottava uguali. Ogni banda ha almeno un bin con peso non nullo.
+    """
+    if scale not in SCALES:
+        raise ValueError(f"Scala spettro non supportata: {scale} (valide: {', '.join(SCALES)})")
+    bins = window_size // 2 + 1
+    freqs = np.fft.rfftfreq(window_size, 1.0 / sample_rate)
+    low, high = float(freq_range[0]), min(float(freq_range[1]), sample_rate / 2.0)
+    bank = np.zeros((band_count, bins))
+    if scale == 'octave':
+        edges = np.geomspace(low, high, band_count + 1)
+        for band in range(band_count):
+            bank[band] = (freqs >= edges[band]) & (freqs < edges[band + 1])
+        centers = np.sqrt(edges[:-1] * edges[1:])
+    else:
+        if scale == 'mel':
+            points = _mel_to_hz(np.linspace(_hz_to_mel(low), _hz_to_mel(high), band_count + 2))
+        else:
+            points = np.geomspace(low, high, band_count + 2)
+        for band in range(band_count):
+            left, center, right = points[band], points[band + 1], points[band + 2]
+            rising = (freqs - left) / (center - left)
+            falling = (right - freqs) / (right - center)
+            bank[band] = np.maximum(0.0, np.minimum(rising, falling))
+        centers = points[1:-1]
+    empty = bank.sum(axis=1) == 0
+    if empty.any(): # Bande più strette di un bin: peso 1 sul bin più vicino al centro
+        bank[np.where(empty)[0], np.abs(freqs[None, :] - centers[empty][:, None]).argmin(axis=1)] = 1.0
+    bank.setflags(write=False)
+    return bank
+
+
+class SpectrumBands:
+    """
+    Listener per frame di AudioAnalysisEngine (add_frame_listener). 'values' contiene le bande 0..1 correnti
+    (doppio buffer, scambio atomico del riferimento); texture() le restituisce come byte 0..255.
+    """
+
+    def __init__(self, sample_rate, window_size, hop_size, band_count=DEFAULT_BAND_COUNT, scale=DEFAULT_SCALE,
+                 freq_range=DEFAULT_FREQ_RANGE, attack_seconds=DEFAULT_ATTACK_SECONDS, release_seconds=DEFAULT_RELEASE_SECONDS,
+                 auto_gain=True, gain_release_seconds=DEFAULT_GAIN_RELEASE_SECONDS, level_floor_db=DEFAULT_LEVEL_FLOOR_DB):
+        self.band_count = int(band_count)
+        self.scale = scale
+        self.filterbank = build_filterbank(scale, self.band_count, int(window_size), float(sample_rate), tuple(freq_range))
+        frame_rate = sample_rate / hop_size
+        coefficient = lambda seconds: 1.0 - np.exp(-1.0 / max(seconds * frame_rate, 1e-6))
+        self.attack = coefficient(attack_seconds)
+        self.release = coefficient(release_seconds)
+        self.gain_decay = np.exp(-1.0 / max(gain_release_seconds * frame_rate, 1e-6))
+        self.auto_gain = auto_gain
+        self.level_scale = 10.0 / -level_floor_db
+
+        size = self.band_count
+        self.energy = np.zeros(size)
+        self.levels = np.zeros(size)
+        self.peaks = np.full(size, MIN_GAIN_PEAK)
+        self.smoothed = np.zeros(size)
+        self.rising = np.zeros(size, dtype=bool)
+        self.coefficients = np.zeros(size)
+        self.published = [np.zeros(size, dtype=np.float32) for _ in range(2)]
+        self.back_index = 0
+        self.values = self.published[1]
+        self.texture_scratch = np.zeros(size, dtype=np.float32)
+        self.texture_buffer = np.zeros(size, dtype=np.uint8)
+        self.stats = {'frames': 0, 'seconds': 0.0}
+
+    def __call__(self, engine, end):
+        self.process_power(engine.power)
+
+    def process_power(self, power):
+        """Bande dallo spettro di potenza normalizzato del frame (nessuna allocazione di array)."""
+        start = time.perf_counter()
+        levels = self.levels
+        np.matmul(self.filterbank, power, out=self.energy) # Tutte le bande in un solo prodotto
+        np.maximum(self.energy, POWER_EPSILON, out=levels)
+        np.log10(levels, out=levels)
+        levels *= self.level_scale
+        levels += 1.0
+        np.clip(levels, 0.0, 1.0, out=levels)
+        if self.auto_gain:
+            self.peaks *= self.gain_decay
+            np.maximum(self.peaks, levels, out=self.peaks)
+            np.maximum(self.peaks, MIN_GAIN_PEAK, out=self.peaks)
+            np.divide(levels, self.peaks, out=levels)
+        np.greater(levels, self.smoothed, out=self.rising)
+        self.coefficients.fill(self.release)
+        np.copyto(self.coefficients, self.attack, where=self.rising)
+        np.subtract(levels, self.smoothed, out=levels)
+        levels *= self.coefficients
+        self.smoothed += levels
+        values = self.published[self.back_index]
+        np.copyto(values, self.smoothed, casting='same_kind')
+        self.values = values # Scambio atomico del riferimento
+        self.back_index ^= 1
+        self.stats['frames'] += 1; self.stats['seconds'] += time.perf_counter() - start
+
+    def texture(self):
+        """Bande correnti come texture 1D a 8 bit (buffer riusato)."""
+        np.multiply(self.values, 255.0, out=self.texture_scratch)
+        np.rint(self.texture_scratch, out=self.texture_scratch)
+        np.copyto(self.texture_buffer, self.texture_scratch, casting='unsafe')
+        return self.texture_buffer
+
+    def format_stats(self):
+        return f"{self.band_count} bande {self.scale}: {self.stats['seconds'] / max(1, self.stats['frames']) * 1e6:.1f} us/frame"
+
+
+def create_spectrum_bands(engine, **kwargs):
+    """SpectrumBands configurato sul motore e registrato come listener per frame."""
+    spectrum = SpectrumBands(engine.sample_rate, engine.window_size, engine.hop_size, **kwargs)
+    engine.add_frame_listener(spectrum)
+    return spectrum
+
+
+# --- BENCHMARK ---
+def run_benchmark(frames=2000, window_size=2048, sample_rate=44100, hop_size=1024):
+    """Costo per frame al variare del numero di bande e della scala (spettro casuale)."""
+    rng = np.random.default_rng(0)
+    spectra = rng.random((64, window_size // 2 + 1)) ** 4
+    print(f"Spettro a bande: {frames} frame, finestra {window_size}")
+    for scale in SCALES:
+        timings = []
+        for band_count in (4, 16, 32, 64, 128):
+            spectrum = SpectrumBands(sample_rate, window_size, hop_size, band_count=band_count, scale=scale)
+            for i in range(50): spectrum.process_power(spectra[i % 64]) # Riscaldamento
+            start = time.perf_counter()
+            for i in range(frames): spectrum.process_power(spectra[i % 64])
+            timings.append(f"{band_count:>3}: {(time.perf_counter() - start) / frames * 1e6:5.1f} us")
+        print(f"  {scale:<6} " + ", ".join(timings))
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TEMPO TRACKER - Stima automatica del BPM e della fase dei beat (Auto BPM).
+A ogni frame del motore di analisi calcola il flusso spettrale (differenza positiva dello spettro compresso in log)
+e lo accoda a un inviluppo di onset. Periodicamente l'autocorrelazione dell'inviluppo (via FFT) viene valutata
+con un filtro a pettine sulle armoniche del periodo, limitato a bpm_range, e la fase dei beat viene stimata con
+un pettine sugli onset recenti. Eseguito come script valuta accuratezza e costo su tracce di click generate.
+"""
+
+import sys
+import math
+import time
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DEFAULT_BPM_RANGE = (60.0, 200.0)
+DEFAULT_WINDOW_SECONDS = 8.0 # Inviluppo di onset usato per la stima del tempo
+DEFAULT_UPDATE_SECONDS = 0.5 # Intervallo tra due stime del tempo
+DEFAULT_MIN_SECONDS = 3.0 # Inviluppo minimo prima della prima stima
+BPM_GRID_STEP = 0.25 # Risoluzione della griglia di BPM candidati
+COMB_HARMONICS = 4 # Multipli del periodo sommati dal pettine
+HALF_LAG_PENALTY = 0.5 # Penalità se anche il mezzo periodo è forte (candidato a metà tempo)
+PRIOR_CENTER_BPM = 120.0
+PRIOR_WIDTH_OCTAVES = 1.5 # Preferenza debole per tempi attorno a PRIOR_CENTER_BPM
+FLUX_COMPRESSION = 100.0 # log(1 + C * |X|): rende il flusso meno dipendente dal volume
+TEMPO_CHANGE_RATIO = 0.08 # Variazione oltre la quale una nuova stima deve ripetersi prima di essere accettata
+TEMPO_CHANGE_CONFIRMATIONS = 2
+
+
+class TempoTracker:
+    """
+    Analizzatore per frame da registrare con AudioAnalysisEngine.add_frame_listener. Valori pubblicati: bpm
+    (0 finché non c'è una stima), confidence, beat_count (incrementato a ogni beat previsto) e last_beat_time
+    / next_beat_time in secondi di stream (campioni / sample rate).
+    """
+
+    def __init__(self, sample_rate, hop_size, bins, bpm_range=DEFAULT_BPM_RANGE, window_seconds=DEFAULT_WINDOW_SECONDS,
+                 update_seconds=DEFAULT_UPDATE_SECONDS, min_seconds=DEFAULT_MIN_SECONDS, smoothing=0.2, latency_seconds=0.0):
+        self.sample_rate = float(sample_rate)
+        self.hop_size = int(hop_size)
+        self.frame_rate = self.sample_rate / self.hop_size
+        self.smoothing = smoothing
+        self.latency_seconds = latency_seconds # Ritardo tra un onset e il frame in cui il flusso è massimo
+        self.bpm_range = (float(min(bpm_range)), float(max(bpm_range)))
+
+        # Flusso spettrale: buffer riusati a ogni frame
+        self.log_magnitude = np.zeros(bins)
+        self.previous_log_magnitude = np.zeros(bins)
+        self.flux = np.zeros(bins)
+        self.envelope_size = int(round(window_seconds * self.frame_rate))
+        self.envelope = np.zeros(self.envelope_size) # Ring: l'ultimo valore è in (frames - 1) % size
+        self.frames = 0
+        self.update_frames = max(1, int(round(update_seconds * self.frame_rate)))
+        self.min_frames = int(round(min_seconds * self.frame_rate))
+
+        # Griglia dei candidati: periodi (in frame) e indici di interpolazione per le armoniche, calcolati una volta
+        self.bpm_grid = np.arange(self.bpm_range[0], self.bpm_range[1] + BPM_GRID_STEP / 2, BPM_GRID_STEP)
+        self.periods = 60.0 * self.frame_rate / self.bpm_grid
+        harmonics = np.arange(1, COMB_HARMONICS + 1)
+        self.harmonic_lags = self.periods[:, None] * harmonics[None, :]
+        self.harmonic_valid = self.harmonic_lags < self.envelope_size - 1
+        self.half_lags = self.periods / 2.0
+        self.prior = np.exp(-0.5 * (np.log2(self.bpm_grid / PRIOR_CENTER_BPM) / PRIOR_WIDTH_OCTAVES) ** 2)
+        self.fft_size = 1 << int(math.ceil(math.log2(2 * self.envelope_size)))
+        self.unbiased = 1.0 / np.maximum(1, self.envelope_size - np.arange(self.envelope_size)) # Correzione per lag lunghi
+
+        self.bpm = 0.0
+        self.period = 0.0 # Periodo corrente in frame
+        self.confidence = 0.0
+        self.pending_bpm = 0.0; self.pending_count = 0
+        self.next_beat_frame = None
+        self.last_beat_frame = None
+        self.beat_count = 0
+        self.stats = {'estimates': 0, 'estimate_seconds': 0.0, 'frame_seconds': 0.0}
+
+    # --- Per frame ---
+    def __call__(self, engine, end):
+        self.process_magnitude(engine.magnitude)
+
+    def process_magnitude(self, magnitude):
+        """Accoda il flusso spettrale del frame e, ogni update_frames, aggiorna tempo e fase."""
+        start = time.perf_counter()
+        np.multiply(magnitude, FLUX_COMPRESSION, out=self.log_magnitude)
+        np.log1p(self.log_magnitude, out=self.log_magnitude)
+        np.subtract(self.log_magnitude, self.previous_log_magnitude, out=self.flux)
+        np.maximum(self.flux, 0.0, out=self.flux)
+        value = float(self.flux.sum()) if self.frames else 0.0 # Il primo frame non ha un precedente
+        self.log_magnitude, self.previous_log_magnitude = self.previous_log_magnitude, self.log_magnitude
+        self.envelope[self.frames % self.envelope_size] = value
+        self.frames += 1
+        self.stats['frame_seconds'] += time.perf_counter() - start
+
+        if self.frames >= self.min_frames and self.frames % self.update_frames == 0:
+            self.estimate()
+        if self.next_beat_frame is not None and self.frames >= self.next_beat_frame:
+            self.last_beat_frame = self.next_beat_frame
+            self.next_beat_frame += self.period
+            self.beat_count += 1
+
+    # --- Stima del tempo e della fase ---
+    def ordered_envelope(self):
+        """Inviluppo in ordine cronologico (gli ultimi min(frames, envelope_size) valori)."""
+        count = min(self.frames, self.envelope_size)
+        split = self.frames % self.envelope_size
+        ordered = np.concatenate((self.envelope[split:], self.envelope[:split])) if self.frames >= self.envelope_size else self.envelope[:split]
+        return ordered[-count:]
+
+    def tempo_scores(self, envelope):
+        """
+        Punteggio di ogni BPM candidato dall'autocorrelazione normalizzata dell'inviluppo, più la periodicità
+        (correlazione media sulle armoniche, 1 = inviluppo perfettamente periodico) usata come confidenza.
+        """
+        x = envelope - envelope.mean()
+        spectrum = np.fft.rfft(x, n=self.fft_size)
+        acf = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=self.fft_size)[:len(x)]
+        if acf[0] <= 0:
+            return None, None
+        acf = acf * self.unbiased[:len(x)] * len(x) / acf[0]
+        lag_index = np.arange(len(acf))
+        comb = np.where(self.harmonic_valid, np.interp(self.harmonic_lags, lag_index, acf), 0.0)
+        valid = np.maximum(1, self.harmonic_valid.sum(axis=1))
+        periodicity = comb.sum(axis=1) / valid
+        scores = periodicity - HALF_LAG_PENALTY * np.maximum(0.0, np.interp(self.half_lags, lag_index, acf))
+        return scores * self.prior, periodicity
+
+    def beat_phase(self, envelope, period):
+        """Frame (relativo alla fine dell'inviluppo) dell'ultimo beat: pettine sugli onset a passo 'period'."""
+        offsets = np.arange(int(math.ceil(period)))
+        beats = np.arange(int(len(envelope) // period))
+        positions = len(envelope) - 1 - offsets[:, None] - beats[None, :] * period
+        weights = np.exp(-beats / 4.0) # Onset recenti più importanti
+        scores = (np.interp(positions, np.arange(len(envelope)), envelope) * weights).sum(axis=1)
+        return int(offsets[int(np.argmax(scores))])
+
+    def estimate(self):
+        start = time.perf_counter()
+        envelope = self.ordered_envelope()
+        scores, periodicity = self.tempo_scores(envelope)
+        if scores is not None:
+            best = int(np.argmax(scores))
+            if 0 < best < len(scores) - 1: # Interpolazione parabolica del massimo
+                a, b, c = scores[best - 1], scores[best], scores[best + 1]
+                denominator = a - 2 * b + c
+                shift = 0.5 * (a - c) / denominator if denominator < 0 else 0.0
+            else:
+                shift = 0.0
+            estimate = float(self.bpm_grid[best] + shift * BPM_GRID_STEP)
+            self.confidence = float(max(0.0, min(1.0, periodicity[best])))
+            self._update_bpm(estimate)
+            self.period = 60.0 * self.frame_rate / self.bpm
+            last_beat = self.frames - 1 - self.beat_phase(envelope, self.period)
+            next_beat = last_beat + self.period
+            if self.next_beat_frame is None or abs(next_beat - self.next_beat_frame) > 0.5 * self.period:
+                self.next_beat_frame = next_beat # Riallineamento completo
+            else:
+                self.next_beat_frame += 0.5 * (next_beat - self.next_beat_frame) # Correzione graduale della fase
+            if self.last_beat_frame is not None and self.next_beat_frame - self.last_beat_frame < 0.5 * self.period:
+                self.next_beat_frame += self.period # Non ripetere un beat appena segnalato
+        self.stats['estimates'] += 1
+        self.stats['estimate_seconds'] += time.perf_counter() - start
+
+    def _update_bpm(self, estimate):
+        if self.bpm <= 0:
+            self.bpm = estimate; return
+        if abs(estimate - self.bpm) / self.bpm > TEMPO_CHANGE_RATIO:
+            if self.pending_bpm and abs(estimate - self.pending_bpm) / self.pending_bpm <= TEMPO_CHANGE_RATIO:
+                self.pending_count += 1
+            else:
+                self.pending_bpm = estimate; self.pending_count = 1
+            if self.pending_count >= TEMPO_CHANGE_CONFIRMATIONS:
+                self.bpm = estimate; self.pending_bpm = 0.0; self.pending_count = 0
+            return
+        self.pending_bpm = 0.0; self.pending_count = 0
+        self.bpm += self.smoothing * (estimate - self.bpm)
+
+    # --- Tempi in secondi di stream ---
+    def frame_time(self, frame):
+        """Istante (secondi di stream) di un onset rilevato al frame 'frame'."""
+        return (frame + 1) * self.hop_size / self.sample_rate - self.latency_seconds
+
+    @property
+    def last_beat_time(self):
+        return None if self.last_beat_frame is None else self.frame_time(self.last_beat_frame)
+
+    @property
+    def next_beat_time(self):
+        return None if self.next_beat_frame is None else self.frame_time(self.next_beat_frame)
+
+    def format_stats(self):
+        frames = max(1, self.frames); estimates = max(1, self.stats['estimates'])
+        return (f"flusso {self.stats['frame_seconds'] / frames * 1e6:.1f} us/frame, "
+                f"stima {self.stats['estimate_seconds'] / estimates * 1000:.2f} ms ({self.stats['estimates']} stime)")
+
+
+def create_tempo_tracker(engine, bpm_range=DEFAULT_BPM_RANGE, **kwargs):
+    """TempoTracker configurato sul motore (frame rate, bin, latenza della finestra) e registrato come listener."""
+    tracker = TempoTracker(engine.sample_rate, engine.hop_size, len(engine.magnitude), bpm_range=bpm_range,
+                           latency_seconds=engine.window_size / 2.0 / engine.sample_rate, **kwargs)
+    engine.add_frame_listener(tracker)
+    return tracker
+
+
+# --- VALUTAZIONE ---
+def beat_f_measure(detected, reference, tolerance=0.07):
+    """F-measure dei beat (tolleranza ±70 ms, come nella valutazione MIREX)."""
+    if not len(detected) or not len(reference):
+        return 0.0
+    detected = np.asarray(detected); matched = 0; used = np.zeros(len(detected), dtype=bool)
+    for beat in reference:
+        candidates = np.where(~used & (np.abs(detected - beat) <= tolerance))[0]
+        if len(candidates):
+            used[candidates[np.argmin(np.abs(detected[candidates] - beat))]] = True; matched += 1
+    precision = matched / len(detected); recall = matched / len(reference)
+    return 0.0 if matched == 0 else 2 * precision * recall / (precision + recall)
+
+
+def run_evaluation(seconds=20.0, skip_seconds=5.0):
+    """Tracce di click etichettate (con sweep e rumore): errore BPM, accuratezza 1/2 e F-measure dei beat."""
+    from audio_engine import AudioAnalysisEngine
+    from audio_sources import SyntheticAudioSource
+    test_set = [(bpm, offset, noise, sweep) for bpm, offset, noise, sweep in (
+        (65.0, 0.3, 0.0, None), (72.0, 0.1, 0.02, None), (84.0, 0.5, 0.05, (40.0, 8000.0)), (90.0, 0.0, 0.0, None),
+        (100.0, 0.25, 0.02, (60.0, 4000.0)), (110.0, 0.4, 0.05, None), (120.0, 0.0, 0.0, None), (124.0, 0.2, 0.1, (40.0, 8000.0)),
+        (128.0, 0.15, 0.02, None), (135.0, 0.35, 0.05, (100.0, 6000.0)), (140.0, 0.05, 0.0, None), (150.0, 0.45, 0.02, None),
+        (160.0, 0.2, 0.05, (40.0, 8000.0)), (174.0, 0.1, 0.02, None), (185.0, 0.3, 0.0, None), (196.0, 0.05, 0.05, None))]
+    acc1 = acc2 = 0; f_total = 0.0; errors = []; analysis_seconds = 0.0; tracker_seconds = 0.0; total_frames = 0
+    print(f"{'BPM':>6} {'stimato':>8} {'errore':>7} {'conf':>5} {'F beat':>7}")
+    for bpm, offset, noise, sweep in test_set:
+        source = SyntheticAudioSource(realtime=False, bpm=bpm, duration=seconds, offset=offset, noise_level=noise, sweep_range=sweep)
+        engine = AudioAnalysisEngine(sample_rate=source.sample_rate, hop_size=source.chunk_size)
+        tracker = create_tempo_tracker(engine)
+        detected = []; last_count = 0
+        for chunk in source.iter_chunks():
+            engine.feed(chunk); engine.process_available()
+            if tracker.beat_count != last_count:
+                last_count = tracker.beat_count; detected.append(tracker.last_beat_time)
+        analysis_seconds += engine.stats['total_seconds']; total_frames += engine.stats['frames']
+        tracker_seconds += tracker.stats['frame_seconds'] + tracker.stats['estimate_seconds']
+        error = (tracker.bpm - bpm) / bpm
+        ok1 = abs(error) <= 0.04
+        ok2 = ok1 or any(abs(tracker.bpm / (bpm * factor) - 1.0) <= 0.04 for factor in (0.5, 2.0, 1.0 / 3.0, 3.0))
+        reference = source.beat_times(seconds)
+        f_measure = beat_f_measure([t for t in detected if t >= skip_seconds], reference[reference >= skip_seconds])
+        acc1 += ok1; acc2 += ok2; f_total += f_measure; errors.append(abs(error))
+        print(f"{bpm:6.1f} {tracker.bpm:8.2f} {error * 100:6.2f}% {tracker.confidence:5.2f} {f_measure:7.3f}{'' if ok1 else '  (ottava)' if ok2 else '  (errata)'}")
+    count = len(test_set)
+    print(f"Accuratezza 1 (±4%): {acc1}/{count}, accuratezza 2 (anche ottave): {acc2}/{count}, "
+          f"errore mediano {np.median(errors) * 100:.2f}%, F-measure media {f_total / count:.3f}")
+    print(f"Costo: analisi {analysis_seconds / total_frames * 1000:.3f} ms/frame di cui tempo/fase "
+          f"{tracker_seconds / total_frames * 1000:.3f} ms/frame ({total_frames} frame)")
+
+
+if __name__ == "__main__":
+    run_evaluation(float(sys.argv[1]) if len(sys.argv) > 1 else 20.0)
@@ -184,6 +184,7 @@
                      </div>
                  </div>
                  <p id="gallery-status" class="status-label flex-shrink-0"></p>
+                 <button id="cancel-load-btn" class="btn btn-secondary hidden flex-shrink-0 mt-2">Annulla caricamento</button>
             </div>
         </div>
 
@@ -196,6 +197,11 @@
                     <div class="relative w-11 h-6 bg-gray-600 rounded-full peer peer-focus:ring-4 peer-focus:ring-blue-800 peer-checked:after:translate-x-full peer-checked:after:border-white after:content-[''] after:absolute after:top-0.5 after:start-[2px] after:bg-white after:border-gray-300 after:border after:rounded-full after:h-5 after:w-5 after:transition-all peer-checked:bg-blue-600"></div>
                     <span class="ml-3">Sempre in Primo Piano</span>
                 </label>
+                 <label class="switch-label ml-4">
+                    <input type="checkbox" id="worker-render-switch" class="sr-only peer">
+                    <div class="relative w-11 h-6 bg-gray-600 rounded-full peer peer-focus:ring-4 peer-focus:ring-blue-800 peer-checked:after:translate-x-full peer-checked:after:border-white after:content-[''] after:absolute after:top-0.5 after:start-[2px] after:bg-white after:border-gray-300 after:border after:rounded-full after:h-5 after:w-5 after:transition-all peer-checked:bg-blue-600"></div>
+                    <span class="ml-3">Render in Worker</span>
+                </label>
             </div>
             <div class="section-frame flex-grow flex flex-col min-h-0">
                 <h2 class="section-title">Console Effetti Live</h2>
@@ -257,39 +263,348 @@
     document.addEventListener('DOMContentLoaded', () => {
         // ... (Il resto dello script, completo e funzionante)
         class WebGLPlayer {
-            constructor(canvas) { this.canvas = canvas; this.gl = canvas.getContext('webgl', { preserveDrawingBuffer: true }); if (!this.gl) throw new Error("WebGL non supportato"); this.program = null; this.locations = {}; this.buffer = this.gl.createBuffer(); this.gl.bindBuffer(this.gl.ARRAY_BUFFER, this.buffer); this.gl.bufferData(this.gl.ARRAY_BUFFER, new Float32Array([-1, 1, 1, 1, -1, -1, 1, -1]), this.gl.STATIC_DRAW); this.vsSource = `attribute vec4 p; void main() { gl_Position = p; }`; }
-            compileShader(source, type) { const gl = this.gl; const shader = gl.createShader(type); gl.shaderSource(shader, source); gl.compileShader(shader); if (!gl.getShaderParameter(shader, gl.COMPILE_STATUS)) { console.error(`Errore compilazione shader: ${gl.getShaderInfoLog(shader)}`); gl.deleteShader(shader); return null; } return shader; }
-            createProgram(fsSource) {
-                const gl = this.gl; const adaptedFs = this.adaptShaderSource(fsSource); const vertexShader = this.compileShader(this.vsSource, gl.VERTEX_SHADER); const fragmentShader = this.compileShader(adaptedFs, gl.FRAGMENT_SHADER); if (!vertexShader || !fragmentShader) return false;
-                const shaderProgram = gl.createProgram(); gl.attachShader(shaderProgram, vertexShader); gl.attachShader(shaderProgram, fragmentShader); gl.linkProgram(shaderProgram);
-                if (!gl.getProgramParameter(shaderProgram, gl.LINK_STATUS)) { console.error(`Errore linking program: ${gl.getProgramInfoLog(shaderProgram)}`); return false; }
-                if (this.program) gl.deleteProgram(this.program); this.program = shaderProgram;
-                this.locations = {
-                    pos: gl.getAttribLocation(this.program, 'p'), res: gl.getUniformLocation(this.program, 'u_resolution'), time: gl.getUniformLocation(this.program, 'u_time'),
-                    zoom: gl.getUniformLocation(this.program, 'u_zoom'), pan: gl.getUniformLocation(this.program, 'u_pan'), rotation: gl.getUniformLocation(this.program, 'u_rotation'), distortion: gl.getUniformLocation(this.program, 'u_distortion'),
-                    opacity: gl.getUniformLocation(this.program, 'u_opacity'), chromaKey: gl.getUniformLocation(this.program, 'u_chromaKey'),
-                    audioLevel: gl.getUniformLocation(this.program, 'u_audioLevel'), bass: gl.getUniformLocation(this.program, 'u_bass'), beat: gl.getUniformLocation(this.program, 'u_beat'),
-                }; return true;
-            }
-            adaptShaderSource(source) { let header = `precision mediump float; uniform vec2 u_resolution; uniform float u_time; uniform float u_zoom; uniform vec2 u_pan; uniform float u_rotation; uniform float u_distortion; uniform float u_opacity; uniform vec2 u_chromaKey; uniform float u_audioLevel; uniform float u_bass; uniform float u_beat;`; let body = source.replace(/iResolution/g, 'u_resolution').replace(/iTime/g, 'u_time'); if (body.includes('mainImage')) { body = body.replace(/void\s+mainImage\s*\(\s*out\s+vec4\s+fragColor,\s*in\s+vec2\s+fragCoord\s*\)/g, 'vec4 userMain(vec2 fragCoord)'); body = `vec4 userMain(vec2 fragCoord); \n ${body} \n void main() { gl_FragColor = userMain(gl_FragCoord.xy);`; } else { const mainFuncRegex = /void\s+main\s*\(\s*\)/g; if (mainFuncRegex.test(body)) { body = body.replace(mainFuncRegex, 'void main_user()'); body += '\nvoid main() { main_user(); }'; } } return header + body; }
+            static UNIFORM_LAYOUT = [['time', 1], ['zoom', 1], ['pan', 2], ['rotation', 1], ['distortion', 1], ['opacity', 1], ['chromaKey', 2], ['audioLevel', 1], ['bass', 1], ['beat', 1]];
+            constructor(canvas) { this.canvas = canvas; this.gl = canvas.getContext('webgl', { preserveDrawingBuffer: true }); if (!this.gl) throw new Error("WebGL non supportato"); this.program = null; this.locations = {}; this.buffer = this.gl.createBuffer(); this.gl.bindBuffer(this.gl.ARRAY_BUFFER, this.buffer); this.gl.bufferData(this.gl.ARRAY_BUFFER, new Float32Array([-1, 1, 1, 1, -1, -1, 1, -1]), this.gl.STATIC_DRAW); this.vsSource = `attribute vec4 p; void main() { gl_Position = p; }`;
+                this.programCache = new Map(); this.maxCachedPrograms = 16; this.compileCount = 0; this.vertexShader = null; this.parallelCompile = this.gl.getExtension('KHR_parallel_shader_compile');
+                // Stato del render in cache: geometria in un VAO (o legata una volta sola), uniform in un blocco tipizzato con un bit "sporco" per uniform
+                this.vaoExtension = this.gl.getExtension('OES_vertex_array_object'); this.vao = null; this.geometryLocation = -1;
+                let offset = 0; this.uniformEntries = WebGLPlayer.UNIFORM_LAYOUT.map(([name, count], index) => { const entry = { name, count, offset, bit: 1 << index }; offset += count; return entry; });
+                this.uniformBlock = new Float32Array(offset); this.dirty = 0;
+                this.width = canvas.clientWidth || canvas.width; this.height = canvas.clientHeight || canvas.height; this.resizePending = true; // Canvas fuori dal DOM: dimensione fissa
+                this.resizeObserver = null;
+                if (canvas.isConnected && typeof ResizeObserver === 'function') { // Niente letture di clientWidth per frame
+                    this.resizeObserver = new ResizeObserver(entries => { const box = entries[entries.length - 1].contentRect; if (box.width && box.height) { this.width = Math.round(box.width); this.height = Math.round(box.height); this.resizePending = true; } });
+                    this.resizeObserver.observe(canvas);
+                }
+            }
+            // Programmi per hash del sorgente in LRU, compresi quelli falliti con il loro log: un sorgente già visto non viene ricompilato.
+            // La compilazione parte senza leggere lo stato; con KHR_parallel_shader_compile si attende COMPLETION_STATUS_KHR
+            // invece di bloccare su LINK_STATUS, senza l'estensione la lettura dello stato resta sincrona come prima
+            static sourceHash(source) {
+                let h1 = 0x811c9dc5, h2 = 0x01000193 ^ source.length;
+                for (let i = 0; i < source.length; i++) { const c = source.charCodeAt(i); h1 = Math.imul(h1 ^ c, 16777619); h2 = Math.imul(h2 ^ c, 2246822519); }
+                return (h1 >>> 0).toString(16).padStart(8, '0') + (h2 >>> 0).toString(16).padStart(8, '0') + source.length.toString(16);
+            }
+            requestProgram(fsSource, key = WebGLPlayer.sourceHash(fsSource)) { // Entry in cache, oppure compilazione avviata: { key, pending }
+                let entry = this.programCache.get(key);
+                if (entry) { this.programCache.delete(key); this.programCache.set(key, entry); return entry; }
+                const gl = this.gl;
+                if (!this.vertexShader) { this.vertexShader = gl.createShader(gl.VERTEX_SHADER); gl.shaderSource(this.vertexShader, this.vsSource); gl.compileShader(this.vertexShader); } // Condiviso da tutti i programmi
+                const fragmentShader = gl.createShader(gl.FRAGMENT_SHADER); gl.shaderSource(fragmentShader, this.adaptShaderSource(fsSource)); gl.compileShader(fragmentShader);
+                const program = gl.createProgram(); gl.attachShader(program, this.vertexShader); gl.attachShader(program, fragmentShader); gl.linkProgram(program);
+                entry = { key, pending: { program, fragmentShader } }; this.programCache.set(key, entry); this.compileCount++;
+                this.evictPrograms();
+                return entry;
+            }
+            programReady(entry) { return !entry.pending || !this.parallelCompile || this.gl.getProgramParameter(entry.pending.program, this.parallelCompile.COMPLETION_STATUS_KHR); }
+            resolveProgram(entry) { // Bloccante se la compilazione non è terminata: l'entry diventa { program, locations } oppure { error }
+                if (!entry.pending) return entry;
+                const gl = this.gl; const { program, fragmentShader } = entry.pending; delete entry.pending;
+                if (gl.getProgramParameter(program, gl.LINK_STATUS)) { gl.detachShader(program, fragmentShader); gl.deleteShader(fragmentShader); entry.program = program; entry.locations = this.programLocations(program); return entry; }
+                entry.error = (gl.getShaderParameter(fragmentShader, gl.COMPILE_STATUS) ? gl.getProgramInfoLog(program) : gl.getShaderInfoLog(fragmentShader)) || 'Errore di compilazione';
+                console.error(`Errore compilazione shader: ${entry.error}`); gl.deleteProgram(program); gl.deleteShader(fragmentShader);
+                return entry;
+            }
+            async prepareProgram(fsSource, key) { // Attende il driver un frame alla volta, senza bloccare il thread
+                const entry = this.requestProgram(fsSource, key);
+                while (!this.programReady(entry)) await new Promise(resolve => typeof requestAnimationFrame === 'function' ? requestAnimationFrame(resolve) : setTimeout(resolve, 16));
+                return this.resolveProgram(entry);
+            }
+            evictPrograms() { // Mai le compilazioni in corso né il programma installato
+                for (const [key, entry] of this.programCache) {
+                    if (this.programCache.size <= this.maxCachedPrograms) break;
+                    if (entry.pending || (entry.program && entry.program === this.program)) continue;
+                    this.programCache.delete(key); if (entry.program) this.gl.deleteProgram(entry.program);
+                }
+            }
+            programLocations(shaderProgram) {
+                const gl = this.gl;
+                return {
+                    pos: gl.getAttribLocation(shaderProgram, 'p'), res: gl.getUniformLocation(shaderProgram, 'u_resolution'), time: gl.getUniformLocation(shaderProgram, 'u_time'),
+                    zoom: gl.getUniformLocation(shaderProgram, 'u_zoom'), pan: gl.getUniformLocation(shaderProgram, 'u_pan'), rotation: gl.getUniformLocation(shaderProgram, 'u_rotation'), distortion: gl.getUniformLocation(shaderProgram, 'u_distortion'),
+                    opacity: gl.getUniformLocation(shaderProgram, 'u_opacity'), chromaKey: gl.getUniformLocation(shaderProgram, 'u_chromaKey'),
+                    audioLevel: gl.getUniformLocation(shaderProgram, 'u_audioLevel'), bass: gl.getUniformLocation(shaderProgram, 'u_bass'), beat: gl.getUniformLocation(shaderProgram, 'u_beat'),
+                };
+            }
+            buildProgram(fsSource, key) { const entry = this.resolveProgram(this.requestProgram(fsSource, key)); if (entry.error) { this.lastError = entry.error; return null; } return entry; }
+            useProgramEntry(entry) {
+                this.resolveProgram(entry);
+                if (entry.error) { this.lastError = entry.error; return false; }
+                if (entry.program !== this.program) { this.program = entry.program; this.locations = entry.locations; this.installProgram(); }
+                return true;
+            }
+            createProgram(fsSource) { return this.useProgramEntry(this.requestProgram(fsSource)); }
+            installProgram() { // Stato impostato una volta per programma invece che a ogni frame
+                const gl = this.gl; gl.useProgram(this.program); this.bindGeometry(this.locations.pos);
+                this.dirty = (1 << this.uniformEntries.length) - 1; this.resizePending = true;
+            }
+            bindGeometry(location) {
+                if (location === this.geometryLocation || location < 0) return;
+                const gl = this.gl;
+                if (this.vaoExtension) { if (!this.vao) this.vao = this.vaoExtension.createVertexArrayOES(); this.vaoExtension.bindVertexArrayOES(this.vao); }
+                if (this.geometryLocation >= 0) gl.disableVertexAttribArray(this.geometryLocation);
+                gl.bindBuffer(gl.ARRAY_BUFFER, this.buffer); gl.vertexAttribPointer(location, 2, gl.FLOAT, false, 0, 0); gl.enableVertexAttribArray(location);
+                this.geometryLocation = location;
+            }
+            setUniforms(uniforms) {
+                const block = this.uniformBlock;
+                for (const entry of this.uniformEntries) {
+                    const value = uniforms[entry.name]; if (value === undefined) continue;
+                    if (entry.count === 1) { if (block[entry.offset] !== Math.fround(value)) { block[entry.offset] = value; this.dirty |= entry.bit; } }
+                    else for (let i = 0; i < entry.count; i++) { if (block[entry.offset + i] !== Math.fround(value[i])) { block[entry.offset + i] = value[i]; this.dirty |= entry.bit; } }
+                }
+            }
+            adaptShaderSource(source) { let header = `precision mediump float; uniform vec2 u_resolution; uniform float u_time; uniform float u_zoom; uniform vec2 u_pan; uniform float u_rotation; uniform float u_distortion; uniform float u_opacity; uniform vec2 u_chromaKey; uniform float u_audioLevel; uniform float u_bass; uniform float u_beat;`; let body = source.replace(/iResolution/g, 'u_resolution').replace(/iTime/g, 'u_time'); if (/void\s+mainImage\s*\(/.test(body)) { body += '\nvoid main() { vec4 color = vec4(0.0, 0.0, 0.0, 1.0); mainImage(color, gl_FragCoord.xy); gl_FragColor = color; }'; } else { const mainFuncRegex = /void\s+main\s*\(\s*\)/g; if (mainFuncRegex.test(body)) { body = body.replace(mainFuncRegex, 'void main_user()'); body += '\nvoid main() { main_user(); }'; } } return header + body; }
+            // Per frame: solo gli uniform cambiati e il draw. Il contesto appartiene al player: programma e geometria restano legati
             render(uniforms) {
                 if (!this.program) return;
-                const gl = this.gl; const canvas = this.canvas;
-                const displayWidth = canvas.clientWidth; const displayHeight = canvas.clientHeight; if (canvas.width !== displayWidth || canvas.height !== displayHeight) { canvas.width = displayWidth; canvas.height = displayHeight; }
-                gl.viewport(0, 0, gl.canvas.width, gl.canvas.height); gl.clearColor(0,0,0,1); gl.clear(gl.COLOR_BUFFER_BIT); gl.useProgram(this.program); gl.bindBuffer(gl.ARRAY_BUFFER, this.buffer);
-                gl.vertexAttribPointer(this.locations.pos, 2, gl.FLOAT, false, 0, 0); gl.enableVertexAttribArray(this.locations.pos);
-                gl.uniform2f(this.locations.res, gl.canvas.width, gl.canvas.height);
-                for (const [key, value] of Object.entries(uniforms)) {
-                    const loc = this.locations[key];
-                    if (loc) {
-                        if (Array.isArray(value)) gl.uniform2fv(loc, value);
-                        else gl.uniform1f(loc, value);
+                const gl = this.gl;
+                if (uniforms) this.setUniforms(uniforms);
+                if (this.resizePending) {
+                    const canvas = this.canvas; if (canvas.width !== this.width || canvas.height !== this.height) { canvas.width = this.width; canvas.height = this.height; }
+                    gl.viewport(0, 0, this.width, this.height); if (this.locations.res) gl.uniform2f(this.locations.res, this.width, this.height); this.resizePending = false;
+                }
+                if (this.dirty) {
+                    const block = this.uniformBlock;
+                    for (const entry of this.uniformEntries) {
+                        const loc = (this.dirty & entry.bit) && this.locations[entry.name]; if (!loc) continue;
+                        if (entry.count === 1) gl.uniform1f(loc, block[entry.offset]); else gl.uniform2f(loc, block[entry.offset], block[entry.offset + 1]);
                     }
+                    this.dirty = 0;
                 }
-                gl.drawArrays(gl.TRIANGLE_STRIP, 0, 4);
+                gl.drawArrays(gl.TRIANGLE_STRIP, 0, 4); // Il quad copre tutto il viewport: nessun clear necessario
             }
         }
-        
+
+        const THUMBNAIL_WIDTH = 160, THUMBNAIL_HEIGHT = 90;
+        const THUMBNAIL_UNIFORMS = { time: 5.0, zoom: 1, pan: [0,0], rotation: 0, distortion: 0, opacity: 1.0, chromaKey: [0,0], audioLevel: 0, bass: 0, beat: 0 };
+
+        async function hashShaderSource(source) {
+            if (window.crypto && crypto.subtle) {
+                const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(source));
+                return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+            }
+            // Contesto non sicuro (senza crypto.subtle): due FNV-1a a 32 bit con semi diversi più la lunghezza
+            let h1 = 0x811c9dc5, h2 = 0x01000193 ^ source.length;
+            for (let i = 0; i < source.length; i++) { const c = source.charCodeAt(i); h1 = Math.imul(h1 ^ c, 16777619); h2 = Math.imul(h2 ^ c, 2246822519); }
+            return (h1 >>> 0).toString(16).padStart(8, '0') + (h2 >>> 0).toString(16).padStart(8, '0') + source.length.toString(16);
+        }
+
+        const idbRequest = (request) => new Promise((resolve, reject) => { request.onsuccess = () => resolve(request.result); request.onerror = () => reject(request.error); });
+        const idbDone = (transaction) => new Promise((resolve, reject) => { transaction.oncomplete = () => resolve(); transaction.onerror = transaction.onabort = () => reject(transaction.error); });
+
+        // Cache persistente delle miniature per hash del sorgente. Le tile sono impaccate in pagine-atlante
+        // (un'immagine per pagina) salvate in IndexedDB con un indice hash -> pagina/slot; in memoria restano
+        // l'indice e al massimo maxMemoryPages pagine decodificate (LRU). Anche gli errori di compilazione sono in cache.
+        class ThumbnailAtlasCache {
+            constructor({ tileWidth = THUMBNAIL_WIDTH, tileHeight = THUMBNAIL_HEIGHT, columns = 8, rows = 8, maxMemoryPages = 6, maxStoredPages = 64, dbName = 'shader-bridge-thumbnails' } = {}) {
+                Object.assign(this, { tileWidth, tileHeight, columns, rows, maxMemoryPages, maxStoredPages, dbName });
+                this.slotsPerPage = columns * rows;
+                this.db = null;
+                this.entries = new Map(); // hash -> { hash, page, slot, error }
+                this.pageRecords = new Map(); // id -> { id, blob, used, lastUsed } (lastUsed salvato a parte in 'meta')
+                this.bitmaps = new Map(); // id -> ImageBitmap decodificata, in ordine LRU (la più recente in fondo)
+                this.decoding = new Map(); // id -> Promise di decodifica in corso
+                this.writePage = null; // Pagina in scrittura: { id, canvas, ctx, used }
+                this.pendingEntries = []; this.flushTimer = null; this.writeQueue = Promise.resolve();
+                this.stats = { hits: 0, misses: 0, errors: 0 };
+                this.ready = this.open();
+            }
+            async open() {
+                if (!window.indexedDB) return; // Solo memoria
+                try {
+                    const request = indexedDB.open(this.dbName, 1);
+                    request.onupgradeneeded = () => { const db = request.result; db.createObjectStore('tiles', { keyPath: 'hash' }); db.createObjectStore('pages', { keyPath: 'id' }); db.createObjectStore('meta'); };
+                    this.db = await idbRequest(request);
+                    const transaction = this.db.transaction(['tiles', 'pages', 'meta'], 'readonly');
+                    const [tiles, pages, usage] = await Promise.all([idbRequest(transaction.objectStore('tiles').getAll()), idbRequest(transaction.objectStore('pages').getAll()), idbRequest(transaction.objectStore('meta').get('usage'))]);
+                    for (const page of pages) this.pageRecords.set(page.id, Object.assign(page, { lastUsed: (usage && usage[page.id]) || 0 }));
+                    for (const tile of tiles) if (tile.page === null || this.pageRecords.has(tile.page)) this.entries.set(tile.hash, tile);
+                } catch (e) { console.warn(`Cache miniature non persistente: ${e}`); this.db = null; }
+            }
+            get(hash) { return this.entries.get(hash) || null; }
+            slotPosition(slot) { return [(slot % this.columns) * this.tileWidth, Math.floor(slot / this.columns) * this.tileHeight]; }
+            async pageBitmap(id) {
+                const bitmap = this.bitmaps.get(id);
+                if (bitmap) { this.bitmaps.delete(id); this.bitmaps.set(id, bitmap); return bitmap; }
+                if (this.decoding.has(id)) return this.decoding.get(id);
+                const record = this.pageRecords.get(id); if (!record || !record.blob) return null;
+                const decode = createImageBitmap(record.blob).then(decoded => {
+                    this.decoding.delete(id); this.bitmaps.set(id, decoded);
+                    while (this.bitmaps.size > this.maxMemoryPages) { const [oldId, old] = this.bitmaps.entries().next().value; this.bitmaps.delete(oldId); old.close(); }
+                    return decoded;
+                }, e => { this.decoding.delete(id); console.warn(`Pagina miniature ${id} illeggibile: ${e}`); return null; });
+                this.decoding.set(id, decode);
+                return decode;
+            }
+            // Disegna la tile di 'hash' nel contesto 2D; false se non in cache
+            async draw(hash, ctx) {
+                await this.ready;
+                const entry = this.entries.get(hash);
+                if (!entry || entry.page === null) { this.stats.misses++; return false; }
+                const source = this.writePage && this.writePage.id === entry.page ? this.writePage.canvas : await this.pageBitmap(entry.page);
+                if (!source) { this.stats.misses++; return false; }
+                const [x, y] = this.slotPosition(entry.slot);
+                ctx.drawImage(source, x, y, this.tileWidth, this.tileHeight, 0, 0, ctx.canvas.width, ctx.canvas.height);
+                const record = this.pageRecords.get(entry.page); if (record) record.lastUsed = Date.now();
+                this.stats.hits++; return true;
+            }
+            async writablePage() {
+                if (this.writePage && this.writePage.used < this.slotsPerPage) return this.writePage;
+                if (this.writePage) await this.flush();
+                const canvas = document.createElement('canvas'); canvas.width = this.columns * this.tileWidth; canvas.height = this.rows * this.tileHeight;
+                const ctx = canvas.getContext('2d');
+                const last = [...this.pageRecords.values()].reduce((a, b) => (!a || b.id > a.id ? b : a), null);
+                if (last && last.used < this.slotsPerPage) { // Riprende l'ultima pagina non piena
+                    const bitmap = await this.pageBitmap(last.id);
+                    if (bitmap) { ctx.drawImage(bitmap, 0, 0); this.writePage = { id: last.id, canvas, ctx, used: last.used }; return this.writePage; }
+                }
+                const id = last ? last.id + 1 : 1;
+                this.pageRecords.set(id, { id, blob: null, used: 0, lastUsed: Date.now() });
+                this.writePage = { id, canvas, ctx, used: 0 };
+                await this.evictStoredPages();
+                return this.writePage;
+            }
+            // 'image' deve restare invariato fino alla fine della scrittura (es. il canvas 2D della miniatura)
+            put(hash, image) {
+                const task = this.writeQueue.then(() => this.writeTile(hash, image));
+                this.writeQueue = task.catch(() => {}); // Scritture in serie: niente pagine create due volte
+                return task;
+            }
+            async writeTile(hash, image) {
+                await this.ready;
+                const page = await this.writablePage();
+                const slot = page.used++;
+                const [x, y] = this.slotPosition(slot);
+                page.ctx.clearRect(x, y, this.tileWidth, this.tileHeight);
+                page.ctx.drawImage(image, 0, 0, image.width, image.height, x, y, this.tileWidth, this.tileHeight);
+                const entry = { hash, page: page.id, slot, error: null };
+                this.entries.set(hash, entry); this.pendingEntries.push(entry);
+                this.scheduleFlush();
+                return entry;
+            }
+            async putError(hash, log) {
+                await this.ready;
+                const entry = { hash, page: null, slot: -1, error: log || 'Errore di compilazione' };
+                this.entries.set(hash, entry); this.pendingEntries.push(entry); this.stats.errors++;
+                this.scheduleFlush();
+                return entry;
+            }
+            scheduleFlush() { clearTimeout(this.flushTimer); this.flushTimer = setTimeout(() => this.flush(), 500); } // Una scrittura per raffica di miniature
+            // Salva la pagina in scrittura e le voci nuove nella stessa transazione: l'indice non punta mai a pagine non salvate
+            async flush() {
+                clearTimeout(this.flushTimer); this.flushTimer = null;
+                const page = this.writePage;
+                const used = page ? page.used : 0; // Letto prima di toBlob, che copia il canvas in questo istante: tile scritte durante l'attesa restano alla prossima scrittura
+                const entries = this.pendingEntries.filter(entry => !page || entry.page !== page.id || entry.slot < used);
+                this.pendingEntries = this.pendingEntries.filter(entry => !entries.includes(entry));
+                let record = null;
+                if (page) {
+                    const blob = await new Promise(resolve => page.canvas.toBlob(resolve, 'image/webp', 0.9));
+                    const current = this.pageRecords.get(page.id);
+                    if (!current || !current.blob || current.used <= used) { // Un salvataggio più recente della stessa pagina non viene sovrascritto
+                        record = Object.assign(current || { id: page.id, lastUsed: Date.now() }, { blob, used });
+                        this.pageRecords.set(page.id, record);
+                        const stale = this.bitmaps.get(page.id); if (stale) { this.bitmaps.delete(page.id); stale.close(); }
+                    }
+                    if (used >= this.slotsPerPage && this.writePage === page) this.writePage = null; // Solo se la pagina salvata è completa
+                    if (this.pendingEntries.length) this.scheduleFlush();
+                }
+                if (!this.db || (!record && entries.length === 0)) return;
+                try {
+                    const transaction = this.db.transaction(['tiles', 'pages', 'meta'], 'readwrite');
+                    if (record) transaction.objectStore('pages').put({ id: record.id, blob: record.blob, used: record.used });
+                    for (const entry of entries) transaction.objectStore('tiles').put(entry);
+                    transaction.objectStore('meta').put(Object.fromEntries([...this.pageRecords.values()].map(p => [p.id, p.lastUsed])), 'usage');
+                    await idbDone(transaction);
+                } catch (e) { console.warn(`Salvataggio cache miniature fallito: ${e}`); }
+            }
+            // LRU su disco: oltre maxStoredPages elimina la pagina usata meno di recente e le sue voci
+            async evictStoredPages() {
+                while (this.pageRecords.size > this.maxStoredPages) {
+                    const victim = [...this.pageRecords.values()].filter(p => !this.writePage || p.id !== this.writePage.id).reduce((a, b) => (!a || b.lastUsed < a.lastUsed ? b : a), null);
+                    if (!victim) return;
+                    this.pageRecords.delete(victim.id);
+                    const bitmap = this.bitmaps.get(victim.id); if (bitmap) { this.bitmaps.delete(victim.id); bitmap.close(); }
+                    const removed = [...this.entries.values()].filter(entry => entry.page === victim.id);
+                    removed.forEach(entry => this.entries.delete(entry.hash));
+                    if (!this.db) continue;
+                    try {
+                        const transaction = this.db.transaction(['tiles', 'pages'], 'readwrite');
+                        transaction.objectStore('pages').delete(victim.id);
+                        for (const entry of removed) transaction.objectStore('tiles').delete(entry.hash);
+                        await idbDone(transaction);
+                    } catch (e) { console.warn(`Pulizia cache miniature fallita: ${e}`); }
+                }
+            }
+        }
+
+        const thumbnailCache = new ThumbnailAtlasCache();
+        // Renderer unico della galleria: un solo contesto WebGL fuori dal DOM, ogni programma compilato una volta
+        // (LRU di maxPrograms), ogni miniatura disegnata nel canvas condiviso grande quanto una tile (viewport
+        // all'origine, cosi' gl_FragCoord/u_resolution resta in 0..1) e copiata subito nel canvas 2D della tile,
+        // prima del disegno successivo. Le richieste sono smaltite a ogni frame entro un budget di tempo e di
+        // disegni; l'anteprima animata al passaggio del mouse ridisegna solo la tile sotto il puntatore.
+        class GalleryRenderer {
+            constructor({ tileWidth = THUMBNAIL_WIDTH, tileHeight = THUMBNAIL_HEIGHT, drawsPerFrame = 15, maxPrograms = 48, frameBudgetMs = 8 } = {}) {
+                Object.assign(this, { tileWidth, tileHeight, drawsPerFrame, maxPrograms, frameBudgetMs });
+                this.canvas = document.createElement('canvas'); this.canvas.width = tileWidth; this.canvas.height = tileHeight;
+                this.player = new WebGLPlayer(this.canvas); this.gl = this.player.gl;
+                this.player.maxCachedPrograms = maxPrograms; // Programmi nella cache del player, per hash del sorgente
+                this.queue = []; this.frameScheduled = false;
+                this.hover = null; // { hash, code, ctx, start }
+                this.stats = { drawn: 0 };
+            }
+            // Disegna la tile e la copia subito in ctx: il canvas condiviso viene riusato dal disegno successivo
+            drawTile(entry, uniforms, ctx) {
+                const gl = this.gl;
+                gl.viewport(0, 0, this.tileWidth, this.tileHeight);
+                gl.clearColor(0,0,0,1); gl.clear(gl.COLOR_BUFFER_BIT); gl.useProgram(entry.program); gl.bindBuffer(gl.ARRAY_BUFFER, this.player.buffer);
+                gl.vertexAttribPointer(entry.locations.pos, 2, gl.FLOAT, false, 0, 0); gl.enableVertexAttribArray(entry.locations.pos);
+                gl.uniform2f(entry.locations.res, this.tileWidth, this.tileHeight);
+                for (const [key, value] of Object.entries(uniforms)) {
+                    const loc = entry.locations[key];
+                    if (loc) { if (Array.isArray(value)) gl.uniform2fv(loc, value); else gl.uniform1f(loc, value); }
+                }
+                gl.drawArrays(gl.TRIANGLE_STRIP, 0, 4); this.stats.drawn++;
+                ctx.drawImage(this.canvas, 0, 0, ctx.canvas.width, ctx.canvas.height);
+            }
+            // Miniatura statica nel contesto 2D: si risolve con {} oppure { error: log } dopo il disegno, con
+            // { cancelled: true } senza disegnare se isCancelled() diventa vero mentre la richiesta e' in coda
+            request(hash, code, ctx, isCancelled = null) { return new Promise(resolve => { this.queue.push({ hash, code, ctx, resolve, isCancelled }); this.schedule(); }); }
+            schedule() { if (!this.frameScheduled) { this.frameScheduled = true; requestAnimationFrame(() => this.frame()); } }
+            frame() {
+                this.frameScheduled = false;
+                const start = performance.now(); const player = this.player;
+                for (const job of this.queue) if (job.isCancelled && job.isCancelled()) job.resolve({ cancelled: true });
+                this.queue = this.queue.filter(job => !(job.isCancelled && job.isCancelled()));
+                // Tutte le compilazioni in coda partono subito (in parallelo nel driver); si disegna solo chi ha finito
+                for (const job of this.queue.slice(0, this.maxPrograms >> 1)) player.requestProgram(job.code, job.hash);
+                const waiting = [];
+                let drawn = 0;
+                for (const job of this.queue) {
+                    if (drawn >= this.drawsPerFrame || performance.now() - start >= this.frameBudgetMs) { waiting.push(job); continue; }
+                    const entry = player.requestProgram(job.code, job.hash);
+                    if (!player.programReady(entry)) { waiting.push(job); continue; }
+                    player.resolveProgram(entry);
+                    if (entry.error) { job.resolve({ error: entry.error }); continue; }
+                    this.drawTile(entry, THUMBNAIL_UNIFORMS, job.ctx); job.resolve({}); drawn++;
+                }
+                this.queue = waiting;
+                const hoverEntry = this.hover && player.requestProgram(this.hover.code, this.hover.hash);
+                if (hoverEntry && player.programReady(hoverEntry)) {
+                    const entry = player.resolveProgram(hoverEntry);
+                    if (entry.error) this.hover = null;
+                    else this.drawTile(entry, { ...THUMBNAIL_UNIFORMS, time: THUMBNAIL_UNIFORMS.time + (performance.now() - this.hover.start) / 1000 }, this.hover.ctx);
+                }
+                if (this.queue.length || this.hover) this.schedule();
+            }
+            startHover(hash, code, ctx) { this.hover = { hash, code, ctx, start: performance.now() }; this.schedule(); }
+            stopHover(ctx) { if (this.hover && this.hover.ctx === ctx) this.hover = null; }
+        }
+
+        const galleryRenderer = new GalleryRenderer();
+
         const ui = {
             previewBtn: document.getElementById('preview-btn'),
             loadFolderBtn: document.getElementById('load-folder-btn'),
@@ -298,7 +613,9 @@
             openShadertoyBtn: document.getElementById('open-shadertoy-btn'),
             gallery: document.getElementById('shader-gallery'),
             galleryStatus: document.getElementById('gallery-status'),
+            cancelLoadBtn: document.getElementById('cancel-load-btn'),
             alwaysOnTopSwitch: document.getElementById('always-on-top-switch'),
+            workerRenderSwitch: document.getElementById('worker-render-switch'),
             videoEffectsList: document.getElementById('video-effects-list'),
         };
 
@@ -362,93 +679,323 @@
              return uniforms;
         };
 
+        // Trasporto controller -> anteprima: BroadcastChannel per i messaggi di controllo (cambio programma a caldo,
+        // handshake), blocco degli uniform in un SharedArrayBuffer quando la pagina è cross-origin isolated (letto
+        // dall'anteprima a ogni frame con un seqlock), altrimenti uniform inviati come messaggi. L'anteprima non
+        // chiama mai il controller: se questo si blocca continua a renderizzare con gli ultimi valori ricevuti.
+        const PREVIEW_CHANNEL_NAME = 'shader-bridge-preview';
+        const PREVIEW_UNIFORM_LAYOUT = [['zoom', 1], ['pan', 2], ['rotation', 1], ['distortion', 1], ['opacity', 1], ['chromaKey', 2], ['audioLevel', 1], ['bass', 1], ['beat', 1]];
+        const PREVIEW_UNIFORM_DEFAULTS = { zoom: 1, pan: [0, 0], rotation: 0, distortion: 0, opacity: 1, chromaKey: [0, 0], audioLevel: 0, bass: 0, beat: 0 };
+
+        class PreviewTransport {
+            constructor() {
+                const size = PREVIEW_UNIFORM_LAYOUT.reduce((total, [, count]) => total + count, 0);
+                this.channel = 'BroadcastChannel' in window ? new BroadcastChannel(PREVIEW_CHANNEL_NAME) : null;
+                this.shared = window.crossOriginIsolated && typeof SharedArrayBuffer === 'function' ? new SharedArrayBuffer(4 + 4 * size) : null;
+                this.sequence = this.shared ? new Int32Array(this.shared, 0, 1) : null; // Dispari = scrittura in corso
+                this.values = this.shared ? new Float32Array(this.shared, 4, size) : new Float32Array(size);
+                this.program = null; // { id, code } corrente
+                this.nextProgramId = 1;
+                if (this.channel) this.channel.onmessage = (e) => this.onMessage(e.data);
+                window.addEventListener('message', (e) => { if (playerWindow && e.source === playerWindow) this.onMessage(e.data); });
+            }
+            send(message) {
+                if (this.channel) this.channel.postMessage(message);
+                else if (playerWindow && !playerWindow.closed) playerWindow.postMessage(message, '*');
+            }
+            onMessage(message) {
+                if (!message || typeof message !== 'object') return;
+                if (message.type === 'hello') { // Anteprima pronta (anche dopo un ricaricamento manuale)
+                    if (this.shared && playerWindow && !playerWindow.closed) playerWindow.postMessage({ type: 'shared-uniforms', buffer: this.shared }, '*');
+                    if (this.program && message.programId !== this.program.id) this.send({ type: 'program', ...this.program });
+                    this.publishUniforms(window.getLiveUniforms());
+                } else if (message.type === 'program-error') {
+                    console.error(`Anteprima: errore nel programma ${message.id}: ${message.log}`);
+                    ui.galleryStatus.textContent = 'Anteprima: shader non compilato, resta quello precedente.';
+                }
+            }
+            setProgram(code) { this.program = { id: this.nextProgramId++, code }; this.send({ type: 'program', ...this.program }); return this.program; }
+            publishUniforms(uniforms) {
+                const values = this.values; let index = 0;
+                if (this.sequence) Atomics.add(this.sequence, 0, 1);
+                for (const [name, count] of PREVIEW_UNIFORM_LAYOUT) {
+                    const value = uniforms[name] !== undefined ? uniforms[name] : PREVIEW_UNIFORM_DEFAULTS[name];
+                    if (count === 1) values[index] = value; else for (let i = 0; i < count; i++) values[index + i] = value[i];
+                    index += count;
+                }
+                if (this.sequence) Atomics.add(this.sequence, 0, 1);
+                else this.send({ type: 'uniforms', values: Array.from(values) });
+            }
+        }
+
+        // Eseguita nella finestra di anteprima oppure nel suo Worker con un OffscreenCanvas (serializzata con toString:
+        // niente riferimenti al controller). Nel Worker, senza BroadcastChannel, i messaggi passano dalla finestra che fa da ponte
+        function previewMain(WebGLPlayer, layout, defaults, channelName, initialProgram, canvas) {
+            const inWorker = typeof WorkerGlobalScope !== 'undefined' && self instanceof WorkerGlobalScope;
+            const player = new WebGLPlayer(canvas);
+            const uniforms = JSON.parse(JSON.stringify(defaults));
+            let sharedValues = null, sequence = null, lastSequence = -1, programId = 0, pendingId = 0;
+            const channel = 'BroadcastChannel' in self ? new BroadcastChannel(channelName) : null;
+            const send = (message) => { if (channel) channel.postMessage(message); else if (inWorker) self.postMessage(message); else if (self.opener && !self.opener.closed) self.opener.postMessage(message, '*'); };
+            const nextFrame = typeof requestAnimationFrame === 'function' ? requestAnimationFrame : (callback) => setTimeout(() => callback(performance.now()), 16);
+            const applyValues = (values) => {
+                let index = 0;
+                for (const [name, count] of layout) {
+                    if (count === 1) uniforms[name] = values[index]; else for (let i = 0; i < count; i++) uniforms[name][i] = values[index + i];
+                    index += count;
+                }
+            };
+            const loadProgram = async (program) => { // Il programma precedente resta attivo fino alla compilazione riuscita
+                if (!program || program.id === programId || program.id === pendingId) return;
+                pendingId = program.id;
+                const entry = await player.prepareProgram(program.code); // Immediato per i sorgenti già visti
+                if (pendingId !== program.id) return; // Superato da un programma più recente
+                pendingId = 0;
+                if (player.useProgramEntry(entry)) programId = program.id;
+                else send({ type: 'program-error', id: program.id, log: entry.error });
+            };
+            const onMessage = (message) => {
+                if (!message || typeof message !== 'object') return;
+                if (message.type === 'program') loadProgram(message);
+                else if (message.type === 'uniforms' && !sharedValues) applyValues(message.values);
+                else if (message.type === 'shared-uniforms') { sequence = new Int32Array(message.buffer, 0, 1); sharedValues = new Float32Array(message.buffer, 4); }
+                else if (message.type === 'resize') { player.width = message.width; player.height = message.height; player.resizePending = true; } // OffscreenCanvas: dimensioni dalla finestra
+            };
+            if (channel) channel.onmessage = (e) => onMessage(e.data);
+            self.addEventListener('message', (e) => { if (inWorker || e.source === self.opener) onMessage(e.data); });
+            function renderLoop(time) {
+                if (sharedValues) {
+                    const before = Atomics.load(sequence, 0);
+                    if (before !== lastSequence && (before & 1) === 0) { applyValues(sharedValues); if (Atomics.load(sequence, 0) === before) lastSequence = before; }
+                }
+                uniforms.time = time / 1000;
+                player.render(uniforms);
+                nextFrame(renderLoop);
+            }
+            loadProgram(initialProgram);
+            send({ type: 'hello', programId });
+            nextFrame(renderLoop);
+        }
+
+        // Nella finestra di anteprima con "Render in Worker": il canvas passa al Worker come OffscreenCanvas, così il ritmo dei
+        // frame non dipende dal lavoro sul DOM. La finestra inoltra i messaggi del controller (anche il SharedArrayBuffer) e le
+        // dimensioni del canvas; se il Worker non parte (niente WebGL nel Worker) si torna al render nella finestra
+        function previewWorkerHost(workerSource, startInWindow) {
+            const canvas = document.getElementById('player-canvas');
+            const worker = new Worker(URL.createObjectURL(new Blob([workerSource], { type: 'text/javascript' })));
+            const relay = (e) => { if (e.source === window.opener) worker.postMessage(e.data); };
+            const resizeObserver = new ResizeObserver(entries => { const box = entries[entries.length - 1].contentRect; if (box.width && box.height) worker.postMessage({ type: 'resize', width: Math.round(box.width), height: Math.round(box.height) }); });
+            const fallback = (log) => {
+                console.error(`Render nel Worker non disponibile, render nella finestra: ${log}`);
+                worker.terminate(); window.removeEventListener('message', relay); resizeObserver.disconnect();
+                const replacement = canvas.cloneNode(); canvas.replaceWith(replacement); // Il canvas trasferito non può più dare un contesto
+                startInWindow(replacement);
+            };
+            worker.onmessage = (e) => {
+                if (e.data && e.data.type === 'worker-failed') fallback(e.data.log);
+                else if (window.opener && !window.opener.closed) window.opener.postMessage(e.data, '*');
+            };
+            worker.onerror = (e) => { e.preventDefault(); fallback(e.message); };
+            const offscreen = canvas.transferControlToOffscreen();
+            worker.postMessage({ type: 'init', canvas: offscreen }, [offscreen]);
+            window.addEventListener('message', relay);
+            resizeObserver.observe(canvas);
+        }
+
+        const previewTransport = new PreviewTransport();
+        ui.videoEffectsList.addEventListener('input', () => previewTransport.publishUniforms(window.getLiveUniforms()));
+
         function openPreviewWindow() {
             if (!activeShaderCode) { return; }
-            if (playerWindow && !playerWindow.closed) {
-                localStorage.setItem('shader_bridge_code', activeShaderCode);
-                playerWindow.location.reload();
-                playerWindow.focus();
-                return;
-            }
-            localStorage.setItem('shader_bridge_code', activeShaderCode);
+            const program = previewTransport.setProgram(activeShaderCode); // Finestra già aperta: cambio programma senza ricaricare
+            if (playerWindow && !playerWindow.closed) { playerWindow.focus(); return; }
             playerWindow = window.open("", "ShaderPlayerPreview", `width=1280,height=720,menubar=no,toolbar=no,location=no,status=no,alwaysRaised=${ui.alwaysOnTopSwitch.checked ? 'yes' : 'no'}`);
-            
+            const scriptValue = (value) => JSON.stringify(value).replace(/</g, '\\u003c'); // '<' come \u003c: i sorgenti non possono chiudere il tag script
+            const previewArgs = `${scriptValue(PREVIEW_UNIFORM_LAYOUT)}, ${scriptValue(PREVIEW_UNIFORM_DEFAULTS)}, ${scriptValue(PREVIEW_CHANNEL_NAME)}, ${scriptValue(program)}`;
+            const workerSource = `
+                const WebGLPlayer = ${WebGLPlayer.toString()};
+                self.onmessage = (e) => {
+                    if (!e.data || e.data.type !== 'init') return;
+                    self.onmessage = null;
+                    try { (${previewMain.toString()})(WebGLPlayer, ${previewArgs}, e.data.canvas); } catch (err) { self.postMessage({ type: 'worker-failed', log: String(err) }); }
+                };`;
             const previewHTML = `
                 <!DOCTYPE html><html><head><title>Preview</title><style>body,html{margin:0;padding:0;overflow:hidden;background:#000;}</style></head>
                 <body><canvas id="player-canvas" style="width:100vw;height:100vh;"></canvas></body>
                 <script>
-                    (${WebGLPlayer.toString()})();
+                    const WebGLPlayer = ${WebGLPlayer.toString()};
+                    const startInWindow = (canvas) => (${previewMain.toString()})(WebGLPlayer, ${previewArgs}, canvas);
                     window.onload = () => {
                         const canvas = document.getElementById('player-canvas');
-                        if (!canvas) { return; }
-                        const player = new WebGLPlayer(canvas);
-                        const shaderCode = localStorage.getItem('shader_bridge_code');
-                        if (!shaderCode || !player.createProgram(shaderCode)) { window.close(); return; }
-                        let animationFrameId;
-                        function renderLoop(time) {
-                            if (window.closed) { cancelAnimationFrame(animationFrameId); return; }
-                            const opener = window.opener;
-                            if (opener && !opener.closed) {
-                                const uniforms = opener.getLiveUniforms();
-                                uniforms.time = time / 1000;
-                                player.render(uniforms);
-                            } else { cancelAnimationFrame(animationFrameId); }
-                            animationFrameId = requestAnimationFrame(renderLoop);
-                        }
-                        animationFrameId = requestAnimationFrame(renderLoop);
+                        if (${ui.workerRenderSwitch.checked} && typeof Worker === 'function' && 'transferControlToOffscreen' in canvas && typeof ResizeObserver === 'function') (${previewWorkerHost.toString()})(${scriptValue(workerSource)}, startInWindow);
+                        else startInWindow(canvas);
                     };
                     window.addEventListener('keydown', (e) => { if (e.key === 'Escape') { window.close(); } });
                 <\/script></html>`;
             playerWindow.document.write(previewHTML);
             playerWindow.document.close();
         }
-        
+
+        // Caricamento progressivo di una cartella: file letti con file.text() a blocchi e con concorrenza limitata,
+        // miniature create blocco per blocco (il successivo parte quando il precedente è disegnato o preso dalla cache)
+        // con una pausa in idle tra i blocchi. La prima miniatura arriva dopo un blocco, qualunque sia la dimensione della cartella.
+        const SHADER_FILE_EXTENSIONS = ['.frag', '.fs', '.glsl'];
+        const yieldToIdle = () => new Promise(resolve => ('requestIdleCallback' in window ? requestIdleCallback(() => resolve(), { timeout: 50 }) : setTimeout(resolve, 0)));
+
+        class FolderIngestion {
+            constructor(files, { batchSize = 12, concurrency = 4, onProgress = null } = {}) {
+                this.files = Array.from(files).filter(file => SHADER_FILE_EXTENSIONS.some(extension => file.name.endsWith(extension)));
+                Object.assign(this, { batchSize, concurrency, onProgress });
+                this.cancelled = false;
+                this.startTime = performance.now();
+                this.stats = { total: this.files.length, done: 0, rendered: 0, cached: 0, errors: 0, firstThumbnailMs: null };
+            }
+            cancel() { this.cancelled = true; }
+            async readBatch(batch) {
+                const results = new Array(batch.length); let next = 0;
+                const reader = async () => {
+                    while (next < batch.length && !this.cancelled) {
+                        const index = next++;
+                        try { results[index] = { name: batch[index].name, code: await batch[index].text() }; }
+                        catch (e) { results[index] = { name: batch[index].name, error: true }; }
+                    }
+                };
+                await Promise.all(Array.from({ length: Math.min(this.concurrency, batch.length) }, reader));
+                return results;
+            }
+            async run() {
+                for (let start = 0; start < this.files.length && !this.cancelled; start += this.batchSize) {
+                    const results = await this.readBatch(this.files.slice(start, start + this.batchSize));
+                    if (this.cancelled) break;
+                    const outcomes = await Promise.all(results.map(result => result.error ? createErrorThumbnail(result.name, this) : createThumbnail(result.code, result.name, this)));
+                    for (const outcome of outcomes) if (outcome !== 'cancelled') { this.stats[outcome === 'error' ? 'errors' : outcome]++; this.stats.done++; }
+                    if (this.cancelled) break;
+                    if (this.stats.firstThumbnailMs === null) this.stats.firstThumbnailMs = performance.now() - this.startTime;
+                    if (this.onProgress) this.onProgress(this.stats);
+                    await yieldToIdle();
+                }
+                return this.stats;
+            }
+        }
+
+        let currentIngestion = null;
+
         async function handleFolderSelect(event) {
             const files = event.target.files;
             if (files.length === 0) return;
+            if (currentIngestion) currentIngestion.cancel();
             if (ui.gallery.querySelector('p')) ui.gallery.innerHTML = '';
-            ui.galleryStatus.textContent = `Caricamento di ${files.length} file...`;
-            const shaderFiles = Array.from(files).filter(file => file.name.endsWith('.frag') || file.name.endsWith('.fs') || file.name.endsWith('.glsl'));
-            const fileReadPromises = shaderFiles.map(file => new Promise((resolve) => {
-                const reader = new FileReader();
-                reader.onload = (e) => resolve({ name: file.name, code: e.target.result });
-                reader.onerror = () => resolve({ name: file.name, error: true });
-                reader.readAsText(file);
-            }));
-            const results = await Promise.all(fileReadPromises);
-            let successCount = 0;
-            results.forEach(result => {
-                if (result.error) createErrorThumbnail(result.name);
-                else { createThumbnail(result.code, result.name); successCount++; }
-            });
-            ui.galleryStatus.textContent = `Caricati ${successCount} di ${shaderFiles.length} shader.`;
+            const ingestion = currentIngestion = new FolderIngestion(files, { onProgress: (stats) => { ui.galleryStatus.textContent = `Caricamento: ${stats.done} di ${stats.total} shader...`; } });
+            ui.galleryStatus.textContent = `Caricamento di ${ingestion.stats.total} shader...`;
+            ui.cancelLoadBtn.classList.remove('hidden');
+            const stats = await ingestion.run();
+            if (currentIngestion !== ingestion) return; // Sostituito dal caricamento di un'altra cartella
+            currentIngestion = null; ui.cancelLoadBtn.classList.add('hidden');
+            const loaded = stats.done - stats.errors;
+            ui.galleryStatus.textContent = `${ingestion.cancelled ? 'Interrotto: caricati' : 'Caricati'} ${loaded} di ${stats.total} shader (${stats.cached} miniature dalla cache).`;
+            console.log(`Cartella caricata: prima miniatura dopo ${stats.firstThumbnailMs === null ? '-' : stats.firstThumbnailMs.toFixed(0)} ms`, stats);
         }
 
-        function createThumbnail(shaderCode, fileName) {
+        // Miniatura dalla cache per hash del sorgente; solo gli shader nuovi o modificati vengono renderizzati.
+        // Restituisce 'cached', 'rendered', 'error' oppure 'cancelled' se l'ingestion viene annullata nel frattempo:
+        // in quel caso la tile e' tolta dalla galleria (che puo' gia' essere stata svuotata per un'altra cartella).
+        async function createThumbnail(shaderCode, fileName, ingestion = null) {
+            const isCancelled = () => !!(ingestion && ingestion.cancelled);
+            if (isCancelled()) return 'cancelled';
             const container = document.createElement('div'); container.className = 'thumbnail-item';
-            const canvas = document.createElement('canvas'); canvas.className = 'placeholder';
+            const canvas = document.createElement('canvas'); canvas.className = 'placeholder'; canvas.width = THUMBNAIL_WIDTH; canvas.height = THUMBNAIL_HEIGHT;
             const nameLabel = document.createElement('p');
             nameLabel.textContent = fileName; container.append(canvas, nameLabel);
-            const thumbnailPlayer = new WebGLPlayer(canvas);
-            if (!thumbnailPlayer.createProgram(shaderCode)) {
-                container.classList.add('error'); nameLabel.textContent = `Errore: ${fileName}`;
-                ui.gallery.appendChild(container); return;
-            }
-            thumbnailPlayer.render({ time: 5.0, zoom: 1, pan: [0,0], rotation: 0, distortion: 0, opacity: 1.0, chromaKey: [0,0], audioLevel: 0, bass: 0, beat: 0 });
             container.addEventListener('click', () => {
                 if (container.classList.contains('error')) return;
                 document.querySelectorAll('.thumbnail-item.active').forEach(el => el.classList.remove('active'));
                 container.classList.add('active'); activeShaderCode = shaderCode;
                 if (playerWindow && !playerWindow.closed) { openPreviewWindow(); }
             });
-            ui.gallery.appendChild(container);
+            ui.gallery.appendChild(container); // Subito, per mantenere l'ordine dei file
+            const markError = (log) => { container.classList.add('error'); nameLabel.textContent = `Errore: ${fileName}`; if (log) container.title = log; return 'error'; };
+            const cancel = () => { container.remove(); return 'cancelled'; };
+            const hash = await hashShaderSource(shaderCode);
+            await thumbnailCache.ready;
+            if (isCancelled()) return cancel();
+            const entry = thumbnailCache.get(hash);
+            if (entry && entry.error) return markError(entry.error);
+            const ctx = canvas.getContext('2d');
+            const cached = entry && await thumbnailCache.draw(hash, ctx);
+            if (isCancelled()) return cancel();
+            if (!cached) {
+                const rendered = await galleryRenderer.request(hash, shaderCode, ctx, isCancelled);
+                if (rendered.cancelled || isCancelled()) return cancel();
+                if (rendered.error) { thumbnailCache.putError(hash, rendered.error); return markError(rendered.error); }
+                await thumbnailCache.put(hash, canvas); // Prima dell'anteprima animata, che ridisegna il canvas
+            }
+            container.addEventListener('mouseenter', () => galleryRenderer.startHover(hash, shaderCode, ctx));
+            container.addEventListener('mouseleave', () => { galleryRenderer.stopHover(ctx); thumbnailCache.draw(hash, ctx); });
+            return cached ? 'cached' : 'rendered';
         }
 
-        function createErrorThumbnail(fileName) { const container = document.createElement('div'); container.className = 'thumbnail-item error'; const canvas = document.createElement('canvas'); canvas.className = 'placeholder'; const nameLabel = document.createElement('p'); nameLabel.textContent = `Errore: ${fileName}`; container.append(canvas, nameLabel); ui.gallery.appendChild(container); }
+        function createErrorThumbnail(fileName, ingestion = null) { if (ingestion && ingestion.cancelled) return 'cancelled'; const container = document.createElement('div'); container.className = 'thumbnail-item error'; const canvas = document.createElement('canvas'); canvas.className = 'placeholder'; const nameLabel = document.createElement('p'); nameLabel.textContent = `Errore: ${fileName}`; container.append(canvas, nameLabel); ui.gallery.appendChild(container); return 'error'; }
         
+        // Benchmark del tempo CPU per frame (pagina aperta con #render-benchmark): percorso precedente di render
+        // (dimensioni lette, clear, bind e puntatori, tutti gli uniform a ogni frame) contro lo stato in cache
+        function legacyRender(player, uniforms) {
+            const gl = player.gl; const canvas = player.canvas;
+            const displayWidth = canvas.clientWidth; const displayHeight = canvas.clientHeight; if (canvas.width !== displayWidth || canvas.height !== displayHeight) { canvas.width = displayWidth; canvas.height = displayHeight; }
+            gl.viewport(0, 0, gl.canvas.width, gl.canvas.height); gl.clearColor(0,0,0,1); gl.clear(gl.COLOR_BUFFER_BIT); gl.useProgram(player.program); gl.bindBuffer(gl.ARRAY_BUFFER, player.buffer);
+            gl.vertexAttribPointer(player.locations.pos, 2, gl.FLOAT, false, 0, 0); gl.enableVertexAttribArray(player.locations.pos);
+            gl.uniform2f(player.locations.res, gl.canvas.width, gl.canvas.height);
+            for (const [key, value] of Object.entries(uniforms)) {
+                const loc = player.locations[key];
+                if (loc) { if (Array.isArray(value)) gl.uniform2fv(loc, value); else gl.uniform1f(loc, value); }
+            }
+            gl.drawArrays(gl.TRIANGLE_STRIP, 0, 4);
+        }
+
+        function runRenderBenchmark({ frames = 2000, blocks = 20 } = {}) {
+            const canvas = document.createElement('canvas'); canvas.style.cssText = 'position:fixed;right:1rem;bottom:1rem;width:480px;height:270px;z-index:50;';
+            document.body.appendChild(canvas);
+            const player = new WebGLPlayer(canvas);
+            if (!player.createProgram(defaultShader)) { canvas.remove(); return null; }
+            const uniforms = { ...THUMBNAIL_UNIFORMS, pan: [0, 0], chromaKey: [0, 0] };
+            const scenarios = {
+                'solo tempo': (i) => { uniforms.time = i / 60; },
+                'tutti gli uniform': (i) => { uniforms.time = i / 60; uniforms.zoom = 1 + (i % 50) / 100; uniforms.pan[0] = (i % 20) / 40; uniforms.rotation = i % 360; uniforms.audioLevel = (i % 7) / 7; uniforms.bass = (i % 5) / 5; uniforms.beat = i % 2; },
+            };
+            const perBlock = Math.max(1, Math.floor(frames / blocks));
+            const results = [];
+            for (const [name, update] of Object.entries(scenarios)) {
+                const elapsed = { legacy: 0, cached: 0 };
+                for (let block = 0; block < blocks; block++) {
+                    for (const path of (block % 2 ? ['legacy', 'cached'] : ['cached', 'legacy'])) { // Ordine alternato: nessun vantaggio sistematico
+                        player.gl.finish(); // Coda GPU vuota prima di misurare: si confronta solo il lavoro CPU
+                        const start = performance.now();
+                        for (let i = 0; i < perBlock; i++) { update(block * perBlock + i); if (path === 'legacy') legacyRender(player, uniforms); else player.render(uniforms); }
+                        elapsed[path] += performance.now() - start;
+                        if (path === 'legacy') player.installProgram(); // Il percorso precedente ha riscritto lo stato: il player lo reimposta
+                    }
+                }
+                const legacy = elapsed.legacy / (perBlock * blocks), cached = elapsed.cached / (perBlock * blocks);
+                results.push({ scenario: name, 'precedente (ms/frame)': +legacy.toFixed(4), 'in cache (ms/frame)': +cached.toFixed(4), 'risparmio (ms/frame)': +(legacy - cached).toFixed(4), 'risparmio %': +((1 - cached / legacy) * 100).toFixed(1) });
+            }
+            if (player.resizeObserver) player.resizeObserver.disconnect();
+            canvas.remove();
+            console.table(results);
+            return results;
+        }
+
+        function showRenderBenchmark() {
+            const results = runRenderBenchmark();
+            const panel = document.createElement('pre'); panel.className = 'section-frame'; panel.style.cssText = 'position:fixed;left:50%;top:1rem;transform:translateX(-50%);z-index:60;font-size:0.8rem;cursor:pointer;';
+            panel.textContent = !results ? 'Benchmark non eseguito: shader non compilato.' : ['Benchmark render (tempo CPU per frame, clic per chiudere)', ...results.map(r => `${r.scenario.padEnd(18)} precedente ${r['precedente (ms/frame)'].toFixed(4)} ms  in cache ${r['in cache (ms/frame)'].toFixed(4)} ms  risparmio ${r['risparmio (ms/frame)'].toFixed(4)} ms (${r['risparmio %']}%)`)].join('\n');
+            panel.addEventListener('click', () => panel.remove());
+            document.body.appendChild(panel);
+        }
+        window.runRenderBenchmark = runRenderBenchmark;
+
         ui.previewBtn.addEventListener('click', openPreviewWindow);
         ui.loadFolderBtn.addEventListener('click', () => ui.shaderFolderInput.click());
         ui.shaderFolderInput.addEventListener('change', handleFolderSelect);
+        ui.cancelLoadBtn.addEventListener('click', () => { if (currentIngestion) currentIngestion.cancel(); });
         ui.openBonzomaticBtn.addEventListener('click', () => alert("Azione non supportata dal browser."));
         ui.openShadertoyBtn.addEventListener('click', () => window.open('https://www.shadertoy.com', '_blank'));
         document.getElementById('download-shadertoy-btn').addEventListener('click', () => alert("Download simulato."));
@@ -462,6 +1009,7 @@
         activeShaderCode = defaultShader;
         createThumbnail(defaultShader, "DefaultShader.frag");
         document.querySelector('.thumbnail-item').classList.add('active');
+        if (location.hash === '#render-benchmark') setTimeout(showRenderBenchmark, 500);
     });
     </script>
 </body>